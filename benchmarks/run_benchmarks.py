@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки FPV сканера на симулированном оборудовании
+Сканирование идет через симулированный RX5808 (SPI/GPIO не нужны),
+видео - через синтетический источник кадров. Результаты сохраняются
+в JSON как базовая линия и сравниваются с ней при следующих запусках.
+
+    python3 benchmarks/run_benchmarks.py --save benchmarks/baseline.json
+    python3 benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from rx5808_backend import SimulatedRX5808Backend  # noqa: E402
+from scan_engine import ScanEngine, load_config  # noqa: E402
+from spectrum_history import SpectrumHistory  # noqa: E402
+from spectrum_renderer import SpectrumRenderer  # noqa: E402
+from video_pipeline import VideoPipeline, SyntheticCapture  # noqa: E402
+
+# Направление улучшения метрик: 'higher' - больше лучше, иначе меньше лучше
+HIGHER_IS_BETTER = {'sweeps_per_sec', 'video_fps'}
+
+
+def benchmark_config(table_file):
+    """Конфигурация репозитория без пауз между проходами и с чистой таблицей установления"""
+    config = load_config()
+    scanner = config.setdefault('scanner', {})
+    scanner['scan_interval'] = 0.0
+    scanner['min_scan_interval'] = 0.0
+    scanner.setdefault('settle', {})['table_file'] = table_file
+    return config
+
+
+def make_engine(seed, table_file):
+    return ScanEngine(benchmark_config(table_file), SimulatedRX5808Backend(seed=seed))
+
+
+def ms(seconds):
+    return round(float(seconds) * 1000, 4)
+
+
+def bench_sweep(seed, duration, table_file):
+    """Проходы в секунду и задержки этапов перестройки"""
+    engine = make_engine(seed, table_file)
+    engine.open()
+    started = time.perf_counter()
+    engine.start()
+    time.sleep(duration)
+    engine.stop(timeout=2.0)
+    elapsed = time.perf_counter() - started
+    engine.backend.close()
+
+    summary = engine.metrics.summary()
+    results = {'sweeps_per_sec': round(engine.sweep_timer.count / elapsed, 3)}
+    for stage in ('sweep', 'settle', 'set_frequency', 'read_rssi'):
+        if stage in summary:
+            p50, p95, p99, _ = summary[stage]
+            results[f'{stage}_p50_ms'] = ms(p50)
+            results[f'{stage}_p99_ms'] = ms(p99)
+    return results
+
+
+def bench_first_detection(seed, runs, table_file):
+    """Время от запуска до первого обнаружения (медиана по runs запускам)"""
+    times = []
+    for run in range(runs):
+        engine = make_engine(seed + run, table_file)
+        engine.open()
+        detected = threading.Event()
+        engine.add_listener(lambda e: e['type'] == 'detection' and detected.set())
+        started = time.perf_counter()
+        engine.start()
+        if detected.wait(5.0):
+            times.append(time.perf_counter() - started)
+        engine.stop(timeout=2.0)
+        engine.backend.close()
+    if not times:
+        return {}
+    return {'time_to_first_detection_ms': ms(np.median(times))}
+
+
+def bench_render(frames):
+    """Сборка кадра спектра и водопада: 8 каналов и сетка 1 МГц"""
+    results = {}
+    rng = np.random.default_rng(5808)
+    for name, frequencies in (('8ch', range(5725, 5866, 20)), ('1mhz', range(5725, 6001))):
+        frequencies = list(frequencies)
+        history = SpectrumHistory(frequencies, depth=256)
+        for _ in range(history.depth):
+            history.set_sweep(rng.integers(0, 256, len(frequencies)))
+            history.commit()
+        renderer = SpectrumRenderer(None, frequencies)
+        spectrum = history.moving_average()
+        waterfall = history.recent(renderer.waterfall_height)
+        max_hold = history.max_hold()
+        samples = np.empty(frames)
+        for i in range(frames):
+            started = time.perf_counter()
+            renderer.compose(spectrum, waterfall, max_hold=max_hold, threshold=50)
+            samples[i] = time.perf_counter() - started
+        results[f'render_{name}_p50_ms'] = ms(np.quantile(samples, 0.5))
+        results[f'render_{name}_p99_ms'] = ms(np.quantile(samples, 0.99))
+    return results
+
+
+def bench_video(duration, fps, display_fps):
+    """Синтетическое видео: частота вывода и задержка от захвата до экрана
+
+    Главный поток GUI имитируется циклом с частотой display_fps, который
+    берет последний кадр из кольца и конвертирует его в RGB, как VideoDisplay.
+    """
+    pipeline = VideoPipeline("synthetic", 640, 480, fps, buffer_size=3)
+    pipeline.start()
+    rgb = np.empty((480, 640, 3), dtype=np.uint8)
+    latencies = []
+    convert = []
+    shown = 0
+    period = 1.0 / display_fps
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        frame = pipeline.ring.acquire_read()
+        try:
+            if frame is not None:
+                t0 = time.perf_counter()
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+                convert.append(time.perf_counter() - t0)
+                latencies.append(time.perf_counter() - SyntheticCapture.capture_time(frame))
+                shown += 1
+        finally:
+            pipeline.ring.release_read()
+        time.sleep(period)
+    elapsed = time.perf_counter() - started
+    pipeline.stop()
+    pipeline.join(timeout=2.0)
+
+    results = {
+        'video_fps': round(shown / elapsed, 2),
+        'video_frames_dropped': pipeline.ring.dropped,
+    }
+    if latencies:
+        results['video_latency_p50_ms'] = ms(np.quantile(latencies, 0.5))
+        results['video_latency_p95_ms'] = ms(np.quantile(latencies, 0.95))
+        results['video_convert_p50_ms'] = ms(np.quantile(convert, 0.5))
+    return results
+
+
+def run_all(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        table_file = os.path.join(tmp, 'settle_times.json')
+        print("⏱️  Проходы и перестройка...")
+        results.update(bench_sweep(args.seed, args.duration, table_file))
+        print("⏱️  Время до первого обнаружения...")
+        results.update(bench_first_detection(args.seed, args.runs, table_file))
+    print("⏱️  Отрисовка спектра...")
+    results.update(bench_render(args.frames))
+    print("⏱️  Конвейер видео...")
+    results.update(bench_video(args.duration, args.fps, args.display_fps))
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Сравнение с базовой линией; возвращает список регрессий
+
+    Задержка считается регрессией, только если она выросла больше чем на
+    tolerance и больше чем на min_delta_ms (микросекундные этапы шумят).
+    """
+    regressions = []
+    print(f"\n{'метрика':<30}{'база':>12}{'сейчас':>12}{'изм.':>9}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None or not isinstance(value, (int, float)):
+            print(f"{name:<30}{'-':>12}{value:>12}")
+            continue
+        change = (value - base) / base if base else 0.0
+        worse = -change if name in HIGHER_IS_BETTER else change
+        mark = ""
+        significant = not name.endswith('_ms') or abs(value - base) > min_delta_ms
+        if worse > tolerance and significant and not name.endswith('dropped'):
+            regressions.append(name)
+            mark = " ❌"
+        elif worse < -tolerance:
+            mark = " ✅"
+        print(f"{name:<30}{base:>12}{value:>12}{change * 100:>+8.1f}%{mark}")
+    return regressions
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Бенчмарки FPV сканера (симулятор)")
+    parser.add_argument('--duration', type=float, default=5.0, help="длительность замеров, с")
+    parser.add_argument('--runs', type=int, default=5, help="запусков для времени до обнаружения")
+    parser.add_argument('--frames', type=int, default=500, help="кадров для замера отрисовки")
+    parser.add_argument('--fps', type=int, default=30, help="частота синтетического видео")
+    parser.add_argument('--display-fps', type=int, default=30, help="частота цикла отрисовки")
+    parser.add_argument('--seed', type=int, default=5808, help="зерно симулятора")
+    parser.add_argument('--save', help="сохранить результаты как базовую линию (JSON)")
+    parser.add_argument('--compare', help="сравнить с базовой линией (JSON)")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="допустимое ухудшение относительно базы (доля)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help="минимальное значимое изменение задержки, мс")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_all(args)
+
+    report = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'args': vars(args),
+        'results': results,
+    }
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Базовая линия сохранена: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get('results', {}), args.tolerance,
+                              args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ Регрессии: {', '.join(regressions)}")
+            return 1
+        print("\n✅ Регрессий нет")
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
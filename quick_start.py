@@ -6,10 +6,25 @@
 
 import sys
 import os
+import glob
 import subprocess
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from startup import module_available  # noqa: E402
+
+# Модули для проверки: отображаемое имя -> модуль (для tkinter - его расширение)
+REQUIRED_MODULES = {
+    'RPi.GPIO': 'RPi.GPIO',
+    'spidev': 'spidev',
+    'numpy': 'numpy',
+    'cv2': 'cv2',
+    'PIL': 'PIL',
+    'tkinter': '_tkinter',
+}
+
 def check_requirements():
-    """Проверка требований системы"""
+    """Проверка требований системы (наличие модулей - без их импорта)"""
     print("🔍 Проверка системы...")
     
     # Проверка Python
@@ -18,63 +33,32 @@ def check_requirements():
         return False
     
     # Проверка модулей
-    required_modules = ['RPi.GPIO', 'spidev', 'cv2', 'PIL', 'tkinter']
-    missing_modules = []
-    
-    for module in required_modules:
-        try:
-            if module == 'RPi.GPIO':
-                import RPi.GPIO
-            elif module == 'spidev':
-                import spidev
-            elif module == 'cv2':
-                import cv2
-            elif module == 'PIL':
-                from PIL import Image
-            elif module == 'tkinter':
-                import tkinter
-        except ImportError:
-            missing_modules.append(module)
+    missing_modules = [name for name, module in REQUIRED_MODULES.items()
+                       if not module_available(module)]
     
     if missing_modules:
         print(f"❌ Отсутствуют модули: {', '.join(missing_modules)}")
+        if 'spidev' in missing_modules:
+            print("🔧 Установите: sudo apt install python3-spidev")
         print("Запустите: ./install.sh")
         return False
+    print("✅ spidev модуль доступен")
     
-    # Проверка SPI
-    try:
-        import spidev
-        print("✅ spidev модуль доступен")
-        
-        # Проверка SPI устройств
-        result = subprocess.run(['ls', '/dev/spi*'], capture_output=True, text=True)
-        if result.returncode != 0:
-            print("❌ SPI устройства не найдены!")
-            print("🔧 Для включения SPI:")
-            print("   1. sudo raspi-config")
-            print("   2. Выберите: 3 Interface Options → P4 SPI → Yes")
-            print("   3. sudo reboot")
-            return False
-        else:
-            print("✅ SPI устройства обнаружены")
-            
-    except ImportError:
-        print("❌ spidev модуль не найден!")
-        print("🔧 Установите: sudo apt install python3-spidev")
-        return False
-    except Exception as e:
-        print(f"⚠️  Ошибка проверки SPI: {e}")
+    # Проверка SPI устройств
+    if not glob.glob('/dev/spidev*'):
+        print("❌ SPI устройства не найдены!")
+        print("🔧 Для включения SPI:")
+        print("   1. sudo raspi-config")
+        print("   2. Выберите: 3 Interface Options → P4 SPI → Yes")
+        print("   3. sudo reboot")
         return False
+    print("✅ SPI устройства обнаружены")
     
     # Проверка видео устройства
-    try:
-        result = subprocess.run(['ls', '/dev/video*'], capture_output=True, text=True)
-        if result.returncode != 0:
-            print("⚠️  USB Video DVR не обнаружен")
-        else:
-            print("✅ USB Video DVR обнаружен")
-    except:
-        print("⚠️  Не удалось проверить видео устройство")
+    if glob.glob('/dev/video*'):
+        print("✅ USB Video DVR обнаружен")
+    else:
+        print("⚠️  USB Video DVR не обнаружен")
     
     print("✅ Система готова")
     return True
@@ -144,8 +128,13 @@ def run_c_native_scanner():
 def run_headless_scanner():
     """Запуск сканера без GUI"""
     print("📊 Запуск сканера без GUI...")
-    print("(Функция в разработке)")
-    # Здесь можно добавить консольную версию сканера
+    print("События выводятся JSON-строками, остановка: Ctrl+C")
+    try:
+        subprocess.run([sys.executable, 'src/scan_daemon.py'])
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Ошибка запуска сканера: {e}")
 
 def enable_spi():
     """Включение SPI"""
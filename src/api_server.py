@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Локальный API сканера: REST и WebSocket (раздел api конфигурации)
+    GET /api/state    - режим, проход, сигналы, излучатели и треки (JSON)
+    GET /api/spectrum - частоты бинов, последний проход, среднее и max-hold (JSON)
+    GET /api/stream   - WebSocket: проходы (двоичные кадры) и события (текст JSON)
+
+Проходы в потоке квантуются (шаг api.quantization единиц RSSI) и передаются
+разностью с предыдущим проходом, сжатой zlib; каждые api.keyframe_interval
+проходов и при смене плана - опорный кадр целиком. Сообщение кодируется
+и оформляется кадром WebSocket один раз за публикацию и разделяется всеми
+клиентами. Очередь клиента ограничена (api.client_queue): у медленного
+клиента она сбрасывается. Новый или сброшенный клиент вместо разностного
+кадра получает опорный кадр того же прохода (один на всех таких клиентов),
+общее состояние кодера при этом не сбрасывается.
+
+Двоичный кадр прохода (little-endian, заголовок 17 байт):
+    B версия (1), B тип (0 - опорный, 1 - разностный), B шаг квантования,
+    H число бинов, I номер прохода, d время (Unix, с);
+    далее zlib от uint8 по бинам: опорный - RSSI / шаг, разностный -
+    (значение - предыдущее значение) mod 256. RSSI = значение * шаг.
+Первые текстовые сообщения потока - {'type': 'hello', ...} и текущий план
+({'type': 'plan', ...} с частотами бинов).
+"""
+
+import asyncio
+import json
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from event_log import get_logger
+from http_service import (HttpService, respond, websocket_accept, websocket_frame,
+                          read_websocket_frame, WS_BINARY, WS_TEXT, WS_CLOSE, WS_PING, WS_PONG)
+
+PROTOCOL_VERSION = 1
+KEYFRAME = 0
+DELTA = 1
+SWEEP_HEADER = struct.Struct('<BBBHId')
+
+# События движка, пересылаемые в поток как текст JSON
+STREAM_EVENTS = ('plan', 'detection', 'track')
+
+log = get_logger('api')
+
+
+def encode_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class SweepEncoder:
+    """Квантование и разностное кодирование проходов (одно состояние на всех клиентов)"""
+
+    def __init__(self, quantization=4, keyframe_interval=30, compression=1):
+        self.step = max(1, min(255, int(quantization)))
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.compression = compression
+        self.previous = None
+        self.since_keyframe = 0
+        self.sweep = 0
+        self.timestamp = 0.0
+
+    def reset(self):
+        """Следующий проход - опорный кадр"""
+        self.previous = None
+
+    def quantize(self, rssi):
+        values = np.rint(np.asarray(rssi, dtype=np.float32) / self.step)
+        return np.clip(values, 0, 255).astype(np.uint8)
+
+    def encode(self, sweep, timestamp, rssi):
+        """Кадр прохода: (bytes, опорный ли)"""
+        values = self.quantize(rssi)
+        keyframe = (self.previous is None or len(values) != len(self.previous) or
+                    self.since_keyframe >= self.keyframe_interval)
+        if keyframe:
+            data = values
+            self.since_keyframe = 0
+        else:
+            # Вычитание uint8 по модулю 256: без переполнений и без знака
+            data = values - self.previous
+            self.since_keyframe += 1
+        self.previous = values
+        self.sweep = sweep
+        self.timestamp = timestamp
+        return self.pack(KEYFRAME if keyframe else DELTA, data), keyframe
+
+    def keyframe(self):
+        """Опорный кадр последнего прохода (None до первого прохода)
+
+        Для клиентов, которым нужно состояние целиком: следующие разностные
+        кадры продолжают его без сброса кодера.
+        """
+        if self.previous is None:
+            return None
+        return self.pack(KEYFRAME, self.previous)
+
+    def pack(self, kind, data):
+        header = SWEEP_HEADER.pack(PROTOCOL_VERSION, kind, self.step, len(data),
+                                   self.sweep & 0xFFFFFFFF, self.timestamp)
+        return header + zlib.compress(data.tobytes(), self.compression)
+
+
+class SweepDecoder:
+    """Декодирование кадров прохода (для клиентов на Python)"""
+
+    def __init__(self):
+        self.values = None
+
+    def decode(self, message):
+        """(номер прохода, время, RSSI по бинам) или None до первого опорного кадра"""
+        version, kind, step, bins, sweep, timestamp = SWEEP_HEADER.unpack_from(message)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"неизвестная версия протокола: {version}")
+        data = np.frombuffer(zlib.decompress(message[SWEEP_HEADER.size:]), dtype=np.uint8)
+        if kind == KEYFRAME:
+            self.values = data.copy()
+        elif self.values is None or len(self.values) != bins:
+            return None
+        else:
+            self.values += data
+        return sweep, timestamp, self.values.astype(np.int32) * step
+
+
+class StreamClient:
+    """Подписчик потока: ограниченная очередь готовых кадров WebSocket"""
+
+    __slots__ = ('peer', 'queue', 'resync', 'dropped')
+
+    def __init__(self, peer, queue_size):
+        self.peer = peer
+        self.queue = asyncio.Queue(queue_size)
+        self.resync = False
+        self.dropped = 0
+
+    def clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def reset(self):
+        """Сброс очереди (медленный клиент): дальше нужен опорный кадр"""
+        self.clear()
+        self.resync = True
+        self.dropped += 1
+
+
+class ApiServer:
+    """REST и WebSocket API движка сканирования в общем цикле asyncio
+
+    engine            - ScanEngine (состояние и события)
+    host, port        - адрес сервера (по умолчанию только localhost)
+    quantization      - шаг квантования RSSI в потоке проходов
+    keyframe_interval - проходов между опорными кадрами
+    client_queue      - глубина очереди клиента потока, сообщений
+    """
+
+    def __init__(self, engine, host='127.0.0.1', port=8808, quantization=4,
+                 keyframe_interval=30, client_queue=32):
+        self.engine = engine
+        self.runtime = engine.runtime
+        self.encoder = SweepEncoder(quantization, keyframe_interval)
+        self.client_queue = client_queue
+        self.clients = set()
+        self.dropped = 0
+        self.plan_frame = None
+        self.sweep_keyframe = None
+        self.cache = {}
+        self.hello_frame = websocket_frame(WS_TEXT, encode_json({
+            'type': 'hello', 'version': PROTOCOL_VERSION, 'quantization': self.encoder.step,
+            'keyframe_interval': self.encoder.keyframe_interval}))
+        self.service = HttpService(host, port, {
+            '/api/state': self.serve_state,
+            '/api/spectrum': self.serve_spectrum,
+            '/api/stream': self.serve_stream,
+        }, runtime=self.runtime, name="API")
+        self.encode_timer = engine.metrics.stage('api_encode')
+        engine.metrics.gauge('api_clients', lambda: len(self.clients))
+        engine.metrics.gauge('api_frames_dropped', lambda: self.dropped)
+
+    @classmethod
+    def from_config(cls, engine, api_config):
+        return cls(engine, api_config.get('host', '127.0.0.1'), api_config.get('port', 8808),
+                   quantization=api_config.get('quantization', 4),
+                   keyframe_interval=api_config.get('keyframe_interval', 30),
+                   client_queue=api_config.get('client_queue', 32))
+
+    def route(self, path, handler):
+        """Дополнительный маршрут на том же сервере: handler(request)"""
+        self.service.routes[path] = handler
+
+    def start(self):
+        if self.service.start() is None:
+            return None
+        self.engine.add_listener(self.on_event)
+        # План уже объявлен движком: запоминаем его для новых клиентов
+        self.runtime.call_soon(self.publish, self.engine.plan_event())
+        log.info("🌐 API: %s", self.service.url('/api/state'))
+        return self
+
+    def close(self):
+        self.engine.remove_listener(self.on_event)
+        self.service.close()
+        for client in list(self.clients):
+            self.runtime.call_soon(self.disconnect, client)
+
+    # Публикация (поток цикла событий)
+
+    def on_event(self, event):
+        """Подписчик движка: события передаются в цикл событий"""
+        if self.runtime.in_loop():
+            self.publish(event)
+        else:
+            self.runtime.call_soon(self.publish, event)
+
+    def publish(self, event):
+        kind = event['type']
+        if kind == 'sweep':
+            if not self.clients:
+                # Без подписчиков не кодируем; первый клиент получит опорный кадр
+                self.encoder.reset()
+                return
+            started = time.perf_counter()
+            payload, keyframe = self.encoder.encode(event['sweep'], event['timestamp'],
+                                                    event['rssi'])
+            frame = websocket_frame(WS_BINARY, payload)
+            self.encode_timer.observe(time.perf_counter() - started)
+            self.sweep_keyframe = frame if keyframe else None
+            self.broadcast(frame, sweep=True)
+        elif kind in STREAM_EVENTS:
+            frame = websocket_frame(WS_TEXT, encode_json(event))
+            if kind == 'plan':
+                # Новая сетка бинов: следующий проход - опорный кадр
+                self.plan_frame = frame
+                self.encoder.reset()
+                self.sweep_keyframe = None
+            self.broadcast(frame)
+
+    def keyframe_frame(self):
+        """Опорный кадр текущего прохода (кодируется один раз на публикацию)"""
+        if self.sweep_keyframe is None:
+            self.sweep_keyframe = websocket_frame(WS_BINARY, self.encoder.keyframe())
+        return self.sweep_keyframe
+
+    def broadcast(self, frame, sweep=False):
+        """Один и тот же кадр - в очереди всех клиентов
+
+        Клиент, ожидающий опорного кадра, вместо прохода получает опорный
+        кадр того же прохода; кодер и остальные клиенты этого не замечают.
+        """
+        for client in self.clients:
+            message = frame
+            if sweep and client.resync:
+                message = self.keyframe_frame()
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                client.reset()
+                self.dropped += 1
+                if not sweep:
+                    continue
+                # Очередь пуста: текущий проход целиком, дальше - разностные кадры
+                message = self.keyframe_frame()
+                client.queue.put_nowait(message)
+            if sweep:
+                client.resync = False
+
+    def disconnect(self, client):
+        client.clear()
+        client.queue.put_nowait(None)
+
+    # Обработчики HTTP
+
+    def cached(self, name, build):
+        """Тело ответа, сериализуемое один раз на снимок движка, план и состояние сканирования"""
+        key = (self.engine.snapshots.version, self.engine.plan, self.engine.scanning)
+        entry = self.cache.get(name)
+        if entry is None or entry[0] != key:
+            entry = (key, build())
+            self.cache[name] = entry
+        return entry[1]
+
+    def build_state(self):
+        engine = self.engine
+        snapshot = engine.snapshots.peek()
+        state = {'mode': engine.plan.mode, 'name': engine.plan.name,
+                 'sweep_mode': engine.plan.sweep_mode, 'scanning': engine.scanning,
+                 'sweep': None, 'timestamp': None, 'signals': [], 'emitters': [], 'tracks': []}
+        if snapshot is not None:
+            state.update(sweep=snapshot.sweep, timestamp=snapshot.timestamp,
+                         signals=list(snapshot.signals.values()),
+                         emitters=[e.to_dict() for e in snapshot.emitters],
+                         tracks=list(snapshot.tracks))
+        return encode_json(state)
+
+    def build_spectrum(self):
+        snapshot = self.engine.snapshots.peek()
+        frequencies = [int(f) for f in self.engine.history.frequencies]
+        if snapshot is None or len(snapshot.spectrum) != len(frequencies):
+            return None
+        latest = snapshot.waterfall[-1] if len(snapshot.waterfall) else snapshot.spectrum
+        return encode_json({
+            'sweep': snapshot.sweep,
+            'timestamp': snapshot.timestamp,
+            'frequencies': frequencies,
+            'rssi': np.asarray(latest).astype(int).tolist(),
+            'averaged': np.round(snapshot.spectrum.astype(np.float64), 1).tolist(),
+            'max_hold': np.asarray(snapshot.max_hold).astype(int).tolist(),
+        })
+
+    async def serve_state(self, request):
+        await respond(request.writer, 200, self.cached('state', self.build_state),
+                      'application/json')
+
+    async def serve_spectrum(self, request):
+        body = self.cached('spectrum', self.build_spectrum)
+        if body is None:
+            await respond(request.writer, 503, encode_json({'error': 'нет данных прохода'}),
+                          'application/json')
+            return
+        await respond(request.writer, 200, body, 'application/json')
+
+    async def serve_stream(self, request):
+        """Поток WebSocket: кадры из очереди клиента до отключения"""
+        if not await websocket_accept(request):
+            return
+        client = StreamClient(request.peer, self.client_queue)
+        client.queue.put_nowait(self.hello_frame)
+        if self.plan_frame is not None:
+            client.queue.put_nowait(self.plan_frame)
+        # Первый проход клиент получит опорным кадром
+        client.resync = True
+        self.clients.add(client)
+        log.info("🌐 Клиент потока подключен: %s (всего %d)", client.peer, len(self.clients))
+        reader = asyncio.ensure_future(self.read_client(request.reader, client))
+        writer = request.writer
+        try:
+            while True:
+                frame = await client.queue.get()
+                if frame is None:
+                    writer.write(websocket_frame(WS_CLOSE, b''))
+                    await writer.drain()
+                    break
+                writer.write(frame)
+                await writer.drain()
+        finally:
+            self.clients.discard(client)
+            reader.cancel()
+            log.info("🌐 Клиент потока отключен: %s (пропусков %d)", client.peer,
+                     client.dropped)
+
+    async def read_client(self, reader, client):
+        """Управляющие кадры клиента: ping, close (данные клиента не используются)"""
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == WS_CLOSE:
+                    break
+                if opcode == WS_PING:
+                    try:
+                        client.queue.put_nowait(websocket_frame(WS_PONG, payload))
+                    except asyncio.QueueFull:
+                        pass
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+        self.disconnect(client)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Общий цикл asyncio сканера
+Проходы, ожидание установления RSSI, разнесенный прием, захват видео и
+сетевые эндпоинты - сопрограммы одного цикла событий в одном фоновом
+потоке. Блокирующие вызовы (spidev/GPIO, OpenCV) выполняются в именованных
+пулах ограниченного размера: по умолчанию один поток на приемник RX5808
+или видеовход, поэтому вызовы к одному устройству не пересекаются,
+а новые потребители не требуют новых потоков.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from event_log import get_logger
+
+log = get_logger('runtime')
+
+
+async def sleep_until(deadline, clock=time.monotonic):
+    """Ожидание до момента deadline (по clock; по умолчанию - часы цикла asyncio)"""
+    delay = deadline - clock()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class AsyncRuntime:
+    """Цикл событий в фоновом потоке и пулы для блокирующих вызовов
+
+    submit(coro)          - запуск сопрограммы из любого потока (concurrent.futures.Future)
+    executor(name, n)     - именованный пул не более чем из n потоков
+    offload(name, fn, *a) - вызов fn в пуле name из сопрограммы
+    """
+
+    def __init__(self, name='rpiskan-loop'):
+        self.name = name
+        self.loop = None
+        self.thread = None
+        self.executors = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Запуск потока цикла событий (повторный вызов ничего не делает)"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return self
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_exception_handler(self.on_exception)
+            ready = threading.Event()
+            self.thread = threading.Thread(target=self.run, args=(ready,), name=self.name,
+                                           daemon=True)
+            self.thread.start()
+        ready.wait()
+        return self
+
+    def run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            # Незавершенные сопрограммы (соединения клиентов, захват) отменяются
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self, timeout=2.0):
+        """Остановка цикла событий и пулов (незавершенные сопрограммы отменяются)"""
+        with self.lock:
+            thread, loop = self.thread, self.loop
+            executors, self.executors = list(self.executors.values()), {}
+        if thread is not None and thread.is_alive():
+            loop.call_soon_threadsafe(loop.stop)
+            if threading.current_thread() is not thread:
+                thread.join(timeout)
+        for executor in executors:
+            executor.shutdown(wait=False)
+
+    def on_exception(self, loop, context):
+        if isinstance(context.get('exception'), asyncio.CancelledError):
+            # Отмененные при остановке обработчики соединений - не ошибка
+            return
+        log.error("Ошибка в цикле событий: %s", context.get('exception', context['message']))
+
+    def in_loop(self):
+        """Выполняется ли вызов в потоке цикла событий"""
+        return threading.current_thread() is self.thread
+
+    def submit(self, coro):
+        """Запуск сопрограммы в цикле событий из любого потока"""
+        if self.loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Вызов callback в потоке цикла событий"""
+        if self.loop is None:
+            self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def executor(self, name, workers=1):
+        """Именованный пул потоков (создается при первом обращении)"""
+        with self.lock:
+            executor = self.executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+                self.executors[name] = executor
+            return executor
+
+    async def offload(self, name, function, *args):
+        """Блокирующий вызов function(*args) в пуле name"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor(name), function, *args)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_runtime():
+    """Общий для процесса цикл событий (запускается при первом обращении)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AsyncRuntime()
+        return _shared.start()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Двухэтапный проход «грубо - точно» по всему диапазону частот
+Сначала диапазон frequencies.frequency_range проходится крупным шагом,
+затем с шагом 1 МГц уточняются только окрестности грубых точек, которые
+выше шумового порога. Неизмеренные бины сетки заполняются интерполяцией,
+так что получается спектр полного разрешения за малую долю перестроек.
+"""
+
+import numpy as np
+
+
+class CoarseFinePlanner:
+    """План грубого и точного этапов прохода
+
+    min_mhz, max_mhz - диапазон сканирования
+    coarse_step      - шаг грубого этапа, МГц
+    fine_step        - шаг точной сетки, МГц
+    refine_span      - половина окна уточнения вокруг грубой точки, МГц
+    min_snr          - превышение над шумовым порогом для уточнения
+    """
+
+    def __init__(self, min_mhz=5725, max_mhz=6440, coarse_step=20, fine_step=1,
+                 refine_span=None, min_snr=6):
+        self.grid = np.arange(int(min_mhz), int(max_mhz) + 1, int(fine_step), dtype=np.int32)
+        self.fine_step = int(fine_step)
+        coarse_every = max(1, int(coarse_step) // self.fine_step)
+        coarse = np.arange(0, len(self.grid), coarse_every)
+        if coarse[-1] != len(self.grid) - 1:
+            coarse = np.append(coarse, len(self.grid) - 1)
+        self.coarse_index = coarse
+        self.coarse = self.grid[coarse]
+        # По умолчанию окно перекрывает промежуток до соседних грубых точек
+        span = coarse_step if refine_span is None else refine_span
+        self.offsets = np.arange(-(int(span) // self.fine_step), int(span) // self.fine_step + 1)
+        self.min_snr = min_snr
+
+        self.index = {int(freq): i for i, freq in enumerate(self.grid)}
+        self.coarse_values = np.zeros(len(self.coarse), dtype=np.float32)
+        self.coarse_position = {int(freq): i for i, freq in enumerate(self.coarse)}
+        self.measured = np.zeros(len(self.grid), dtype=bool)
+        self.values = np.zeros(len(self.grid), dtype=np.float32)
+        self.retunes = 0
+
+    @classmethod
+    def from_config(cls, config, frequency_range=None):
+        """frequency_range - (min, max) МГц; по умолчанию frequencies.frequency_range"""
+        if frequency_range is None:
+            configured = config.get('frequencies', {}).get('frequency_range', {})
+            frequency_range = (configured.get('min', 5725), configured.get('max', 6440))
+        sweep = config.get('scanner', {}).get('coarse_fine', {})
+        return cls(frequency_range[0], frequency_range[1],
+                   coarse_step=sweep.get('coarse_step', 20),
+                   fine_step=sweep.get('fine_step', 1),
+                   refine_span=sweep.get('refine_span'),
+                   min_snr=sweep.get('min_snr', 6))
+
+    def coarse_channels(self):
+        """Грубые точки как каналы планировщика: имя - частота"""
+        return {str(int(freq)): int(freq) for freq in self.coarse}
+
+    def begin_sweep(self):
+        self.measured[:] = False
+        self.retunes = 0
+
+    def record(self, frequency_mhz, rssi):
+        """Результат измерения точки (грубой или точной)"""
+        i = self.index.get(frequency_mhz)
+        if i is None:
+            return
+        self.values[i] = rssi
+        self.measured[i] = True
+        self.retunes += 1
+        position = self.coarse_position.get(frequency_mhz)
+        if position is not None:
+            self.coarse_values[position] = rssi
+
+    def noise_floor(self):
+        k = len(self.coarse_values) // 4
+        return float(np.partition(self.coarse_values, k)[k])
+
+    def fine_plan(self):
+        """Точные бины вокруг грубых точек выше шума: список (имя, частота)"""
+        hot = self.coarse_values > self.noise_floor() + self.min_snr
+        if not hot.any():
+            return []
+        bins = (self.coarse_index[hot][:, None] + self.offsets[None, :]).ravel()
+        bins = np.unique(bins[(bins >= 0) & (bins < len(self.grid))])
+        bins = bins[~self.measured[bins]]
+        return [(str(int(freq)), int(freq)) for freq in self.grid[bins]]
+
+    def estimate(self):
+        """Спектр полного разрешения: измеренные бины и интерполяция между ними
+
+        Грубые точки, пропущенные планировщиком в этом проходе, берутся
+        из последнего измерения.
+        """
+        self.values[self.coarse_index] = np.where(self.measured[self.coarse_index],
+                                                  self.values[self.coarse_index],
+                                                  self.coarse_values)
+        known = self.measured.copy()
+        known[self.coarse_index] = True
+        return np.interp(self.grid, self.grid[known], self.values[known]).astype(np.float32)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Разнесенный прием (diversity) для видео
+Два приемника RX5808 стоят на одной частоте, RSSI обоих опрашивается
+с высокой частотой, а активным источником видео (/dev/videoN) становится
+приемник с более сильным сигналом. Переключение - с гистерезисом и
+минимальным временем удержания; оба потока захвата работают постоянно,
+поэтому переключение не требует повторного открытия устройства.
+Опрос - сопрограмма в цикле событий движка, RSSI приемников читается
+параллельно в их пулах ввода-вывода.
+"""
+
+import asyncio
+import time
+
+from async_runtime import sleep_until
+from event_log import get_logger
+
+log = get_logger('diversity')
+
+
+class DiversityController:
+    """Выбор лучшего приемника для вывода видео
+
+    engine        - ScanEngine (не менее двух приемников)
+    pipelines     - потоки захвата видео, по одному на приемник
+    receivers     - индексы приемников движка для pipelines
+    hysteresis    - на сколько единиц RSSI другой приемник должен быть сильнее
+    min_dwell     - минимальное время на выбранном приемнике, с
+    poll_interval - период опроса RSSI, с
+    smoothing     - вес нового отсчета в сглаженном RSSI
+    on_switch     - вызывается при смене активного приемника: on_switch(index, pipeline)
+    """
+
+    def __init__(self, engine, pipelines, receivers=(0, 1), hysteresis=8, min_dwell=0.25,
+                 poll_interval=0.01, smoothing=0.3, on_switch=None):
+        self.engine = engine
+        self.pipelines = list(pipelines)
+        self.backends = [engine.backends[i] for i in receivers]
+        self.hysteresis = hysteresis
+        self.min_dwell = min_dwell
+        self.poll_interval = poll_interval
+        self.smoothing = smoothing
+        self.on_switch = on_switch
+        self.rssi = [0.0] * len(self.backends)
+        self.active = 0
+        self.switched_at = 0.0
+        self.switches = 0
+        self.frequency = None
+        self.resume_scanning = False
+        self.running = False
+        self.task = None
+
+    @classmethod
+    def from_config(cls, engine, pipelines, diversity_config, on_switch=None):
+        return cls(engine, pipelines,
+                   receivers=diversity_config.get('receivers', [0, 1]),
+                   hysteresis=diversity_config.get('hysteresis', 8),
+                   min_dwell=diversity_config.get('min_dwell', 0.25),
+                   poll_interval=diversity_config.get('poll_interval', 0.01),
+                   on_switch=on_switch)
+
+    @property
+    def pipeline(self):
+        """Поток захвата активного приемника"""
+        return self.pipelines[self.active]
+
+    def start(self, frequency_mhz):
+        """Парковка приемников на частоте и запуск выбора (из любого потока)"""
+        if self.running:
+            if frequency_mhz != self.frequency:
+                self.frequency = frequency_mhz
+                self.engine.runtime.submit(self.park())
+            return
+        self.frequency = frequency_mhz
+        self.running = True
+        for pipeline in self.pipelines:
+            if not pipeline.is_alive():
+                pipeline.start(self.engine.runtime)
+        # Предыдущий сеанс может еще завершаться (возобновление сканирования)
+        self.task = self.engine.runtime.submit(self.run(self.task))
+
+    def stop(self):
+        """Остановка выбора; сканирование возобновляется, если было остановлено"""
+        self.running = False
+
+    async def park(self):
+        await asyncio.gather(*(self.engine.tune(self.frequency, backend)
+                               for backend in self.backends))
+
+    async def run(self, previous=None):
+        if previous is not None and not previous.done():
+            await asyncio.wait([asyncio.wrap_future(previous)])
+
+        # Приемники заняты сканированием: останавливаем его на время приема.
+        # Отмена прохода обрабатывается циклом раньше парковки, а начатый
+        # вызов SPI завершается в пуле приемника до вызовов парковки
+        self.resume_scanning = self.engine.scanning
+        self.engine.stop()
+        await asyncio.sleep(0)
+
+        try:
+            await self.park()
+            log.info("📶 Разнесенный прием на %s МГц: %d приемника", self.frequency,
+                     len(self.backends), extra={'fields': {'type': 'diversity_start',
+                                                           'frequency': self.frequency}})
+            self.switched_at = time.monotonic()
+            deadline = self.switched_at
+            while self.running:
+                await self.poll()
+                # Опрос по сетке сроков: задержка одного опроса не сдвигает следующие
+                deadline = max(deadline + self.poll_interval, time.monotonic())
+                await sleep_until(deadline)
+        except Exception as e:
+            log.error("Ошибка разнесенного приема: %s", e)
+        finally:
+            self.running = False
+            if self.resume_scanning:
+                self.engine.start()
+
+    async def poll(self):
+        """Один опрос RSSI и, при необходимости, переключение источника"""
+        values = await asyncio.gather(*(self.engine.sample(backend)
+                                        for backend in self.backends))
+        for i, value in enumerate(values):
+            self.rssi[i] += (value - self.rssi[i]) * self.smoothing
+
+        best = max(range(len(self.rssi)), key=self.rssi.__getitem__)
+        now = time.monotonic()
+        if (best != self.active and
+                self.rssi[best] > self.rssi[self.active] + self.hysteresis and
+                now - self.switched_at >= self.min_dwell):
+            self.switch(best, now)
+
+    def switch(self, index, now=None):
+        previous = self.pipelines[self.active]
+        pipeline = self.pipelines[index]
+        # Запись, ретрансляция и вывод переходят на новый источник;
+        # старый кадр в кольце не показываем
+        pipeline.recorder, previous.recorder = previous.recorder, None
+        pipeline.stream, previous.stream = previous.stream, None
+        pipeline.ring.discard()
+        self.active = index
+        self.switched_at = time.monotonic() if now is None else now
+        self.switches += 1
+        rssi = [int(r) for r in self.rssi]
+        log.info("🔀 Видео: приемник %d (RSSI %s)", index, rssi,
+                 extra={'fields': {'type': 'diversity_switch', 'receiver': index,
+                                   'rssi': rssi, 'device': str(pipeline.device)}})
+        if self.on_switch is not None:
+            self.on_switch(index, pipeline)
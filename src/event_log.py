@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Журнал событий сканера без блокировки рабочих потоков
+Потоки сканирования и видео только кладут запись в ограниченную очередь;
+запись на диск (JSON-строки с ротацией по размеру, раздел logging
+в scanner_config.json) и вывод в консоль выполняет отдельный поток.
+Уровень журнала меняется на ходу через set_level().
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOGGER_NAME = 'rpiskan'
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+FALLBACK_LOG_FILE = '~/.cache/rpiskan/rpi_scanner.log'
+
+_SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def get_logger(name):
+    """Логгер подсистемы: rpiskan.<name>"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def parse_size(value, default=10 * 1024 * 1024):
+    """Размер из конфигурации: число байт или строка вида "10MB" """
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        text = str(value).strip().upper()
+        for unit in ('GB', 'MB', 'KB', 'B'):
+            if text.endswith(unit):
+                return int(float(text[:-len(unit)]) * _SIZE_UNITS[unit])
+        return int(float(text))
+    except ValueError:
+        return default
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Запись журнала одной JSON-строкой; поля события - из extra={'fields': ...}"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает запись"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventLog:
+    """Фоновый писатель журнала
+
+    file         - файл JSON-строк (None - только консоль)
+    level        - начальный уровень (DEBUG, INFO, WARNING, ERROR)
+    max_size     - размер файла до ротации
+    backup_count - число хранимых старых файлов
+    console      - поток для сообщений в консоль (None - без консоли)
+    """
+
+    def __init__(self, file=None, level='INFO', max_size=10 * 1024 * 1024,
+                 backup_count=5, console=sys.stdout, queue_size=4096):
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.queue = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.path = None
+
+        handlers = []
+        if file:
+            file_handler = self.open_file(file, max_size, backup_count)
+            if file_handler is not None:
+                file_handler.setFormatter(JsonLineFormatter())
+                handlers.append(file_handler)
+        if console is not None:
+            console_handler = logging.StreamHandler(console)
+            console_handler.setFormatter(logging.Formatter('%(message)s'))
+            handlers.append(console_handler)
+
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers,
+                                                       respect_handler_level=True)
+        self.lock = threading.Lock()
+        self.set_level(level)
+
+    @classmethod
+    def from_config(cls, logging_config, console=sys.stdout):
+        enabled = logging_config.get('enabled', True)
+        return cls(logging_config.get('file') if enabled else None,
+                   level=logging_config.get('level', 'INFO'),
+                   max_size=parse_size(logging_config.get('max_size', '10MB')),
+                   backup_count=logging_config.get('backup_count', 5),
+                   console=console)
+
+    def open_file(self, path, max_size, backup_count):
+        """Файл с ротацией; если путь недоступен (нет прав на /var/log) - в ~/.cache"""
+        for candidate in (path, FALLBACK_LOG_FILE):
+            candidate = os.path.expanduser(candidate)
+            try:
+                os.makedirs(os.path.dirname(candidate) or '.', exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    candidate, maxBytes=max_size, backupCount=backup_count,
+                    encoding='utf-8')
+                self.path = candidate
+                return handler
+            except OSError as e:
+                print(f"⚠️  Журнал {candidate} недоступен: {e}")
+        return None
+
+    def start(self):
+        """Подключение к логгеру rpiskan и запуск потока записи"""
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.listener.start()
+        return self
+
+    def close(self):
+        """Остановка с записью всего, что осталось в очереди"""
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    @property
+    def dropped(self):
+        return self.handler.dropped
+
+    @property
+    def level(self):
+        return logging.getLevelName(self.logger.level)
+
+    def set_level(self, level):
+        """Смена уровня журнала без перезапуска (из любого потока)"""
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+        with self.lock:
+            self.logger.setLevel(level)
+        return self.level
+
+    def cycle_level(self):
+        """Следующий уровень подробности по кругу (для сигнала SIGUSR1)"""
+        current = self.level if self.level in LEVELS else 'INFO'
+        return self.set_level(LEVELS[(LEVELS.index(current) + 1) % len(LEVELS)])
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Минимальный HTTP/1.1 и WebSocket (RFC 6455) поверх asyncio
+Эндпоинты сканера (метрики, API, видео) - маршруты HttpService в общем
+цикле событий. Один запрос на соединение; потоковые обработчики
+(WebSocket, multipart) держат соединение до отключения клиента.
+"""
+
+import asyncio
+import base64
+import hashlib
+import struct
+from urllib.parse import parse_qs, urlsplit
+
+from async_runtime import get_runtime
+from event_log import get_logger
+
+REQUEST_TIMEOUT = 5.0
+MAX_HEADERS = 64
+
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+WS_MAX_PAYLOAD = 4096
+
+STATUS_TEXT = {200: 'OK', 101: 'Switching Protocols', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+log = get_logger('http')
+
+
+class HttpRequest:
+    """Разобранный запрос: метод, путь, параметры и заголовки (имена в нижнем регистре)"""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'reader', 'writer')
+
+    def __init__(self, method, path, query, headers, reader, writer):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+
+    def param(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    @property
+    def peer(self):
+        peer = self.writer.get_extra_info('peername')
+        return f"{peer[0]}:{peer[1]}" if peer else '?'
+
+
+async def read_request(reader, writer, timeout=REQUEST_TIMEOUT):
+    """Чтение строки запроса и заголовков; ValueError при некорректном запросе"""
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        raise ValueError("некорректная строка запроса")
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise ValueError("слишком много заголовков")
+    url = urlsplit(parts[1])
+    return HttpRequest(parts[0], url.path, parse_qs(url.query), headers, reader, writer)
+
+
+def response_head(status, content_type=None, length=None, headers=()):
+    """Строка статуса и заголовки ответа"""
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    if content_type is not None:
+        lines.append(f"Content-Type: {content_type}")
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+async def respond(writer, status, body=b'', content_type='text/plain; charset=utf-8',
+                  headers=()):
+    """Ответ целиком (с Connection: close)"""
+    writer.write(response_head(status, content_type, len(body),
+                               (('Cache-Control', 'no-store'), ('Connection', 'close'),
+                                *headers)))
+    writer.write(body)
+    await writer.drain()
+
+
+def websocket_frame(opcode, payload):
+    """Кадр WebSocket от сервера (без маски): заголовок и данные одним bytes"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def websocket_accept(request):
+    """Ответ 101 на запрос Upgrade: websocket; False, если это не WebSocket"""
+    key = request.headers.get('sec-websocket-key')
+    if request.headers.get('upgrade', '').lower() != 'websocket' or not key:
+        await respond(request.writer, 400, b'WebSocket upgrade required\n')
+        return False
+    accept = base64.b64encode(hashlib.sha1(key.encode('latin-1') + WS_GUID).digest())
+    request.writer.write(response_head(101, headers=(
+        ('Upgrade', 'websocket'), ('Connection', 'Upgrade'),
+        ('Sec-WebSocket-Accept', accept.decode('ascii')))))
+    await request.writer.drain()
+    return True
+
+
+async def read_websocket_frame(reader):
+    """Кадр от клиента: (opcode, данные); фрагменты не склеиваются"""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if length > WS_MAX_PAYLOAD:
+        raise ValueError("слишком большой кадр WebSocket")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class HttpService:
+    """HTTP-сервер в общем цикле asyncio: маршруты {путь: async handler(request)}
+
+    Обработчик сам пишет ответ в request.writer; соединение закрывается
+    после его завершения.
+    """
+
+    def __init__(self, host, port, routes, runtime=None, name='HTTP'):
+        self.host = host
+        self.port = port
+        self.routes = dict(routes)
+        self.runtime = runtime
+        self.name = name
+        self.server = None
+
+    def start(self):
+        """Запуск сервера; None, если порт недоступен"""
+        if self.runtime is None:
+            self.runtime = get_runtime()
+        try:
+            self.server = self.runtime.submit(
+                asyncio.start_server(self.handle, self.host, self.port)).result(timeout=5.0)
+        except OSError as e:
+            log.warning("⚠️  %s %s:%s недоступен: %s", self.name, self.host, self.port, e)
+            return None
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    def url(self, path=''):
+        return f"http://{self.host}:{self.port}{path}"
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                request = await read_request(reader, writer)
+            except ValueError:
+                await respond(writer, 400, b'Bad Request\n')
+                return
+            handler = self.routes.get(request.path)
+            if handler is None:
+                await respond(writer, 404, b'Not Found\n')
+            elif request.method not in ('GET', 'HEAD'):
+                await respond(writer, 405, b'Method Not Allowed\n', headers=(('Allow', 'GET'),))
+            else:
+                await handler(request)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            log.error("Ошибка обработки запроса %s: %s", self.name, e)
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.server is not None:
+            self.runtime.call_soon(self.server.close)
+            self.server = None
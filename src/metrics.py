@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Метрики горячего пути сканера
+Замеры времени этапов (запись SPI, перестройка, чтение RSSI, отрисовка,
+вывод видео) пишутся в предвыделенные кольца отсчетов; процентили
+считаются только при чтении. Метрики отдаются в текстовом формате
+Prometheus по HTTP на localhost и в панель статистики GUI.
+"""
+
+import time
+
+import numpy as np
+
+from event_log import get_logger
+from http_service import HttpService, respond
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+log = get_logger('metrics')
+
+
+class LatencyHistogram:
+    """Скользящее окно длительностей этапа (последние window замеров)
+
+    observe() - только запись в предвыделенный массив, без блокировок.
+    При нескольких приемниках этап пишут несколько потоков: в худшем
+    случае один отсчет затирается другим, что для процентилей несущественно.
+    """
+
+    def __init__(self, window=1024):
+        self.samples = np.zeros(int(window), dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.samples[self.index] = seconds
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+        self.sum += seconds
+
+    def time(self):
+        """Контекстный менеджер замера: with histogram.time(): ..."""
+        return _Timer(self)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Процентили по окну, с (None, если замеров еще не было)"""
+        filled = min(self.count, len(self.samples))
+        if filled == 0:
+            return None
+        return np.quantile(self.samples[:filled], quantiles)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class RateMeter:
+    """Частота событий (например, проходов в секунду) по последним window событиям"""
+
+    def __init__(self, window=32, clock=time.monotonic):
+        self.times = np.zeros(int(window), dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.clock = clock
+
+    def mark(self):
+        self.times[self.index] = self.clock()
+        self.index = (self.index + 1) % len(self.times)
+        self.count += 1
+
+    def rate(self):
+        filled = min(self.count, len(self.times))
+        if filled < 2:
+            return 0.0
+        newest = self.times[(self.index - 1) % len(self.times)]
+        oldest = self.times[self.index % filled] if filled == len(self.times) else self.times[0]
+        if newest <= oldest:
+            return 0.0
+        return (filled - 1) / (newest - oldest)
+
+
+class MetricsRegistry:
+    """Набор метрик сканера
+
+    stage(name)        - гистограмма длительности этапа горячего пути
+    counter(name)      - монотонный счетчик
+    rate(name)         - частота событий
+    gauge(name, func)  - значение, читаемое при запросе (счетчики потерь кадров и т.п.)
+    """
+
+    def __init__(self, window=1024, prefix='rpiskan'):
+        self.window = window
+        self.prefix = prefix
+        self.stages = {}
+        self.counters = {}
+        self.rates = {}
+        self.gauges = {}
+
+    def stage(self, name):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = LatencyHistogram(self.window)
+        return histogram
+
+    def counter(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def rate(self, name):
+        meter = self.rates.get(name)
+        if meter is None:
+            meter = self.rates[name] = RateMeter()
+        return meter
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    def remove_gauge(self, name):
+        self.gauges.pop(name, None)
+
+    def read_gauges(self):
+        values = {}
+        for name, func in list(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            if value is not None:
+                values[name] = value
+        return values
+
+    def summary(self):
+        """Сводка для панели статистики: {stage: (p50, p95, p99, count)}"""
+        stages = {}
+        for name, histogram in list(self.stages.items()):
+            values = histogram.quantiles()
+            if values is not None:
+                stages[name] = (*values, histogram.count)
+        return stages
+
+    def render_prometheus(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Длительность этапов горячего пути",
+                 f"# TYPE {p}_stage_seconds summary"]
+        for name, histogram in list(self.stages.items()):
+            values = histogram.quantiles()
+            if values is not None:
+                for q, value in zip(QUANTILES, values):
+                    lines.append(f'{p}_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.9f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {histogram.sum:.9f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+
+        for name, value in list(self.counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+
+        for name, meter in list(self.rates.items()):
+            lines.append(f"# TYPE {p}_{name}_per_second gauge")
+            lines.append(f"{p}_{name}_per_second {meter.rate():.3f}")
+
+        for name, value in self.read_gauges().items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в общем цикле asyncio (по умолчанию только localhost)"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108, runtime=None):
+        self.registry = registry
+        self.service = HttpService(host, port, {'/metrics': self.handle},
+                                   runtime=runtime, name="Эндпоинт метрик")
+
+    @classmethod
+    def from_config(cls, registry, metrics_config, runtime=None):
+        return cls(registry, metrics_config.get('host', '127.0.0.1'),
+                   metrics_config.get('port', 9108), runtime=runtime)
+
+    @property
+    def port(self):
+        return self.service.port
+
+    def start(self):
+        if self.service.start() is None:
+            return None
+        log.info("📈 Метрики: %s", self.service.url('/metrics'))
+        return self
+
+    async def handle(self, request):
+        body = self.registry.render_prometheus().encode('utf-8')
+        await respond(request.writer, 200, body, 'text/plain; version=0.0.4; charset=utf-8')
+
+    def close(self):
+        self.service.close()
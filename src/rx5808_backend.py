@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Бэкенды радиомодуля RX5808
+Реальный SPI/GPIO бэкенд для Raspberry Pi и детерминированный симулятор
+для запуска и профилирования сканера на обычном Linux без оборудования
+"""
+
+import math
+import os
+import random
+import threading
+import time
+
+# Диапазон таблицы перестройки с шагом 1 МГц
+TABLE_MIN_MHZ = 5725
+TABLE_MAX_MHZ = 6000
+
+
+def register_commands(frequency_mhz):
+    """Последовательность командных байт для перестройки на частоту"""
+    freq_reg = int((frequency_mhz - 479) / 2)
+    return ((0x01 << 3) | (freq_reg & 0xFF),
+            (0x02 << 3) | ((freq_reg >> 8) & 0xFF),
+            (0x00 << 3) | 0x01)
+
+
+class RetuneTable:
+    """Предвычисленные командные байты перестройки по частотам
+
+    Заполняется один раз при старте: каналы конфигурации плюс каждый МГц
+    из диапазона TABLE_MIN_MHZ..TABLE_MAX_MHZ. Частоты вне таблицы
+    вычисляются при первом обращении и кэшируются.
+    """
+
+    def __init__(self, frequencies=(), min_mhz=TABLE_MIN_MHZ, max_mhz=TABLE_MAX_MHZ):
+        self.commands = {}
+        for freq in range(min_mhz, max_mhz + 1):
+            self.commands[freq] = register_commands(freq)
+        for freq in frequencies:
+            self.commands[freq] = register_commands(freq)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __contains__(self, frequency_mhz):
+        return frequency_mhz in self.commands
+
+    def get(self, frequency_mhz):
+        commands = self.commands.get(frequency_mhz)
+        if commands is None:
+            commands = self.commands[frequency_mhz] = register_commands(frequency_mhz)
+        return commands
+
+
+# Блокировки шин SPI: приемники на одной шине (разные CS) не должны
+# перемежать транзакции из разных потоков
+_BUS_LOCKS = {}
+_BUS_LOCKS_GUARD = threading.Lock()
+
+
+def bus_lock(spi_bus, spi_device):
+    with _BUS_LOCKS_GUARD:
+        return _BUS_LOCKS.setdefault((spi_bus, spi_device), threading.Lock())
+
+
+class RX5808Backend:
+    """Базовый интерфейс радиобэкенда RX5808"""
+
+    name = "base"
+    retune_table = None
+    # Гистограмма длительности транзакции записи (MetricsRegistry.stage), если задана
+    write_timer = None
+
+    def open(self):
+        """Инициализация бэкенда. Возвращает True при успехе"""
+        raise NotImplementedError
+
+    def load_retune_table(self, table):
+        """Подключение предвычисленной таблицы перестройки"""
+        self.retune_table = table
+
+    def commands_for(self, frequency_mhz):
+        if self.retune_table is not None:
+            return self.retune_table.get(frequency_mhz)
+        return register_commands(frequency_mhz)
+
+    def write_commands(self, commands):
+        """Передача последовательности командных байт одной транзакцией"""
+        raise NotImplementedError
+
+    def write_register(self, address, data):
+        """Запись данных в регистр RX5808"""
+        self.write_commands(((address << 3) | data,))
+
+    def set_frequency(self, frequency_mhz):
+        """Установка частоты приемника в МГц"""
+        self.write_commands(self.commands_for(frequency_mhz))
+
+    def read_rssi(self):
+        """Чтение значения RSSI (0-255)"""
+        raise NotImplementedError
+
+    def close(self):
+        """Освобождение ресурсов"""
+        pass
+
+
+class SpiRX5808Backend(RX5808Backend):
+    """RX5808 на шине SPI Raspberry Pi с ручным управлением CS через GPIO"""
+
+    name = "spi"
+
+    def __init__(self, cs_pin=8, spi_bus=0, spi_device=0, spi_speed=2000000):
+        self.cs_pin = cs_pin
+        self.spi_bus = spi_bus
+        self.spi_device = spi_device
+        self.spi_speed = spi_speed
+        self.spi = None
+        self.GPIO = None
+        self.lock = bus_lock(spi_bus, spi_device)
+
+    @property
+    def device_path(self):
+        return f"/dev/spidev{self.spi_bus}.{self.spi_device}"
+
+    def spi_available(self):
+        """Проверка наличия SPI устройства в системе"""
+        return (os.path.exists(self.device_path) or
+                os.path.exists(f"/dev/spi{self.spi_bus}.{self.spi_device}"))
+
+    def open(self):
+        # Импорт только на Raspberry Pi: модули недоступны на обычном Linux
+        import RPi.GPIO as GPIO
+        import spidev
+
+        self.GPIO = GPIO
+
+        # Настройка GPIO
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.cs_pin, GPIO.OUT)
+        GPIO.output(self.cs_pin, GPIO.HIGH)
+
+        # Настройка SPI
+        self.spi = spidev.SpiDev()
+        self.spi.open(self.spi_bus, self.spi_device)
+        self.spi.max_speed_hz = self.spi_speed
+        self.spi.mode = 0
+        return True
+
+    def write_commands(self, commands):
+        # Одна транзакция xfer2 и одно переключение CS на всю перестройку
+        with self.lock:
+            started = time.perf_counter()
+            self.GPIO.output(self.cs_pin, self.GPIO.LOW)
+            self.spi.xfer2(list(commands))
+            self.GPIO.output(self.cs_pin, self.GPIO.HIGH)
+            elapsed = time.perf_counter() - started
+        if self.write_timer is not None:
+            self.write_timer.observe(elapsed)
+
+    def read_rssi(self):
+        with self.lock:
+            self.GPIO.output(self.cs_pin, self.GPIO.LOW)
+            self.spi.writebytes([0x08])
+            response = self.spi.readbytes(1)
+            self.GPIO.output(self.cs_pin, self.GPIO.HIGH)
+        return response[0] if response else 0
+
+    def close(self):
+        try:
+            if self.GPIO is not None:
+                # Только свой CS: остальные приемники могут еще работать
+                self.GPIO.cleanup(self.cs_pin)
+            if self.spi is not None:
+                self.spi.close()
+        except Exception:
+            pass
+
+
+class SimulatedTransmitter:
+    """Сценарный передатчик для симулятора
+
+    frequency  - центральная частота, МГц
+    rssi       - пиковое значение RSSI на центральной частоте
+    bandwidth  - ширина занимаемой полосы, МГц (аналоговое видео ~ 20 МГц)
+    start/stop - время активности относительно открытия бэкенда, с
+    period/duty - периодическое включение (duty - доля периода в эфире)
+    drift      - уход частоты, МГц/с
+    """
+
+    def __init__(self, frequency, rssi=180, bandwidth=20.0, start=0.0,
+                 stop=None, period=None, duty=1.0, drift=0.0):
+        self.frequency = frequency
+        self.rssi = rssi
+        self.bandwidth = bandwidth
+        self.start = start
+        self.stop = stop
+        self.period = period
+        self.duty = duty
+        self.drift = drift
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def is_active(self, t):
+        if t < self.start or (self.stop is not None and t >= self.stop):
+            return False
+        if self.period:
+            return ((t - self.start) % self.period) < self.period * self.duty
+        return True
+
+    def level_at(self, frequency_mhz, t):
+        """Вклад передатчика в RSSI на заданной частоте"""
+        if not self.is_active(t):
+            return 0.0
+        center = self.frequency + self.drift * (t - self.start)
+        half = max(self.bandwidth / 2.0, 0.5)
+        offset = abs(frequency_mhz - center) / half
+        # Гауссова форма спектра, спад до ~10% на краю полосы
+        return self.rssi * math.exp(-2.3 * offset * offset)
+
+
+# Передатчики по умолчанию: пики на популярных каналах, как в read_rssi_simulated
+DEFAULT_TRANSMITTERS = [
+    {'frequency': 5865, 'rssi': 160, 'bandwidth': 20.0},
+    {'frequency': 5845, 'rssi': 110, 'bandwidth': 20.0, 'period': 3.0, 'duty': 0.5},
+    {'frequency': 5825, 'rssi': 90, 'bandwidth': 20.0, 'period': 5.0, 'duty': 0.3},
+]
+
+
+class SimulatedRX5808Backend(RX5808Backend):
+    """Детерминированный симулятор RX5808
+
+    После перестройки показания RSSI экспоненциально приближаются к уровню
+    новой частоты с постоянной времени settle_tau, что моделирует захват PLL.
+    Шум генерируется из random.Random(seed), поэтому прогоны воспроизводимы.
+    Задержки spi_latency/rssi_latency моделируют стоимость одной транзакции
+    SPI и чтения RSSI.
+    """
+
+    name = "simulated"
+
+    def __init__(self, transmitters=None, noise_floor=25.0, noise_sigma=4.0,
+                 settle_tau=0.008, spi_latency=0.0, rssi_latency=0.0,
+                 seed=5808, clock=time.monotonic, sleep=time.sleep):
+        if transmitters is None:
+            transmitters = DEFAULT_TRANSMITTERS
+        self.transmitters = [t if isinstance(t, SimulatedTransmitter)
+                             else SimulatedTransmitter.from_dict(t)
+                             for t in transmitters]
+        self.noise_floor = noise_floor
+        self.noise_sigma = noise_sigma
+        self.settle_tau = settle_tau
+        self.spi_latency = spi_latency
+        self.rssi_latency = rssi_latency
+        self.seed = seed
+        self.clock = clock
+        self.sleep = sleep
+        self.registers = {}
+        self.frequency = None
+        self.level_before = noise_floor
+        self.tuned_at = 0.0
+        self.epoch = 0.0
+        self.retune_count = 0
+        self.spi_transactions = 0
+        self.rssi_reads = 0
+        self.rng = random.Random(seed)
+
+    def open(self):
+        self.epoch = self.clock()
+        self.tuned_at = self.epoch
+        self.rng = random.Random(self.seed)
+        return True
+
+    def elapsed(self):
+        """Время с момента открытия бэкенда, с"""
+        return self.clock() - self.epoch
+
+    def level_at(self, frequency_mhz, t=None):
+        """Установившийся (без шума) уровень RSSI на частоте"""
+        if frequency_mhz is None:
+            return self.noise_floor
+        if t is None:
+            t = self.elapsed()
+        level = self.noise_floor
+        for transmitter in self.transmitters:
+            level = max(level, self.noise_floor + transmitter.level_at(frequency_mhz, t))
+        return level
+
+    def write_commands(self, commands):
+        started = time.perf_counter()
+        self.spi_transactions += 1
+        if self.spi_latency:
+            self.sleep(self.spi_latency)
+        if self.write_timer is not None:
+            self.write_timer.observe(time.perf_counter() - started)
+
+    def write_register(self, address, data):
+        self.write_commands(((address << 3) | data,))
+        self.registers[address] = data
+        # Запись в регистр 0x00 защелкивает новую частоту
+        if address == 0x00:
+            freq_reg = self.registers.get(0x01, 0) | (self.registers.get(0x02, 0) << 8)
+            self.tune(freq_reg * 2 + 479)
+
+    def tune(self, frequency_mhz):
+        now = self.clock()
+        self.level_before = self.current_level(now)
+        self.frequency = frequency_mhz
+        self.tuned_at = now
+        self.retune_count += 1
+
+    def set_frequency(self, frequency_mhz):
+        # Регистр хранит (f - 479) / 2, поэтому нечетные частоты округляются;
+        # симулятор настраивается точно на запрошенную частоту
+        self.write_commands(self.commands_for(frequency_mhz))
+        self.tune(frequency_mhz)
+
+    def current_level(self, now=None):
+        """Уровень с учетом переходного процесса после перестройки"""
+        if now is None:
+            now = self.clock()
+        target = self.level_at(self.frequency, now - self.epoch)
+        if self.settle_tau <= 0:
+            return target
+        k = 1.0 - math.exp(-(now - self.tuned_at) / self.settle_tau)
+        return self.level_before + (target - self.level_before) * k
+
+    def read_rssi(self):
+        self.rssi_reads += 1
+        if self.rssi_latency:
+            self.sleep(self.rssi_latency)
+        value = self.current_level() + self.rng.gauss(0.0, self.noise_sigma)
+        return max(0, min(255, int(round(value))))
+
+
+def create_backend(kind="spi", **options):
+    """Создание бэкенда по имени: 'spi' или 'simulated'"""
+    if kind == "spi":
+        return SpiRX5808Backend(**options)
+    if kind in ("simulated", "sim"):
+        return SimulatedRX5808Backend(**options)
+    raise ValueError(f"Неизвестный бэкенд RX5808: {kind}")
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Проверка scanner_config.json и компиляция режимов сканирования
+Каждый режим из scanner.scan_modes превращается в готовый план: каналы
+в порядке частот, предвычисленные командные байты перестройки и пороги
+обнаружения по бинам. Наблюдатель за файлом (inotify, без него - опрос
+времени изменения) передает новую конфигурацию движку, который меняет
+план между проходами без перезапуска.
+"""
+
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+import numpy as np
+
+from event_log import get_logger
+from rx5808_backend import RetuneTable
+
+# FPV каналы 5.8 ГГц по умолчанию
+DEFAULT_CHANNELS = {
+    'A': 5865, 'B': 5845, 'C': 5825, 'D': 5805,
+    'E': 5785, 'F': 5765, 'G': 5745, 'H': 5725
+}
+# Режим по умолчанию, если scanner.scan_modes не задан: все каналы
+DEFAULT_MODE = 'all'
+SWEEP_MODES = ('channels', 'coarse_fine')
+
+# Допустимые частоты синтезатора RX5808, МГц
+MIN_FREQUENCY_MHZ = 5000
+MAX_FREQUENCY_MHZ = 6500
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT_HEADER = struct.Struct('iIII')
+
+log = get_logger('config')
+
+
+class ConfigError(ValueError):
+    """Ошибки проверки конфигурации (problems - список описаний)"""
+
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = list(problems)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_frequency(value):
+    return (isinstance(value, int) and not isinstance(value, bool) and
+            MIN_FREQUENCY_MHZ <= value <= MAX_FREQUENCY_MHZ)
+
+
+def _check_range(problems, where, value):
+    if not isinstance(value, dict):
+        problems.append(f"{where}: ожидается объект {{min, max}}")
+    elif not (_is_frequency(value.get('min')) and _is_frequency(value.get('max'))):
+        problems.append(f"{where}: min и max - целые МГц в диапазоне "
+                        f"{MIN_FREQUENCY_MHZ}-{MAX_FREQUENCY_MHZ}")
+    elif value['min'] > value['max']:
+        problems.append(f"{where}: min больше max")
+
+
+def _check_threshold(problems, where, value):
+    if value is not None and not (_is_number(value) and 0 <= value <= 255):
+        problems.append(f"{where}: порог RSSI - число 0-255")
+
+
+def validate_config(config):
+    """Список ошибок конфигурации (пустой, если конфигурация корректна)"""
+    if not isinstance(config, dict):
+        return ["конфигурация должна быть объектом JSON"]
+    problems = []
+    frequencies = config.get('frequencies', {})
+    scanner = config.get('scanner', {})
+    for section, value in (('frequencies', frequencies), ('scanner', scanner)):
+        if not isinstance(value, dict):
+            problems.append(f"{section}: ожидается объект")
+    if problems:
+        return problems
+
+    channels = frequencies.get('channels', DEFAULT_CHANNELS)
+    if not isinstance(channels, dict) or not channels:
+        problems.append("frequencies.channels: ожидается непустой объект имя -> частота")
+        channels = {}
+    for name, freq in channels.items():
+        if not _is_frequency(freq):
+            problems.append(f"frequencies.channels.{name}: частота {freq!r} вне "
+                            f"{MIN_FREQUENCY_MHZ}-{MAX_FREQUENCY_MHZ} МГц")
+    if 'frequency_range' in frequencies:
+        _check_range(problems, "frequencies.frequency_range", frequencies['frequency_range'])
+
+    for band_name, band in frequencies.get('frequency_bands', {}).items():
+        where = f"frequencies.frequency_bands.{band_name}"
+        if not isinstance(band, dict):
+            problems.append(f"{where}: ожидается объект")
+            continue
+        unknown = [c for c in band.get('channels', []) if c not in channels]
+        if unknown:
+            problems.append(f"{where}.channels: неизвестные каналы {unknown}")
+        _check_threshold(problems, f"{where}.threshold", band.get('threshold'))
+
+    _check_threshold(problems, "scanner.rssi_threshold", scanner.get('rssi_threshold'))
+    _check_threshold(problems, "scanner.strong_signal_threshold",
+                     scanner.get('strong_signal_threshold'))
+    if (_is_number(scanner.get('rssi_threshold')) and
+            _is_number(scanner.get('strong_signal_threshold')) and
+            scanner['strong_signal_threshold'] < scanner['rssi_threshold']):
+        problems.append("scanner.strong_signal_threshold меньше scanner.rssi_threshold")
+    for key in ('scan_interval', 'min_scan_interval', 'settling_time'):
+        value = scanner.get(key)
+        if value is not None and not (_is_number(value) and value >= 0):
+            problems.append(f"scanner.{key}: ожидается неотрицательное число, с")
+    if scanner.get('sweep_mode', 'channels') not in SWEEP_MODES:
+        problems.append(f"scanner.sweep_mode: одно из {list(SWEEP_MODES)}")
+
+    modes = scanner.get('scan_modes', {})
+    if not isinstance(modes, dict):
+        problems.append("scanner.scan_modes: ожидается объект")
+        modes = {}
+    for mode_name, mode in modes.items():
+        where = f"scanner.scan_modes.{mode_name}"
+        if not isinstance(mode, dict):
+            problems.append(f"{where}: ожидается объект")
+            continue
+        mode_channels = mode.get('channels', 'all')
+        if mode_channels != 'all':
+            if not isinstance(mode_channels, list):
+                problems.append(f"{where}.channels: \"all\" или список каналов")
+            else:
+                unknown = [c for c in mode_channels if c not in channels]
+                if unknown:
+                    problems.append(f"{where}.channels: неизвестные каналы {unknown}")
+        if mode.get('sweep_mode', 'channels') not in SWEEP_MODES:
+            problems.append(f"{where}.sweep_mode: одно из {list(SWEEP_MODES)}")
+        if 'range' in mode:
+            _check_range(problems, f"{where}.range", mode['range'])
+        _check_threshold(problems, f"{where}.rssi_threshold", mode.get('rssi_threshold'))
+
+    scan_mode = scanner.get('scan_mode')
+    if scan_mode is not None and scan_mode not in (modes or {DEFAULT_MODE: None}):
+        problems.append(f"scanner.scan_mode: режим {scan_mode!r} не описан в scanner.scan_modes")
+    return problems
+
+
+class ScanPlan:
+    """Скомпилированный режим сканирования
+
+    channels           - каналы режима (имя -> частота) по возрастанию частоты
+    frequencies        - частоты каналов, МГц (np.int32)
+    sweep_mode         - 'channels' или 'coarse_fine'
+    range              - (min, max) МГц для прохода «грубо - точно»
+    retune_table       - командные байты перестройки для всех частот плана
+    rssi_threshold     - базовый порог обнаружения режима
+    channel_thresholds - порог по имени канала (с учетом порогов диапазонов)
+    config             - проверенная конфигурация, из которой собран план
+    """
+
+    __slots__ = ('mode', 'name', 'channels', 'frequencies', 'sweep_mode', 'range',
+                 'retune_table', 'rssi_threshold', 'strong_signal_threshold',
+                 'channel_thresholds', 'config')
+
+    def __init__(self, mode, name, channels, sweep_mode, frequency_range, rssi_threshold,
+                 strong_signal_threshold, channel_thresholds, config):
+        self.mode = mode
+        self.name = name
+        self.channels = dict(sorted(channels.items(), key=lambda item: item[1]))
+        self.frequencies = np.fromiter(self.channels.values(), dtype=np.int32,
+                                       count=len(self.channels))
+        self.sweep_mode = sweep_mode
+        self.range = frequency_range
+        self.rssi_threshold = rssi_threshold
+        self.strong_signal_threshold = strong_signal_threshold
+        self.channel_thresholds = channel_thresholds
+        self.config = config
+
+        tuned = set(self.channels.values())
+        if sweep_mode == 'coarse_fine':
+            tuned.update(range(frequency_range[0], frequency_range[1] + 1))
+        self.retune_table = RetuneTable(tuned)
+
+    def bin_thresholds(self, frequencies):
+        """Пороги обнаружения для бинов истории (np.float32)"""
+        frequencies = np.asarray(frequencies)
+        thresholds = np.full(len(frequencies), self.rssi_threshold, dtype=np.float32)
+        for name, threshold in self.channel_thresholds.items():
+            thresholds[frequencies == self.channels[name]] = threshold
+        return thresholds
+
+
+def compile_plans(config):
+    """Проверка конфигурации и компиляция всех режимов: {режим: ScanPlan}
+
+    Режим с пустым списком каналов (custom_range) сканирует свой range
+    или frequencies.frequency_range проходом «грубо - точно».
+    ConfigError, если конфигурация некорректна.
+    """
+    problems = validate_config(config)
+    if problems:
+        raise ConfigError(problems)
+
+    frequencies = config.get('frequencies', {})
+    scanner = config.get('scanner', {})
+    channels = frequencies.get('channels', DEFAULT_CHANNELS)
+    full_range = frequencies.get('frequency_range', {})
+    full_range = (full_range.get('min', min(channels.values())),
+                  full_range.get('max', max(channels.values())))
+    rssi_threshold = scanner.get('rssi_threshold', 50)
+    strong_threshold = scanner.get('strong_signal_threshold', 100)
+
+    # Пороги диапазонов (frequency_bands.*.threshold) по каналам
+    band_thresholds = {}
+    for band in frequencies.get('frequency_bands', {}).values():
+        if band.get('threshold') is not None:
+            for name in band.get('channels', []):
+                band_thresholds[name] = band['threshold']
+
+    modes = scanner.get('scan_modes') or {DEFAULT_MODE: {'name': "All channels"}}
+    plans = {}
+    for mode_name, mode in modes.items():
+        names = mode.get('channels', 'all')
+        if names == 'all':
+            names = list(channels)
+        mode_channels = {name: channels[name] for name in names}
+        sweep_mode = mode.get('sweep_mode', scanner.get('sweep_mode', 'channels'))
+        if not mode_channels:
+            sweep_mode = 'coarse_fine'
+        if 'range' in mode:
+            frequency_range = (mode['range']['min'], mode['range']['max'])
+        elif sweep_mode == 'channels':
+            frequency_range = (min(mode_channels.values()), max(mode_channels.values()))
+        else:
+            # Проход «грубо - точно» без своего range - по всему frequency_range
+            frequency_range = full_range
+        threshold = mode.get('rssi_threshold', rssi_threshold)
+        plans[mode_name] = ScanPlan(
+            mode_name, mode.get('name', mode_name), mode_channels, sweep_mode,
+            frequency_range, threshold, max(threshold, strong_threshold),
+            {name: band_thresholds[name] for name in mode_channels if name in band_thresholds},
+            config)
+    return plans
+
+
+def select_mode(config, plans):
+    """Имя активного режима: scanner.scan_mode или первый описанный"""
+    mode = config.get('scanner', {}).get('scan_mode')
+    return mode if mode in plans else next(iter(plans))
+
+
+def override_scanner(config, **values):
+    """Переопределение параметров раздела scanner (аргументы командной строки)"""
+    scanner = config.setdefault('scanner', {})
+    for key, value in values.items():
+        if value is not None:
+            scanner[key] = value
+    return config
+
+
+def read_config(path):
+    """Чтение файла конфигурации; ConfigError при ошибке чтения или JSON"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError([f"{path}: {e}"]) from e
+
+
+def _inotify():
+    """libc с inotify_init1/inotify_add_watch или None (не Linux)"""
+    # ctypes.util тянет subprocess: импорт только при запуске наблюдателя
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1.argtypes = (ctypes.c_int,)
+        libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    except (OSError, AttributeError, TypeError):
+        return None
+    return libc
+
+
+class ConfigWatcher:
+    """Слежение за файлом конфигурации в фоновом потоке
+
+    Следит за каталогом файла: редакторы часто сохраняют через временный
+    файл и переименование. После сохранения (с паузой debounce, чтобы
+    пропустить серию событий записи) файл читается и передается
+    on_change(config); ConfigError из чтения или из обработчика
+    журналируется, текущая конфигурация при этом остается в силе.
+    """
+
+    def __init__(self, path, on_change, poll_interval=1.0, debounce=0.2):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.running = False
+        self.thread = None
+        self.fd = None
+
+    def start(self):
+        libc = _inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+            if fd >= 0 and libc.inotify_add_watch(
+                    fd, os.path.dirname(self.path).encode(), IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        self.running = True
+        target = self.watch_inotify if self.fd is not None else self.watch_mtime
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        log.info("👁️  Слежение за конфигурацией: %s (%s)", self.path,
+                 "inotify" if self.fd is not None else "опрос")
+        return self
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def changed(self, data):
+        """Есть ли среди событий inotify запись нашего файла"""
+        name = os.path.basename(self.path).encode()
+        offset = 0
+        found = False
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            if data[offset:offset + length].rstrip(b'\0') == name:
+                found = True
+            offset += length
+        return found
+
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return b''
+        try:
+            return os.read(self.fd, 4096)
+        except BlockingIOError:
+            return b''
+
+    def watch_inotify(self):
+        while self.running:
+            if not self.changed(self.read_events(self.poll_interval)):
+                continue
+            # Серия событий одного сохранения - одна перезагрузка
+            time.sleep(self.debounce)
+            while self.read_events(0):
+                pass
+            self.reload()
+
+    def watch_mtime(self):
+        last = self.mtime()
+        while self.running:
+            time.sleep(self.poll_interval)
+            current = self.mtime()
+            if current != last:
+                last = current
+                time.sleep(self.debounce)
+                self.reload()
+
+    def mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        try:
+            self.on_change(read_config(self.path))
+        except ConfigError as e:
+            log.warning("⚠️  Конфигурация не применена: %s", e,
+                        extra={'fields': {'type': 'config_rejected', 'problems': e.problems}})
+        except Exception as e:
+            log.error("Ошибка применения конфигурации: %s", e)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Сканер FPV сигналов без GUI
+Запускает движок сканирования как фоновый сервис и выводит поток
+JSON-строк (по одному событию на строку): план каналов, проходы и обнаружения.
+"""
+
+import argparse
+import json
+import queue
+import signal
+import sys
+import threading
+
+from startup import PROFILE, profile_first_sweep
+from api_server import ApiServer
+from event_log import EventLog, LEVELS
+from metrics import MetricsServer
+from rx5808_backend import SimulatedRX5808Backend
+from scan_engine import ScanEngine, HardwareError, load_config, CONFIG_PATH
+from scan_config import ConfigError, ConfigWatcher, override_scanner
+
+
+class JsonLinesWriter:
+    """Подписчик движка, пишущий события JSON-строками в отдельном потоке
+
+    Цикл событий движка только кладет событие в ограниченную очередь;
+    если вывод не успевает (медленный канал, заполненный pipe), события
+    отбрасываются и учитываются в счетчике dropped.
+    """
+
+    def __init__(self, stream, queue_size=1024, include_sweeps=True):
+        self.stream = stream
+        self.include_sweeps = include_sweeps
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __call__(self, event):
+        if event['type'] == 'sweep' and not self.include_sweeps:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            try:
+                self.stream.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+                self.stream.write('\n')
+                if self.queue.empty():
+                    self.stream.flush()
+            except (OSError, ValueError):
+                # Потребитель закрыл поток - дальнейший вывод бессмыслен
+                break
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=2.0)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Сканер FPV сигналов без GUI (JSON-строки)")
+    parser.add_argument('--config', default=CONFIG_PATH, help="путь к scanner_config.json")
+    parser.add_argument('--output', default='-', help="файл событий ('-' - stdout)")
+    parser.add_argument('--detections-only', action='store_true',
+                        help="не выводить события проходов")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="время работы, с (по умолчанию - до SIGINT/SIGTERM)")
+    parser.add_argument('--simulate', action='store_true',
+                        help="симулированный RX5808 вместо SPI (запуск без Raspberry Pi)")
+    parser.add_argument('--seed', type=int, default=5808,
+                        help="зерно генератора шума симулятора")
+    parser.add_argument('--receivers', type=int, default=1,
+                        help="число симулированных приемников (параллельное сканирование)")
+    parser.add_argument('--sweep-mode', choices=('channels', 'coarse_fine'), default=None,
+                        help="режим прохода (по умолчанию - scanner.sweep_mode)")
+    parser.add_argument('--scan-mode', default=None,
+                        help="режим из scanner.scan_modes (по умолчанию - scanner.scan_mode)")
+    parser.add_argument('--api', action='store_true',
+                        help="запустить REST/WebSocket API (по умолчанию - api.enabled)")
+    parser.add_argument('--no-reload', action='store_true',
+                        help="не следить за файлом конфигурации (scanner.hot_reload)")
+    parser.add_argument('--log-level', choices=LEVELS, default=None,
+                        help="уровень журнала (по умолчанию - logging.level; "
+                             "SIGUSR1 переключает уровень на ходу)")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="вывести в stderr время фаз запуска до первого прохода")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    PROFILE.mark('imports')
+    args = parse_args(argv)
+    overrides = {'sweep_mode': args.sweep_mode, 'scan_mode': args.scan_mode}
+    config = override_scanner(load_config(args.config), **overrides)
+
+    # Журнал: консольные сообщения в stderr, stdout занят потоком событий
+    event_log = EventLog.from_config(config.get('logging', {}), console=sys.stderr).start()
+    if args.log_level:
+        event_log.set_level(args.log_level)
+    PROFILE.mark('config')
+    backends = None
+    if args.simulate:
+        backends = [SimulatedRX5808Backend(seed=args.seed + i) for i in range(args.receivers)]
+    try:
+        engine = ScanEngine(config, backends=backends)
+    except ConfigError as e:
+        print("❌ Ошибка конфигурации:", file=sys.stderr)
+        for problem in e.problems:
+            print(f"   {problem}", file=sys.stderr)
+        event_log.close()
+        return 2
+    PROFILE.mark('engine')
+
+    try:
+        engine.open()
+    except HardwareError as e:
+        print(f"❌ Ошибка инициализации оборудования: {e}", file=sys.stderr)
+        if e.spi_disabled:
+            print("Включите SPI: dtparam=spi=on в /boot/firmware/config.txt", file=sys.stderr)
+        event_log.close()
+        return 1
+    PROFILE.mark('hardware')
+
+    stream = sys.stdout if args.output == '-' else open(args.output, 'a')
+    writer = JsonLinesWriter(stream, include_sweeps=not args.detections_only)
+    engine.add_listener(writer)
+    engine.metrics.gauge('events_dropped', lambda: writer.dropped)
+    engine.metrics.gauge('log_records_dropped', lambda: event_log.dropped)
+    profile_first_sweep(engine, report=args.profile_startup)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda *_: print(
+            f"Уровень журнала: {event_log.cycle_level()}", file=sys.stderr))
+
+    print(f"✅ Сканирование без GUI (бэкенд: {engine.backend.name})", file=sys.stderr)
+    engine.start()
+    PROFILE.mark('start')
+
+    # Эндпоинт метрик и слежение за конфигурацией - после запуска первого прохода
+    metrics_config = config.get('metrics', {})
+    metrics_server = None
+    if metrics_config.get('enabled', False):
+        metrics_server = MetricsServer.from_config(engine.metrics, metrics_config,
+                                                   runtime=engine.runtime).start()
+    # Локальный REST/WebSocket API (раздел api)
+    api_server = None
+    if config.get('api', {}).get('enabled', False) or args.api:
+        api_server = ApiServer.from_config(engine, config.get('api', {})).start()
+
+    # Перезагрузка конфигурации: новый план применяется между проходами
+    watcher = None
+    if config.get('scanner', {}).get('hot_reload', False) and not args.no_reload:
+        watcher = ConfigWatcher(args.config, lambda new_config: engine.reload(
+            override_scanner(new_config, **overrides))).start()
+    try:
+        stop.wait(args.duration)
+    finally:
+        if watcher is not None:
+            watcher.close()
+        engine.stop(timeout=2.0)
+        engine.close()
+        writer.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        if api_server is not None:
+            api_server.close()
+        engine.runtime.stop()
+        if stream is not sys.stdout:
+            stream.close()
+        event_log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+Движок сканирования RX5808 без графического интерфейса
+Управляет радиобэкендами (одним или несколькими приемниками), планировщиком,
+детектором установления и историей спектра. Цикл проходов - сопрограмма
+общего цикла asyncio; обращения к SPI/GPIO выполняются в пуле из одного
+потока на приемник. План прохода делится между приемниками, которые
+перестраиваются параллельно; результаты сводятся в один спектр.
+Результаты публикуются снимками (для GUI) и событиями для подписчиков:
+поток JSON-строк демона, GUI и другие потребители.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from async_runtime import get_runtime, sleep_until
+from event_log import get_logger
+from metrics import MetricsRegistry
+from coarse_fine import CoarseFinePlanner
+from rx5808_backend import SpiRX5808Backend
+from scan_config import compile_plans, select_mode
+from settle_detector import SettleDetector
+from scan_scheduler import ScanScheduler
+from spectrum_history import SpectrumHistory
+from sweep_analyzer import SweepAnalyzer
+from signal_tracker import SignalTracker
+from scan_snapshot import ScanSnapshot, LatestSnapshot
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'config', 'scanner_config.json')
+
+log = get_logger('engine')
+
+
+def load_config(path=CONFIG_PATH):
+    """Чтение scanner_config.json (пустой словарь, если файла нет)"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class HardwareError(Exception):
+    """Ошибка инициализации оборудования
+
+    spi_disabled - SPI не включен в системе (нужна правка config.txt)
+    """
+
+    def __init__(self, message, spi_disabled=False):
+        super().__init__(message)
+        self.spi_disabled = spi_disabled
+
+
+def receivers_from_config(config):
+    """SPI-бэкенды приемников: hardware.receivers или один приемник hardware.gpio
+
+    Элемент hardware.receivers: cs_pin, spi_bus, spi_device, spi_speed и
+    необязательная поправка rssi_offset (выравнивание усиления модулей).
+    Возвращает список пар (бэкенд, rssi_offset).
+    """
+    hardware = config.get('hardware', {})
+    gpio = hardware.get('gpio', {})
+    receivers = hardware.get('receivers') or [gpio]
+    result = []
+    for receiver in receivers:
+        backend = SpiRX5808Backend(receiver.get('cs_pin', gpio.get('cs_pin', 8)),
+                                   receiver.get('spi_bus', gpio.get('spi_bus', 0)),
+                                   receiver.get('spi_device', gpio.get('spi_device', 0)),
+                                   receiver.get('spi_speed', gpio.get('spi_speed', 2000000)))
+        result.append((backend, receiver.get('rssi_offset', 0)))
+    return result
+
+
+def partition_plan(plan, count):
+    """Деление плана прохода между count приемниками
+
+    Каждому приемнику достается непрерывный участок частот (короткие
+    перестройки), внутри участка сохраняется порядок плана (сильные первыми).
+    """
+    if count <= 1 or len(plan) <= 1:
+        return [list(plan)]
+    order = sorted(range(len(plan)), key=lambda i: plan[i][1])
+    count = min(count, len(plan))
+    size, extra = divmod(len(plan), count)
+    parts = []
+    start = 0
+    for k in range(count):
+        end = start + size + (1 if k < extra else 0)
+        parts.append([plan[i] for i in sorted(order[start:end])])
+        start = end
+    return parts
+
+
+class ScanEngine:
+    """Цикл сканирования каналов (сопрограмма в цикле событий runtime)
+
+    Подписчики (add_listener) получают события-словари:
+      {'type': 'plan', ...}      - план каналов при запуске
+      {'type': 'sweep', ...}     - завершенный проход
+      {'type': 'detection', ...} - RSSI канала выше порога (в проходе «грубо -
+                                   точно» - по одному на излучатель прохода)
+    Вызовы подписчиков выполняются в потоке цикла событий и не должны блокироваться.
+
+    backends - список радиобэкендов для параллельного сканирования
+    (по умолчанию - hardware.receivers); backend - один бэкенд.
+    channels - каналы вместо frequencies.channels и scanner.scan_modes.
+    runtime  - AsyncRuntime (по умолчанию - общий для процесса).
+
+    Режимы сканирования компилируются из конфигурации (ConfigError, если
+    она некорректна); активный план меняется reload()/select_mode()
+    между проходами.
+    """
+
+    def __init__(self, config=None, backend=None, channels=None, backends=None, runtime=None):
+        self.config = load_config() if config is None else config
+        self.runtime = get_runtime() if runtime is None else runtime
+
+        # Радиобэкенды RX5808 (по умолчанию - реальный SPI) и поправки RSSI
+        if backends is None and backend is not None:
+            backends = [backend]
+        if backends is None:
+            receivers = receivers_from_config(self.config)
+            self.backends = [b for b, _ in receivers]
+            self.rssi_offsets = [offset for _, offset in receivers]
+        else:
+            self.backends = list(backends)
+            self.rssi_offsets = [0] * len(self.backends)
+        self.backend = self.backends[0]
+        # Пулы ввода-вывода: по одному потоку на приемник
+        self.executors = {id(b): f"rx5808-{i}" for i, b in enumerate(self.backends)}
+
+        # Скомпилированные режимы сканирования (scanner.scan_modes)
+        if channels is not None:
+            self.config = dict(self.config,
+                               frequencies=dict(self.config.get('frequencies', {}),
+                                                channels=dict(channels), frequency_bands={}),
+                               scanner=dict(self.config.get('scanner', {}), scan_modes={},
+                                            scan_mode=None))
+        self.plans = compile_plans(self.config)
+        self.plan = None
+        self.pending_plan = None
+        # Идет ли сопрограмма проходов (меняется только в цикле событий)
+        self.sweeping = False
+        self.plan_lock = threading.Lock()
+
+        # Детектор установления RSSI после перестройки
+        self.settler = SettleDetector.from_config(self.config.get('scanner', {}))
+        self.settler.load()
+
+        # Треки излучателей между проходами (с устареванием)
+        self.tracker = SignalTracker.from_config(self.config)
+
+        # Публикация состояния: последний снимок и подписчики событий
+        self.snapshots = LatestSnapshot()
+        self.snapshot_rows = 90
+        self.listeners = []
+
+        # Замеры этапов горячего пути (раздел metrics)
+        self.metrics = MetricsRegistry(window=self.config.get('metrics', {}).get('window', 1024))
+        # Транзакция SPI перестройки замеряется в самом бэкенде
+        write_timer = self.metrics.stage('rx5808_write')
+        for backend in self.backends:
+            backend.write_timer = write_timer
+        self.tune_timer = self.metrics.stage('set_frequency')
+        self.rssi_timer = self.metrics.stage('read_rssi')
+        self.settle_timer = self.metrics.stage('settle')
+        self.sweep_timer = self.metrics.stage('sweep')
+        self.analyze_timer = self.metrics.stage('analyze')
+        self.metrics.gauge('tracks', lambda: len(self.tracker))
+        self.sweep_rate = self.metrics.rate('sweeps')
+        self.metrics.gauge('settle_timeouts', lambda: self.settler.timeouts)
+        self.metrics.gauge('retunes_per_sweep',
+                           lambda: self.planner.retunes if self.planner is not None else None)
+
+        # Задача цикла проходов и признак ее завершения (для stop с ожиданием)
+        self.task = None
+        self.finished = threading.Event()
+        self.finished.set()
+
+        # Каналы, планировщик, история и пороги активного режима
+        self.history = None
+        self.scheduler = None
+        self.apply_plan(self.plans[select_mode(self.config, self.plans)])
+
+    def apply_plan(self, plan):
+        """Переход на скомпилированный план (до запуска или между проходами)"""
+        config = plan.config
+        self.plan = plan
+        self.config = config
+        self.channels = plan.channels
+
+        # Режим прохода: фиксированные каналы или «грубо - точно» по диапазону
+        self.planner = None
+        if plan.sweep_mode == 'coarse_fine':
+            self.planner = CoarseFinePlanner.from_config(config, plan.range)
+        sweep_channels = self.planner.coarse_channels() if self.planner else self.channels
+
+        # Планировщик проходов (performance.scan_optimization); нумерация проходов сквозная
+        scheduler = ScanScheduler.from_config(config, sweep_channels)
+        if self.scheduler is not None:
+            scheduler.sweep_number = self.scheduler.sweep_number
+        self.scheduler = scheduler
+
+        # Пороги обнаружения
+        self.rssi_threshold = plan.rssi_threshold
+        self.strong_signal_threshold = plan.strong_signal_threshold
+        self.channel_thresholds = plan.channel_thresholds
+
+        # История спектра (кольцевой буфер проходов) сохраняется, если бины те же
+        performance = config.get('performance', {})
+        bins = self.planner.grid if self.planner else plan.frequencies
+        depth = performance.get('history_depth', 256)
+        averaging = performance.get('rssi_averaging', 5)
+        history = self.history
+        if (history is None or history.depth != depth or
+                not np.array_equal(history.frequencies, bins)):
+            history = SpectrumHistory(bins, depth=depth, averaging=averaging)
+        history.averaging = max(1, int(averaging))
+        self.history = history
+        self.bin_thresholds = plan.bin_thresholds(history.frequencies)
+
+        # Анализ прохода целиком: пики, центр, полоса и тип излучателя
+        self.analyzer = SweepAnalyzer.from_config(history.frequencies, config)
+
+        # Предвычисленные командные байты перестройки плана
+        for backend in self.backends:
+            backend.load_retune_table(plan.retune_table)
+
+    def reload(self, config):
+        """Новая конфигурация: проверка, компиляция и замена плана между проходами
+
+        ConfigError, если конфигурация некорректна (текущий план не меняется).
+        Изменения раздела hardware вступают в силу после перезапуска.
+        """
+        plans = compile_plans(config)
+        if config.get('hardware') != self.config.get('hardware'):
+            log.warning("⚠️  Изменения раздела hardware применяются после перезапуска")
+        self.plans = plans
+        self.request_plan(plans[select_mode(config, plans)])
+
+    def select_mode(self, mode):
+        """Переключение на другой скомпилированный режим (KeyError, если его нет)"""
+        self.request_plan(self.plans[mode])
+
+    def request_plan(self, plan):
+        """План ставится в очередь и применяется в цикле событий (из любого потока)
+
+        Идущий цикл проходов применяет его перед следующим проходом,
+        без цикла проходов - сразу.
+        """
+        with self.plan_lock:
+            self.pending_plan = plan
+        self.runtime.call_soon(self.apply_idle)
+
+    def apply_idle(self):
+        """Применение плана вне цикла проходов (только в цикле событий)"""
+        if not self.sweeping:
+            self.apply_pending()
+
+    def apply_pending(self):
+        with self.plan_lock:
+            plan, self.pending_plan = self.pending_plan, None
+        if plan is None:
+            return False
+        self.apply_plan(plan)
+        self.announce_plan()
+        return True
+
+    def plan_event(self):
+        """Событие плана: режим, каналы и частоты бинов активного плана"""
+        return {
+            'type': 'plan',
+            'timestamp': time.time(),
+            'mode': self.plan.mode,
+            'sweep_mode': self.plan.sweep_mode,
+            'channels': list(self.channels.keys()),
+            'frequencies': [int(f) for f in self.history.frequencies],
+        }
+
+    def announce_plan(self):
+        plan = self.plan_event()
+        log.info("📋 Режим %s: %d каналов, %d бинов", self.plan.mode, len(self.channels),
+                 self.history.bins, extra={'fields': plan})
+        self.emit(plan)
+
+    def open(self):
+        """Инициализация радиобэкендов; HardwareError при неудаче"""
+        for backend in self.backends:
+            if isinstance(backend, SpiRX5808Backend) and not backend.spi_available():
+                raise HardwareError(f"SPI не включен на Raspberry Pi ({backend.device_path})",
+                                    spi_disabled=True)
+            try:
+                backend.open()
+            except Exception as e:
+                raise HardwareError(str(e)) from e
+            backend.load_retune_table(self.plan.retune_table)
+        if len(self.backends) > 1:
+            log.info("📡 Приемников RX5808: %d", len(self.backends))
+
+    def close(self):
+        self.stop(timeout=2.0)
+        self.settler.save()
+        for backend in self.backends:
+            try:
+                backend.close()
+            except Exception:
+                pass
+
+    def add_listener(self, listener):
+        """Подписка на события движка: listener(event)"""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def emit(self, event):
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                log.error("Ошибка обработчика событий: %s", e)
+
+    def set_frequency(self, frequency_mhz, backend=None):
+        """Установка частоты RX5808 в МГц"""
+        started = time.perf_counter()
+        try:
+            (backend or self.backend).set_frequency(frequency_mhz)
+        except Exception as e:
+            log.error("Ошибка установки частоты %s МГц: %s", frequency_mhz, e)
+        self.tune_timer.observe(time.perf_counter() - started)
+
+    def read_rssi(self, backend=None):
+        """Чтение значения RSSI с RX5808"""
+        started = time.perf_counter()
+        try:
+            return (backend or self.backend).read_rssi()
+        except Exception as e:
+            log.error("Ошибка чтения RSSI: %s", e)
+            return 0
+        finally:
+            self.rssi_timer.observe(time.perf_counter() - started)
+
+    async def tune(self, frequency_mhz, backend=None):
+        """set_frequency() в пуле приемника (из сопрограммы)"""
+        backend = backend or self.backend
+        await self.runtime.offload(self.executors[id(backend)], self.set_frequency,
+                                   frequency_mhz, backend)
+
+    async def sample(self, backend=None):
+        """read_rssi() в пуле приемника (из сопрограммы)"""
+        backend = backend or self.backend
+        return await self.runtime.offload(self.executors[id(backend)], self.read_rssi, backend)
+
+    async def settle_rssi(self, frequency_mhz, backend=None):
+        """Чтение RSSI после стабилизации показаний"""
+        rssi, elapsed = await self.settler.settle_async(frequency_mhz,
+                                                        lambda: self.sample(backend))
+        self.settle_timer.observe(elapsed)
+        return int(round(rssi))
+
+    @property
+    def scanning(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        """Запуск цикла проходов в цикле событий"""
+        if self.scanning:
+            return
+        log.info("Сканирование запущено: %d каналов", len(self.channels),
+                 extra={'fields': {'type': 'start'}})
+        self.task = self.runtime.submit(self.scan_channels())
+
+    def stop(self, timeout=None):
+        """Остановка сканирования (с ожиданием завершения, если задан timeout)
+
+        Проход прерывается на ближайшем ожидании; уже начатый вызов SPI
+        завершается в пуле приемника раньше любых последующих.
+        """
+        if self.task is None:
+            return
+        if self.scanning:
+            log.info("Сканирование остановлено", extra={'fields': {'type': 'stop'}})
+        self.task.cancel()
+        if timeout is not None and not self.runtime.in_loop():
+            self.finished.wait(timeout)
+
+    async def scan_channels(self):
+        """Сканирование всех каналов на наличие сигналов"""
+        self.finished.clear()
+        self.sweeping = True
+        try:
+            # План меняется только в цикле событий: здесь или между проходами
+            if not self.apply_pending():
+                self.announce_plan()
+            while True:
+                # Новый план (перезагрузка конфигурации, смена режима) - только между проходами
+                if self.pending_plan is not None:
+                    self.apply_pending()
+                sweep_started = time.perf_counter()
+
+                # Прерванный (отмененный) проход неполон: в историю не попадает
+                if self.planner is None:
+                    await self.scan_plan(self.scheduler.plan_sweep())
+                else:
+                    # Грубый этап по диапазону, затем 1 МГц вокруг точек выше шума
+                    self.planner.begin_sweep()
+                    await self.scan_plan(self.scheduler.plan_sweep())
+                    await self.scan_plan(self.planner.fine_plan())
+                    self.history.set_sweep(self.planner.estimate())
+
+                self.history.commit()
+                self.scheduler.end_sweep()
+                self.sweep_timer.observe(time.perf_counter() - sweep_started)
+                self.sweep_rate.mark()
+                self.metrics.counter('sweeps')
+                self.publish_state()
+                # Пауза до срока следующего прохода; остановка прерывает ее сразу
+                await sleep_until(time.monotonic() + self.scheduler.sweep_interval())
+        finally:
+            self.sweeping = False
+            # План, запрошенный во время остановки, применяется здесь же
+            self.apply_pending()
+            self.settler.save()
+            self.finished.set()
+
+    async def scan_plan(self, plan):
+        """Сканирование плана: участки делятся между приемниками и идут параллельно"""
+        parts = partition_plan(plan, len(self.backends))
+        if len(parts) == 1:
+            await self.scan_partition(0, parts[0])
+            return
+        results = await asyncio.gather(*(self.scan_partition(i, part)
+                                         for i, part in enumerate(parts)),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log.error("Ошибка параллельного сканирования: %s", result)
+
+    async def scan_partition(self, index, plan):
+        """Сканирование участка плана одним приемником"""
+        backend = self.backends[index]
+        offset = self.rssi_offsets[index]
+        for channel, freq in plan:
+            # Установка частоты и ожидание стабилизации RSSI
+            await self.tune(freq, backend)
+            rssi = await self.settle_rssi(freq, backend)
+            if offset:
+                rssi = min(255, max(0, rssi + offset))
+
+            # Сведение результатов всех приемников в один проход (в потоке цикла событий)
+            self.scheduler.report(channel, rssi)
+            self.history.set(freq, rssi)
+            if self.planner is not None:
+                # Бины 1 МГц - только в спектр; обнаружения - по излучателям прохода
+                self.planner.record(freq, rssi)
+            elif rssi > self.channel_thresholds.get(channel, self.rssi_threshold):
+                self.report_detection(channel, freq, rssi, receiver=index)
+
+    def report_detection(self, channel, frequency, rssi, receiver=None, **fields):
+        """Событие обнаружения сигнала"""
+        detection = {
+            'type': 'detection',
+            'timestamp': time.time(),
+            'channel': channel,
+            'frequency': frequency,
+            'rssi': rssi,
+            'strong': rssi > self.strong_signal_threshold,
+            'receiver': receiver,
+            **fields,
+        }
+        log.info("📡 Сигнал: канал %s (%d МГц), RSSI %d", channel, frequency, rssi,
+                 extra={'fields': detection})
+        self.emit(detection)
+
+    def report_emitters(self, emitters):
+        """Обнаружения прохода «грубо - точно»: одно на излучатель
+
+        Канал - ближайший канал плана в пределах полуполосы излучателя,
+        иначе частота пика.
+        """
+        for emitter in emitters:
+            channel = str(emitter.peak_frequency)
+            nearest = max(emitter.bandwidth / 2, 1.0)
+            for name, freq in self.channels.items():
+                if abs(freq - emitter.center) <= nearest:
+                    channel, nearest = name, abs(freq - emitter.center)
+            self.report_detection(channel, int(emitter.peak_frequency), int(emitter.peak_rssi),
+                                  center=round(emitter.center, 1),
+                                  bandwidth=round(emitter.bandwidth, 1), kind=emitter.kind)
+
+    def publish_state(self):
+        """Публикация снимка состояния и события прохода"""
+        spectrum = self.history.moving_average()
+        started = time.perf_counter()
+        emitters = self.analyzer.analyze(self.history.latest())
+        self.analyze_timer.observe(time.perf_counter() - started)
+        now = time.time()
+        new_tracks, lost_tracks = self.tracker.update(emitters, now)
+        snapshot = ScanSnapshot(
+            sweep=self.scheduler.sweep_number,
+            spectrum=spectrum,
+            waterfall=self.history.recent(self.snapshot_rows),
+            max_hold=self.history.max_hold(),
+            signals=self.active_signals(spectrum),
+            emitters=emitters,
+            tracks=self.tracker.snapshot(),
+            timestamp=now)
+        self.snapshots.publish(snapshot)
+        if self.planner is not None:
+            self.report_emitters(emitters)
+        self.report_tracks(new_tracks, lost_tracks, now)
+        # Событие прохода собирается, только если оно кому-то нужно
+        logged = log.isEnabledFor(logging.DEBUG)
+        if self.listeners or logged:
+            sweep = {
+                'type': 'sweep',
+                'timestamp': snapshot.timestamp,
+                'sweep': snapshot.sweep,
+                'rssi': self.history.latest().astype(int).tolist(),
+                'averaged': np.round(spectrum.astype(np.float64), 1).tolist(),
+                'signals': len(snapshot.signals),
+                'emitters': [e.to_dict() for e in emitters],
+                'tracks': len(snapshot.tracks),
+            }
+            if logged:
+                log.debug("Проход %d: сигналов %d", snapshot.sweep, len(snapshot.signals),
+                          extra={'fields': sweep})
+            self.emit(sweep)
+
+    def report_tracks(self, new_tracks, lost_tracks, timestamp):
+        """События появления и потери треков"""
+        for state, tracks in (('new', new_tracks), ('lost', lost_tracks)):
+            for track in tracks:
+                event = {'type': 'track', 'state': state, 'timestamp': timestamp,
+                         **track.to_dict()}
+                log.info("%s Трек %d: %.1f МГц, RSSI %d",
+                         "🆕" if state == 'new' else "⌛", track.id, track.center, track.rssi,
+                         extra={'fields': event})
+                self.emit(event)
+
+    def active_signals(self, averaged=None):
+        """Частоты, усредненный RSSI которых выше порога обнаружения (по бинам)"""
+        if averaged is None:
+            averaged = self.history.moving_average()
+        signals = {}
+        for i in np.flatnonzero(averaged > self.bin_thresholds):
+            freq = int(self.history.frequencies[i])
+            rssi = int(averaged[i])
+            signals[freq] = {
+                'frequency': freq,
+                'rssi': rssi,
+                'strength': min(100, int(rssi * 100 / 255))
+            }
+        return signals
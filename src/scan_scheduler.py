@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Адаптивный планировщик сканирования каналов
+Реализует performance.scan_optimization из scanner_config.json:
+активные каналы посещаются каждый проход, тихие - все реже,
+интервал между проходами зависит от активности в эфире.
+"""
+
+
+class ChannelState:
+    """Состояние планирования одного канала"""
+
+    __slots__ = ('name', 'frequency', 'order', 'rssi', 'backoff', 'next_sweep')
+
+    def __init__(self, name, frequency, order):
+        self.name = name
+        self.frequency = frequency
+        self.order = order
+        self.rssi = 0
+        self.backoff = 1
+        self.next_sweep = 0
+
+
+class ScanScheduler:
+    """Приоритетный планировщик проходов сканирования
+
+    skip_weak_signals      - тихий канал посещается через 1, 2, 4 ... max_backoff проходов
+    focus_on_strong_signals - в проходе каналы упорядочены по последнему RSSI
+    adaptive_scan_interval - пауза между проходами сокращается до min_interval
+                             при активности и возвращается к scan_interval в тишине
+    """
+
+    def __init__(self, channels, rssi_threshold=50, scan_interval=0.5,
+                 min_interval=0.05, max_backoff=4, busy_channels=2,
+                 skip_weak_signals=True, focus_on_strong_signals=True,
+                 adaptive_scan_interval=True):
+        self.rssi_threshold = rssi_threshold
+        self.scan_interval = scan_interval
+        self.min_interval = min_interval
+        self.max_backoff = max(1, int(max_backoff))
+        self.busy_channels = max(1, busy_channels)
+        self.skip_weak_signals = skip_weak_signals
+        self.focus_on_strong_signals = focus_on_strong_signals
+        self.adaptive_scan_interval = adaptive_scan_interval
+        self.sweep_number = 0
+        self.activity = 0.0
+        self.active_in_sweep = 0
+        self.set_channels(channels)
+
+    @classmethod
+    def from_config(cls, config, channels):
+        """Создание по полному словарю scanner_config.json"""
+        scanner = config.get('scanner', {})
+        optimization = config.get('performance', {}).get('scan_optimization', {})
+        return cls(channels,
+                   rssi_threshold=scanner.get('rssi_threshold', 50),
+                   scan_interval=scanner.get('scan_interval', 0.5),
+                   min_interval=scanner.get('min_scan_interval', 0.05),
+                   max_backoff=scanner.get('max_channel_backoff', 4),
+                   skip_weak_signals=optimization.get('skip_weak_signals', False),
+                   focus_on_strong_signals=optimization.get('focus_on_strong_signals', False),
+                   adaptive_scan_interval=optimization.get('adaptive_scan_interval', False))
+
+    def set_channels(self, channels):
+        """Замена плана каналов (словарь имя -> частота)"""
+        self.states = {name: ChannelState(name, freq, i)
+                       for i, (name, freq) in enumerate(channels.items())}
+
+    def plan_sweep(self):
+        """Список (канал, частота) для очередного прохода"""
+        states = list(self.states.values())
+        if not states:
+            return []
+        if self.skip_weak_signals:
+            due = [s for s in states if s.next_sweep <= self.sweep_number]
+            if not due:
+                # Пустых проходов не бывает: переходим к ближайшему запланированному
+                self.sweep_number = min(s.next_sweep for s in states)
+                due = [s for s in states if s.next_sweep <= self.sweep_number]
+        else:
+            due = states
+        if self.focus_on_strong_signals:
+            due.sort(key=lambda s: (-s.rssi, s.order))
+        self.active_in_sweep = 0
+        return [(s.name, s.frequency) for s in due]
+
+    def report(self, name, rssi):
+        """Учет результата измерения канала"""
+        state = self.states.get(name)
+        if state is None:
+            return
+        state.rssi = rssi
+        if rssi > self.rssi_threshold:
+            state.backoff = 1
+            self.active_in_sweep += 1
+        else:
+            state.backoff = min(state.backoff * 2, self.max_backoff)
+        state.next_sweep = self.sweep_number + (state.backoff if self.skip_weak_signals else 1)
+
+    def end_sweep(self):
+        """Завершение прохода: обновление уровня активности"""
+        level = min(1.0, self.active_in_sweep / self.busy_channels)
+        self.activity += (level - self.activity) * 0.5
+        self.sweep_number += 1
+
+    def sweep_interval(self):
+        """Пауза перед следующим проходом, с"""
+        if not self.adaptive_scan_interval:
+            return self.scan_interval
+        return self.min_interval + (self.scan_interval - self.min_interval) * (1.0 - self.activity)
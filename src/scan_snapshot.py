@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Передача состояния сканера из рабочих потоков в главный поток GUI
+Поток сканирования публикует неизменяемый снимок, главный поток забирает
+только последний: промежуточные состояния отбрасываются. Вызовы Tk из
+рабочих потоков ставятся в очередь и выполняются в главном потоке.
+"""
+
+import queue
+import threading
+
+from event_log import get_logger
+
+log = get_logger('gui')
+
+
+class ScanSnapshot:
+    """Неизменяемый снимок состояния сканера для отрисовки"""
+
+    __slots__ = ('sweep', 'spectrum', 'waterfall', 'max_hold',
+                 'signals', 'emitters', 'tracks', 'frequency', 'timestamp')
+
+    def __init__(self, sweep, spectrum, waterfall, max_hold, signals,
+                 frequency=None, timestamp=None, emitters=(), tracks=()):
+        self.sweep = sweep
+        self.spectrum = spectrum
+        self.waterfall = waterfall
+        self.max_hold = max_hold
+        self.signals = signals
+        self.emitters = emitters
+        self.tracks = tracks
+        self.frequency = frequency
+        self.timestamp = timestamp
+
+
+class LatestSnapshot:
+    """Ячейка «последний снимок побеждает» с номером версии"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._taken = 0
+
+    def publish(self, snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+            self._version += 1
+
+    def take(self):
+        """Новый снимок или None, если ничего не изменилось с прошлого вызова"""
+        with self._lock:
+            if self._version == self._taken:
+                return None
+            self._taken = self._version
+            return self._snapshot
+
+    def peek(self):
+        """Последний снимок без отметки о прочтении"""
+        with self._lock:
+            return self._snapshot
+
+    @property
+    def version(self):
+        """Общее число публикаций"""
+        return self._version
+
+
+class GuiCallQueue:
+    """Очередь вызовов Tk из рабочих потоков"""
+
+    def __init__(self, maxsize=256):
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, func, *args, **kwargs):
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            pass
+
+    def drain(self, limit=64):
+        """Выполнение накопленных вызовов (только из главного потока)"""
+        for _ in range(limit):
+            try:
+                func, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                log.error("Ошибка обновления GUI: %s", e)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Детектор установления RSSI после перестройки RX5808
+Вместо фиксированной паузы опрашивает RSSI с высокой частотой и завершает
+ожидание, как только показания стабилизировались (в потоке или в
+сопрограмме цикла asyncio). Время установления запоминается по частотам
+и сохраняется между запусками.
+"""
+
+import json
+import os
+import time
+
+from async_runtime import sleep_until
+from event_log import get_logger
+
+DEFAULT_TABLE_FILE = os.path.expanduser("~/.cache/rpiskan/settle_times.json")
+
+log = get_logger('settle')
+
+
+class SettleDetector:
+    """Ожидание стабилизации RSSI с жестким таймаутом
+
+    poll_interval - период опроса RSSI, с
+    window        - число последних отсчетов, по которым судим о стабильности
+    tolerance     - допустимый размах отсчетов в окне (единицы RSSI)
+    timeout       - жесткий предел ожидания (scanner.settling_time), с
+    learn_rate    - вес нового измерения в таблице времен установления
+    """
+
+    def __init__(self, poll_interval=0.002, window=3, tolerance=3, timeout=0.1,
+                 learn_rate=0.2, table_file=DEFAULT_TABLE_FILE,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.poll_interval = poll_interval
+        self.window = max(2, int(window))
+        self.tolerance = tolerance
+        self.timeout = timeout
+        self.learn_rate = learn_rate
+        self.table_file = table_file
+        self.clock = clock
+        self.sleep = sleep
+        self.settle_times = {}
+        self.dirty = False
+        self.timeouts = 0
+
+    @classmethod
+    def from_config(cls, scanner_config, **kwargs):
+        """Создание по секции scanner конфигурации"""
+        settle = scanner_config.get('settle', {})
+        options = {
+            'timeout': scanner_config.get('settling_time', 0.1),
+            'poll_interval': settle.get('poll_interval', 0.002),
+            'window': settle.get('window', 3),
+            'tolerance': settle.get('tolerance', 3),
+        }
+        if settle.get('table_file'):
+            options['table_file'] = os.path.expanduser(settle['table_file'])
+        options.update(kwargs)
+        return cls(**options)
+
+    def expected_time(self, frequency_mhz):
+        """Изученное время установления для частоты (None, если неизвестно)"""
+        return self.settle_times.get(frequency_mhz)
+
+    def steps(self, frequency_mhz):
+        """Шаги ожидания установления после перестройки на frequency_mhz (генератор)
+
+        Выдает момент по clock, до которого нужно ждать, или None, когда
+        нужен отсчет RSSI (передается через send()). Моменты опроса
+        отсчитываются от начала ожидания, а не от конца предыдущей паузы,
+        поэтому задержки планировщика не накапливаются. Результат
+        (StopIteration.value) - как у settle().
+        """
+        start = self.clock()
+        deadline = start + self.timeout
+        next_poll = start
+
+        # Известная частота: пропускаем заведомо нестабильную часть переходного процесса
+        learned = self.settle_times.get(frequency_mhz)
+        if learned:
+            next_poll = start + min(learned * 0.8, self.timeout)
+            yield next_poll
+
+        readings = []
+        stamps = []
+        while True:
+            stamps.append(self.clock())
+            readings.append((yield None))
+            if len(readings) >= self.window:
+                recent = readings[-self.window:]
+                if max(recent) - min(recent) <= self.tolerance:
+                    # Запоминаем момент начала стабильного окна, а не конец ожидания,
+                    # иначе время установления росло бы на длину окна с каждым проходом
+                    self.learn(frequency_mhz, stamps[-self.window] - start)
+                    return sum(recent) / len(recent), self.clock() - start
+            now = self.clock()
+            next_poll += self.poll_interval
+            if next_poll < now:
+                # Опоздание больше периода опроса: пропущенные моменты не наверстываем
+                next_poll = now + self.poll_interval
+            if next_poll >= deadline:
+                break
+            yield next_poll
+
+        # Таймаут: используем последний отсчет, время не запоминаем
+        self.timeouts += 1
+        return readings[-1], self.clock() - start
+
+    def settle(self, frequency_mhz, read_rssi):
+        """Ожидание установления после перестройки на frequency_mhz
+
+        Возвращает (rssi, elapsed): среднее по окну стабильных отсчетов
+        и фактическое время ожидания в секундах.
+        """
+        steps = self.steps(frequency_mhz)
+        try:
+            request = next(steps)
+            while True:
+                if request is None:
+                    request = steps.send(read_rssi())
+                else:
+                    self.sleep(max(0.0, request - self.clock()))
+                    request = next(steps)
+        except StopIteration as done:
+            return done.value
+
+    async def settle_async(self, frequency_mhz, read_rssi):
+        """settle() для цикла asyncio: read_rssi - сопрограммная функция"""
+        steps = self.steps(frequency_mhz)
+        try:
+            request = next(steps)
+            while True:
+                if request is None:
+                    request = steps.send(await read_rssi())
+                else:
+                    await sleep_until(request, self.clock)
+                    request = next(steps)
+        except StopIteration as done:
+            return done.value
+
+    def learn(self, frequency_mhz, elapsed):
+        previous = self.settle_times.get(frequency_mhz)
+        if previous is None:
+            value = elapsed
+        else:
+            value = previous + (elapsed - previous) * self.learn_rate
+        self.settle_times[frequency_mhz] = round(value, 6)
+        self.dirty = True
+
+    def load(self):
+        """Загрузка таблицы времен установления с диска"""
+        try:
+            with open(self.table_file, 'r') as f:
+                data = json.load(f)
+            self.settle_times = {int(freq): float(t) for freq, t in data.items()}
+            return True
+        except (OSError, ValueError, AttributeError):
+            return False
+
+    def save(self):
+        """Сохранение таблицы (только при наличии изменений)"""
+        if not self.dirty:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.table_file), exist_ok=True)
+            tmp_file = self.table_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({str(freq): t for freq, t in sorted(self.settle_times.items())}, f)
+            os.replace(tmp_file, self.table_file)
+            self.dirty = False
+            return True
+        except OSError as e:
+            log.warning("⚠️  Не удалось сохранить таблицу установления: %s", e)
+            return False
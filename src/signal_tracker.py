@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Сопровождение излучателей между проходами
+Каждый излучатель из SweepAnalyzer привязывается к ближайшему треку
+(по частоте, в пределах строба), трек хранит время первого и последнего
+обнаружения, статистику RSSI и уход частоты. Треки хранятся в индексе,
+упорядоченном по частоте (bisect), который обновляется при создании,
+удалении и смещении трека; устаревание - по куче сроков жизни, так что
+на проход обрабатываются только привязанные и истекшие треки. Снимок
+для публикации пересобирается, только если треки изменились, а словари
+неизменившихся треков берутся из кэша.
+"""
+
+import bisect
+import heapq
+import itertools
+
+
+class Track:
+    """Трек излучателя"""
+
+    __slots__ = ('id', 'center', 'first_center', 'bandwidth', 'kind', 'first_seen',
+                 'last_seen', 'hits', 'rssi', 'rssi_min', 'rssi_max', 'rssi_mean',
+                 'drift', 'expires', 'published')
+
+    def __init__(self, track_id, emitter, timestamp, expires):
+        self.id = track_id
+        self.center = emitter.center
+        self.first_center = emitter.center
+        self.bandwidth = emitter.bandwidth
+        self.kind = emitter.kind
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.rssi = emitter.peak_rssi
+        self.rssi_min = emitter.peak_rssi
+        self.rssi_max = emitter.peak_rssi
+        self.rssi_mean = float(emitter.peak_rssi)
+        self.drift = 0.0
+        self.expires = expires
+        self.published = None
+
+    def update(self, emitter, timestamp, drift_smoothing):
+        dt = timestamp - self.last_seen
+        if dt > 0:
+            # Скорость ухода частоты, МГц/с (сглаженная)
+            rate = (emitter.center - self.center) / dt
+            self.drift += (rate - self.drift) * drift_smoothing
+        self.center = emitter.center
+        self.bandwidth = emitter.bandwidth
+        self.kind = emitter.kind
+        self.last_seen = timestamp
+        self.hits += 1
+        rssi = emitter.peak_rssi
+        self.rssi = rssi
+        self.rssi_min = min(self.rssi_min, rssi)
+        self.rssi_max = max(self.rssi_max, rssi)
+        self.rssi_mean += (rssi - self.rssi_mean) / self.hits
+        self.published = None
+
+    def to_dict(self):
+        """Словарь для публикации (кэшируется до следующего обновления трека)"""
+        if self.published is None:
+            self.published = self.describe()
+        return self.published
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'center': round(self.center, 1),
+            'bandwidth': round(self.bandwidth, 1),
+            'kind': self.kind,
+            'first_seen': round(self.first_seen, 3),
+            'last_seen': round(self.last_seen, 3),
+            'hits': self.hits,
+            'rssi': self.rssi,
+            'rssi_min': self.rssi_min,
+            'rssi_max': self.rssi_max,
+            'rssi_mean': round(self.rssi_mean, 1),
+            'drift': round(self.drift, 3),
+            'total_drift': round(self.center - self.first_center, 1),
+        }
+
+
+class SignalTracker:
+    """Набор треков с устареванием по куче
+
+    gate_mhz        - максимальное расстояние излучателя от трека по частоте
+    ttl             - время жизни трека без обнаружений, с
+    drift_smoothing - вес нового измерения в скорости ухода частоты
+    """
+
+    def __init__(self, gate_mhz=5.0, ttl=10.0, drift_smoothing=0.3):
+        self.gate_mhz = gate_mhz
+        self.ttl = ttl
+        self.drift_smoothing = drift_smoothing
+        self.tracks = {}
+        # Индекс по частоте: centers[i] - частота трека order[i]
+        self.centers = []
+        self.order = []
+        self.heap = []
+        self.ids = itertools.count(1)
+        self.cached_snapshot = None
+
+    @classmethod
+    def from_config(cls, config):
+        tracker = config.get('scanner', {}).get('tracker', {})
+        return cls(gate_mhz=tracker.get('gate_mhz', 5.0),
+                   ttl=tracker.get('ttl', 10.0),
+                   drift_smoothing=tracker.get('drift_smoothing', 0.3))
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def update(self, emitters, timestamp):
+        """Привязка излучателей прохода к трекам
+
+        Возвращает (новые треки, потерянные треки).
+        """
+        lost = self.expire(timestamp)
+        new = []
+        if not emitters:
+            return new, lost
+
+        claimed = set()
+        # Сильные излучатели привязываются первыми
+        for emitter in sorted(emitters, key=lambda e: -e.peak_rssi):
+            track = self.nearest(emitter.center, claimed)
+            if track is None:
+                track = Track(next(self.ids), emitter, timestamp, timestamp + self.ttl)
+                self.tracks[track.id] = track
+                self.insert(track)
+                new.append(track)
+            else:
+                if emitter.center != track.center:
+                    # Смещение частоты: перестановка в индексе
+                    self.remove(track)
+                    track.update(emitter, timestamp, self.drift_smoothing)
+                    self.insert(track)
+                else:
+                    track.update(emitter, timestamp, self.drift_smoothing)
+                track.expires = timestamp + self.ttl
+            claimed.add(track.id)
+            heapq.heappush(self.heap, (track.expires, track.id))
+        self.cached_snapshot = None
+
+        # Устаревшие записи кучи копятся при каждом продлении: периодическое сжатие
+        if len(self.heap) > 4 * len(self.tracks) + 64:
+            self.heap = [(t.expires, t.id) for t in self.tracks.values()]
+            heapq.heapify(self.heap)
+        return new, lost
+
+    def insert(self, track):
+        i = bisect.bisect_right(self.centers, track.center)
+        self.centers.insert(i, track.center)
+        self.order.insert(i, track)
+
+    def remove(self, track):
+        i = bisect.bisect_left(self.centers, track.center)
+        # Среди треков с той же частотой - именно этот
+        while self.order[i] is not track:
+            i += 1
+        del self.centers[i]
+        del self.order[i]
+
+    def nearest(self, center, claimed):
+        """Ближайший свободный трек в пределах строба (None, если такого нет)
+
+        Поиск идет от позиции частоты в обе стороны; занятые в этом проходе
+        треки пропускаются, пока расстояние не превысит строб.
+        """
+        centers = self.centers
+        i = bisect.bisect_left(centers, center)
+        best = None
+        best_distance = self.gate_mhz
+        j = i - 1
+        while j >= 0 and center - centers[j] <= best_distance:
+            if self.order[j].id not in claimed:
+                best, best_distance = self.order[j], center - centers[j]
+                break
+            j -= 1
+        j = i
+        while j < len(centers) and centers[j] - center <= best_distance:
+            if self.order[j].id not in claimed:
+                best = self.order[j]
+                break
+            j += 1
+        return best
+
+    def expire(self, now):
+        """Удаление треков, срок жизни которых истек; список удаленных"""
+        lost = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            expires, track_id = heapq.heappop(heap)
+            track = self.tracks.get(track_id)
+            # Запись устарела, если трек с тех пор продлевался
+            if track is not None and track.expires == expires:
+                del self.tracks[track_id]
+                self.remove(track)
+                lost.append(track)
+        if lost:
+            self.cached_snapshot = None
+        return lost
+
+    def snapshot(self):
+        """Треки для публикации, сильнейшие первыми (общий кортеж до следующего изменения)"""
+        if self.cached_snapshot is None:
+            self.cached_snapshot = tuple(t.to_dict() for t in
+                                         sorted(self.tracks.values(), key=lambda t: -t.rssi))
+        return self.cached_snapshot
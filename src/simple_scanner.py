@@ -6,71 +6,143 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
+import argparse
+import sys
 import time
-import cv2
-import numpy as np
-import RPi.GPIO as GPIO
-import spidev
-import subprocess
-import os
-from PIL import Image, ImageTk
-import json
+
+from startup import PROFILE
+from event_log import EventLog, LEVELS, get_logger
+from api_server import ApiServer
+from metrics import MetricsServer
+from rx5808_backend import SimulatedRX5808Backend
+from scan_engine import ScanEngine, HardwareError, load_config, CONFIG_PATH
+from scan_config import ConfigError, ConfigWatcher, override_scanner
+from spectrum_renderer import SpectrumRenderer
+from scan_snapshot import GuiCallQueue
+from video_pipeline import VideoPipeline, VideoDisplay
+from video_recorder import VideoRecorder
+from video_stream import MjpegStream
+from video_devices import VideoDeviceRegistry
+from diversity import DiversityController
+
+log = get_logger('gui')
 
 class SimpleFPVScanner:
-    def __init__(self):
-        # GPIO конфигурация для RX5808
-        self.CS_PIN = 8          # CH2 (Chip Select)
-        self.RSSI_PIN = 7       # RSSI input
-        self.SPI_BUS = 0
-        self.SPI_DEVICE = 0
-        
-        # Видео конфигурация
-        self.video_device = self.find_video_device()
-        self.video_width = 640
-        self.video_height = 480
-        self.video_fps = 30
-        
-        # FPV каналы 5.8 ГГц
-        self.channels = {
-            'A': 5865, 'B': 5845, 'C': 5825, 'D': 5805,
-            'E': 5785, 'F': 5765, 'G': 5745, 'H': 5725
-        }
+    def __init__(self, backend=None, engine=None, event_log=None, backends=None,
+                 config_overrides=None, profile_startup=False):
+        # Движок сканирования (без GUI); окно - один из его потребителей
+        if engine is None:
+            engine = ScanEngine(load_config(), backend, backends=backends)
+        self.engine = engine
+        self.config = engine.config
+        self.config_overrides = config_overrides or {}
+        
+        # Журнал событий (раздел logging), запись в фоновом потоке
+        if event_log is None:
+            event_log = EventLog.from_config(self.config.get('logging', {})).start()
+        self.event_log = event_log
+        self.profile_startup = profile_startup
+        
+        # Видео конфигурация (hardware.video): узел и режим USB DVR
+        video_config = self.config.get('hardware', {}).get('video', {})
+        self.video_width = video_config.get('width', 640)
+        self.video_height = video_config.get('height', 480)
+        self.video_fps = video_config.get('fps', 30)
+        self.video_codec = video_config.get('codec', 'MJPG')
+        self.video_device = self.find_video_device(video_config)
+        
+        # Очередь вызовов Tk из рабочих потоков
+        self.gui_calls = GuiCallQueue()
+        update_rate = self.config.get('display', {}).get('update_rate', 10)
+        self.frame_interval_ms = max(10, int(1000 / max(1, update_rate)))
         
         # Состояние сканера
-        self.scanning = False
-        self.current_channel = 'A'
-        self.detected_signals = {}
+        self.current_channel = next(iter(self.channels), '')
+        self.current_frequency = self.channels.get(self.current_channel)
         self.video_capturing = False
+        self.video_pipeline = None
+        
+        # Запись видео с предзаписью (захват идет постоянно)
+        recording_config = self.config.get('recording', {})
+        self.recorder = None
+        if recording_config.get('enabled', False):
+            self.recorder = VideoRecorder.from_config(recording_config)
+            self.recorder.start()
+        
+        # Замеры отрисовки и вывода видео, эндпоинт метрик на localhost
+        self.setup_metrics()
+        self.setup_api()
         
         # Инициализация оборудования
+        self.diversity = None
+        self.config_watcher = None
         if not self.setup_hardware():
             print("❌ Не удалось инициализировать оборудование")
             return
+        PROFILE.mark('hardware')
+        
+        # Разнесенный прием: два приемника и два видеовхода
+        self.setup_diversity()
+        
+        # Предзапись требует постоянно работающего захвата
+        if self.recorder is not None:
+            self.ensure_video_pipeline()
+        
+        # Обнаружения движка запускают захват видео
+        self.engine.add_listener(self.on_engine_event)
         
         # Создание GUI
         self.create_gui()
+        PROFILE.mark('gui')
+        
+        # Перезагрузка конфигурации без перезапуска (scanner.hot_reload)
+        if self.config.get('scanner', {}).get('hot_reload', False):
+            self.config_watcher = ConfigWatcher(CONFIG_PATH, self.on_config_change).start()
         
-    def find_video_device(self):
-        """Автоматическое определение USB Video DVR"""
+    @property
+    def scanning(self):
+        return self.engine.scanning
+    
+    @property
+    def channels(self):
+        """Каналы активного режима движка"""
+        return self.engine.channels
+    
+    def on_config_change(self, config):
+        """Новая конфигурация из файла (поток наблюдателя)"""
+        self.engine.reload(override_scanner(config, **self.config_overrides))
+    
+    def find_video_device(self, video_config):
+        """Определение USB Video DVR и его режима (sysfs, кэш возможностей V4L2)"""
+        device = video_config.get('device', 'auto')
+        node = None if device == 'auto' else device
         try:
-            result = subprocess.run(['ls', '/dev/video*'], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                devices = result.stdout.strip().split('\n')
-                for device in devices:
-                    if device.strip():
-                        return device.strip()
-            return "/dev/video0"
-        except:
-            return "/dev/video0"
+            found, mode = VideoDeviceRegistry.from_config(video_config).select(
+                self.video_width, self.video_height, self.video_fps, self.video_codec, node=node)
+        except Exception as e:
+            log.warning("⚠️  Поиск видеоустройств не удался: %s", e)
+            found, mode = None, None
+        if found is None:
+            return node or "/dev/video0"
+        if mode is not None:
+            # Самый быстрый подходящий режим: согласование формата пройдет с первой попытки
+            self.video_width, self.video_height = mode.width, mode.height
+            self.video_fps = mode.fps
+            self.video_codec = mode.fourcc
+        print(f"✅ USB Video DVR: {found.node} ({found.name}, USB {found.usb_path or '-'}), "
+              f"режим {mode}")
+        return found.node
     
     def setup_hardware(self):
-        """Инициализация GPIO и SPI для RX5808"""
+        """Инициализация радиобэкенда RX5808"""
         try:
-            # Проверка SPI устройств
-            import os
-            if not os.path.exists('/dev/spi0.0'):
+            self.engine.open()
+            print(f"✅ Оборудование инициализировано успешно (бэкенд: {self.engine.backend.name}, "
+                  f"приемников: {len(self.engine.backends)})")
+            return True
+            
+        except HardwareError as e:
+            if e.spi_disabled:
                 print("❌ SPI не включен! Включите SPI в настройках Raspberry Pi:")
                 print("1. sudo nano /boot/firmware/config.txt")
                 print("2. Добавьте строку: dtparam=spi=on")
@@ -83,21 +155,6 @@ class SimpleFPVScanner:
                     "3. sudo reboot")
                 return False
             
-            # Настройка GPIO
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.CS_PIN, GPIO.OUT)
-            GPIO.output(self.CS_PIN, GPIO.HIGH)
-            
-            # Настройка SPI
-            self.spi = spidev.SpiDev()
-            self.spi.open(self.SPI_BUS, self.SPI_DEVICE)
-            self.spi.max_speed_hz = 2000000
-            self.spi.mode = 0
-            
-            print("✅ Оборудование инициализировано успешно")
-            return True
-            
-        except Exception as e:
             print(f"❌ Ошибка инициализации оборудования: {e}")
             messagebox.showerror("Ошибка оборудования", 
                 f"Не удалось инициализировать оборудование: {e}\n\n"
@@ -107,125 +164,159 @@ class SimpleFPVScanner:
                 "3. Недостаточно прав доступа")
             return False
     
-    def rx5808_write(self, address, data):
-        """Запись данных в регистр RX5808"""
-        try:
-            command = (address << 3) | data
-            GPIO.output(self.CS_PIN, GPIO.LOW)
-            self.spi.writebytes([command])
-            GPIO.output(self.CS_PIN, GPIO.HIGH)
-        except Exception as e:
-            print(f"Ошибка записи RX5808: {e}")
+    def setup_metrics(self):
+        """Этапы GUI и счетчики потерь в реестре метрик движка"""
+        metrics = self.engine.metrics
+        self.display_timer = metrics.stage('update_display')
+        self.video_timer = metrics.stage('capture_video')
+        metrics.gauge('video_frames_dropped',
+                      lambda: self.video_pipeline.ring.dropped if self.video_pipeline else None)
+        metrics.gauge('video_read_failures',
+                      lambda: self.video_pipeline.read_failures if self.video_pipeline else None)
+        metrics.gauge('recorder_frames_dropped',
+                      lambda: self.recorder.dropped if self.recorder else None)
+        metrics.gauge('log_records_dropped', lambda: self.event_log.dropped)
+        
+        metrics_config = self.config.get('metrics', {})
+        self.metrics_server = None
+        if metrics_config.get('enabled', False):
+            self.metrics_server = MetricsServer.from_config(metrics, metrics_config,
+                                                             runtime=self.engine.runtime).start()
+        self.stats_interval = metrics_config.get('panel_interval', 1.0)
+        self.stats_updated = 0.0
     
-    def set_frequency(self, frequency_mhz):
-        """Установка частоты RX5808 в МГц"""
-        try:
-            freq_reg = int((frequency_mhz - 479) / 2)
-            self.rx5808_write(0x01, freq_reg & 0xFF)
-            self.rx5808_write(0x02, (freq_reg >> 8) & 0xFF)
-            self.rx5808_write(0x00, 0x01)
-            print(f"Частота установлена: {frequency_mhz} МГц")
-        except Exception as e:
-            print(f"Ошибка установки частоты: {e}")
+    def setup_api(self):
+        """Локальный REST/WebSocket API (раздел api)"""
+        api_config = self.config.get('api', {})
+        self.api_server = None
+        self.video_stream = None
+        if not api_config.get('enabled', False):
+            return
+        self.api_server = ApiServer.from_config(self.engine, api_config).start()
+        # Ретрансляция захвата в MJPEG на том же сервере (api.video_stream)
+        stream_config = api_config.get('video_stream', {})
+        if self.api_server is not None and stream_config.get('enabled', False):
+            self.video_stream = MjpegStream.from_config(self.engine.runtime, stream_config)
+            self.video_stream.register(self.engine.metrics)
+            self.api_server.route('/video.mjpg', self.video_stream.serve)
+            self.api_server.route('/video.jpg', self.video_stream.serve_snapshot)
     
-    def read_rssi(self):
-        """Чтение значения RSSI с RX5808"""
-        try:
-            GPIO.output(self.CS_PIN, GPIO.LOW)
-            self.spi.writebytes([0x08])
-            response = self.spi.readbytes(1)
-            GPIO.output(self.CS_PIN, GPIO.HIGH)
-            return response[0] if response else 0
-        except Exception as e:
-            print(f"Ошибка чтения RSSI: {e}")
-            return 0
+    def setup_diversity(self):
+        """Разнесенный прием (раздел diversity), если приемников не меньше двух"""
+        diversity_config = self.config.get('diversity', {})
+        if not diversity_config.get('enabled', False):
+            return
+        receivers = diversity_config.get('receivers', [0, 1])
+        if len(self.engine.backends) <= max(receivers):
+            print("⚠️  Разнесенный прием отключен: недостаточно приемников в hardware.receivers")
+            return
+        devices = diversity_config.get('video_devices', ["/dev/video0", "/dev/video1"])
+        # Запись и ретрансляция идут с активного источника; сначала это первый видеовход
+        pipelines = [self.create_video_pipeline(device, self.recorder if i == 0 else None,
+                                                self.video_stream if i == 0 else None)
+                     for i, device in enumerate(devices[:len(receivers)])]
+        self.diversity = DiversityController.from_config(
+            self.engine, pipelines, diversity_config,
+            on_switch=lambda index, pipeline: self.gui_calls.put(
+                self.on_diversity_switch, index, pipeline))
+        print(f"✅ Разнесенный прием: приемники {receivers}, видео {devices[:len(receivers)]}")
+    
+    def on_diversity_switch(self, index, pipeline):
+        """Смена активного видеовхода (главный поток)"""
+        if self.video_capturing:
+            self.video_pipeline = pipeline
+            self.status_label.config(text=f"🔀 Видео с приемника {index + 1} ({pipeline.device})")
+    
+    def on_engine_event(self, event):
+        """Обработка событий движка (в цикле событий; состояние GUI меняет главный поток)"""
+        if event['type'] == 'detection' and event['strong'] and not self.video_capturing:
+            self.gui_calls.put(self.start_video_capture, event['channel'], event['frequency'])
+        elif event['type'] == 'plan' and hasattr(self, 'root'):
+            self.gui_calls.put(self.on_plan_change)
     
-    def scan_channels(self):
-        """Сканирование всех каналов на наличие сигналов"""
-        while self.scanning:
-            for channel, freq in self.channels.items():
-                if not self.scanning:
-                    break
-                    
-                # Установка частоты
-                self.set_frequency(freq)
-                time.sleep(0.1)
-                
-                # Чтение RSSI
-                rssi = self.read_rssi()
-                
-                # Обновление обнаруженных сигналов
-                if rssi > 50:
-                    self.detected_signals[channel] = {
-                        'frequency': freq,
-                        'rssi': rssi,
-                        'strength': min(100, int(rssi * 100 / 255)),
-                        'timestamp': time.time()
-                    }
-                    
-                    # Захват видео при сильном сигнале
-                    if rssi > 100 and not self.video_capturing:
-                        self.start_video_capture(channel, freq)
-                
-                # Обновление GUI
-                self.update_display()
-                
-            time.sleep(0.5)
+    def on_plan_change(self):
+        """Смена режима сканирования (главный поток): каналы и сетка спектра"""
+        self.mode_var.set(self.engine.plan.mode)
+        self.channel_combo.config(values=list(self.channels.keys()))
+        if [int(f) for f in self.engine.history.frequencies] != self.renderer.frequencies:
+            self.create_renderer()
+        self.status_label.config(text=f"Режим: {self.engine.plan.name}")
+    
+    def create_video_pipeline(self, device, recorder=None, stream=None):
+        buffer_size = self.config.get('performance', {}).get('video_buffer_size', 3)
+        return VideoPipeline(device, self.video_width, self.video_height, self.video_fps,
+                             buffer_size=buffer_size, codec=self.video_codec,
+                             recorder=recorder, runtime=self.engine.runtime, stream=stream)
+    
+    def ensure_video_pipeline(self):
+        """Запуск захвата видео, если он еще не работает"""
+        if self.diversity is not None:
+            # Оба видеовхода держатся открытыми, выводится активный
+            for pipeline in self.diversity.pipelines:
+                if not pipeline.is_alive():
+                    pipeline.start()
+            self.video_pipeline = self.diversity.pipeline
+            return self.video_pipeline
+        if self.video_pipeline is not None and self.video_pipeline.is_alive():
+            return self.video_pipeline
+        self.video_pipeline = self.create_video_pipeline(self.video_device, self.recorder,
+                                                         self.video_stream)
+        self.video_pipeline.start()
+        return self.video_pipeline
     
     def start_video_capture(self, channel, frequency):
-        """Запуск захвата видео с обнаруженного сигнала"""
+        """Запуск захвата видео с обнаруженного сигнала (главный поток)"""
+        if self.video_capturing:
+            # Повторные обнаружения, пришедшие до запуска захвата
+            return
         try:
             self.video_capturing = True
             self.current_channel = channel
+            self.current_frequency = frequency
             
             self.status_label.config(text=f"🎥 Захват видео с канала {channel} ({frequency} МГц)")
             
-            # Запуск потока захвата видео
-            video_thread = threading.Thread(target=self.capture_video)
-            video_thread.daemon = True
-            video_thread.start()
+            # Запуск захвата видео в кольцо кадров
+            self.ensure_video_pipeline()
+            
+            # Оба приемника встают на частоту сигнала, видео - с более сильного
+            if self.diversity is not None:
+                self.diversity.start(frequency)
+            
+            # Сброс предзаписи на диск и запись живых кадров
+            if self.recorder is not None:
+                self.recorder.trigger(f"{channel}_{frequency}MHz")
             
         except Exception as e:
-            print(f"Ошибка запуска захвата видео: {e}")
+            log.error("Ошибка запуска захвата видео: %s", e)
+            self.video_capturing = False
     
     def capture_video(self):
-        """Захват и отображение видео с USB Video DVR"""
+        """Вывод последнего захваченного кадра (главный поток, из цикла отрисовки)"""
+        pipeline = self.video_pipeline
+        if pipeline is None:
+            return
+        
+        # Без активного захвата поток работает только на предзапись
+        frame = pipeline.ring.acquire_read() if self.video_capturing else None
         try:
-            cap = cv2.VideoCapture(self.video_device)
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.video_width)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.video_height)
-            cap.set(cv2.CAP_PROP_FPS, self.video_fps)
-            
-            if not cap.isOpened():
-                print("Не удалось открыть видеоустройство")
-                return
-            
-            while self.video_capturing:
-                ret, frame = cap.read()
-                if ret:
-                    # Добавление информации о канале
-                    cv2.putText(frame, f"Канал: {self.current_channel}", 
-                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(frame, f"Частота: {self.channels[self.current_channel]} МГц", 
-                               (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                    
-                    # Конвертация для Tkinter
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame_pil = Image.fromarray(frame_rgb)
-                    frame_tk = ImageTk.PhotoImage(frame_pil)
-                    
-                    # Обновление отображения видео
-                    self.video_label.config(image=frame_tk)
-                    self.video_label.image = frame_tk
-                
-                time.sleep(1.0 / self.video_fps)
-            
-            cap.release()
-            
-        except Exception as e:
-            print(f"Ошибка захвата видео: {e}")
+            if frame is not None:
+                # Информация о канале поверх кадра (цвета в RGB)
+                with self.video_timer.time():
+                    self.video_display.show(frame, (
+                        (f"Канал: {self.current_channel}", 0.7, (0, 255, 0)),
+                        (f"Частота: {self.current_frequency} МГц", 0.6, (0, 255, 255)),
+                    ))
         finally:
+            pipeline.ring.release_read()
+        
+        # Поток захвата завершился (ошибка устройства или остановка)
+        if not pipeline.is_alive():
+            self.video_pipeline = None
             self.video_capturing = False
+            self.video_display.clear("Нет видеосигнала")
+            if self.recorder is not None:
+                self.recorder.stop_recording()
     
     def create_gui(self):
         """Создание главного окна GUI"""
@@ -250,6 +341,14 @@ class SimpleFPVScanner:
         
         # Строка состояния
         self.create_status_bar()
+        
+        # Панель статистики горячего пути
+        self.create_stats_panel()
+        
+        # Запуск цикла отрисовки
+        self.first_frame = True
+        self.engine.publish_state()
+        self.root.after(self.frame_interval_ms, self.render_loop)
     
     def create_control_panel(self):
         """Создание панели управления"""
@@ -266,13 +365,22 @@ class SimpleFPVScanner:
                                       command=self.stop_video_capture)
         self.video_button.pack(side="left", padx=5)
         
+        # Режим сканирования (scanner.scan_modes)
+        ttk.Label(control_frame, text="Режим:").pack(side="left", padx=5)
+        self.mode_var = tk.StringVar(value=self.engine.plan.mode)
+        mode_combo = ttk.Combobox(control_frame, textvariable=self.mode_var,
+                                  values=list(self.engine.plans), width=14, state="readonly")
+        mode_combo.pack(side="left", padx=5)
+        mode_combo.bind("<<ComboboxSelected>>",
+                        lambda e: self.engine.select_mode(self.mode_var.get()))
+        
         # Выбор канала
         ttk.Label(control_frame, text="Канал:").pack(side="left", padx=5)
-        self.channel_var = tk.StringVar(value="A")
-        channel_combo = ttk.Combobox(control_frame, textvariable=self.channel_var, 
-                                    values=list(self.channels.keys()), width=5)
-        channel_combo.pack(side="left", padx=5)
-        channel_combo.bind("<<ComboboxSelected>>", self.on_channel_select)
+        self.channel_var = tk.StringVar(value=self.current_channel)
+        self.channel_combo = ttk.Combobox(control_frame, textvariable=self.channel_var, 
+                                          values=list(self.channels.keys()), width=5)
+        self.channel_combo.pack(side="left", padx=5)
+        self.channel_combo.bind("<<ComboboxSelected>>", self.on_channel_select)
         
         # Порог RSSI
         ttk.Label(control_frame, text="Порог RSSI:").pack(side="left", padx=5)
@@ -280,6 +388,15 @@ class SimpleFPVScanner:
         threshold_scale = ttk.Scale(control_frame, from_=0, to=255, 
                                    variable=self.threshold_var, orient="horizontal")
         threshold_scale.pack(side="left", padx=5)
+        
+        # Уровень журнала (меняется без перезапуска)
+        ttk.Label(control_frame, text="Журнал:").pack(side="left", padx=5)
+        self.log_level_var = tk.StringVar(value=self.event_log.level)
+        log_level_combo = ttk.Combobox(control_frame, textvariable=self.log_level_var,
+                                       values=list(LEVELS), width=8, state="readonly")
+        log_level_combo.pack(side="left", padx=5)
+        log_level_combo.bind("<<ComboboxSelected>>",
+                             lambda e: self.event_log.set_level(self.log_level_var.get()))
     
     def create_spectrum_display(self):
         """Создание отображения частотного спектра"""
@@ -290,9 +407,17 @@ class SimpleFPVScanner:
         self.spectrum_canvas = tk.Canvas(spectrum_frame, width=400, height=300, 
                                         bg="black", highlightthickness=0)
         self.spectrum_canvas.pack(fill="both", expand=True)
-        
-        # Отрисовка шкалы частот
-        self.draw_frequency_scale()
+        self.create_renderer()
+    
+    def create_renderer(self):
+        """Рендер спектра и водопада для сетки бинов текущего режима"""
+        # Подписи рисуются один раз; подписи каналов - только когда бины совпадают с каналами
+        labels = list(self.channels.keys())
+        if len(labels) != self.engine.history.bins:
+            labels = None
+        self.renderer = SpectrumRenderer(self.spectrum_canvas, self.engine.history.frequencies,
+                                         labels=labels)
+        self.engine.snapshot_rows = self.renderer.waterfall_height
     
     def create_video_display(self):
         """Создание области отображения видео"""
@@ -303,6 +428,7 @@ class SimpleFPVScanner:
         self.video_label = ttk.Label(video_frame, text="Нет видеосигнала", 
                                     background="black", foreground="white")
         self.video_label.pack(fill="both", expand=True)
+        self.video_display = VideoDisplay(self.video_label)
     
     def create_status_bar(self):
         """Создание строки состояния"""
@@ -316,85 +442,113 @@ class SimpleFPVScanner:
         self.signal_count_label = ttk.Label(status_frame, text="Сигналов: 0")
         self.signal_count_label.pack(side="right")
     
-    def draw_frequency_scale(self):
-        """Отрисовка шкалы частот на canvas спектра"""
-        canvas = self.spectrum_canvas
-        canvas.delete("all")
-        
-        # Заголовок
-        canvas.create_text(200, 20, text="5.8 ГГц FPV Частотный спектр", 
-                          fill="white", font=("Arial", 12, "bold"))
-        
-        # Маркеры частот
-        x_start = 50
-        x_end = 350
-        y_base = 250
-        
-        for i, (channel, freq) in enumerate(self.channels.items()):
-            x = x_start + (i * (x_end - x_start) / (len(self.channels) - 1))
-            
-            # Метка частоты
-            canvas.create_text(x, y_base + 20, text=f"{freq}", 
-                              fill="white", font=("Arial", 8))
-            canvas.create_text(x, y_base + 35, text=channel, 
-                              fill="yellow", font=("Arial", 10, "bold"))
-            
-            # Полоса силы сигнала
-            if channel in self.detected_signals:
-                signal = self.detected_signals[channel]
-                strength = signal['strength']
-                bar_height = int((strength / 100) * 150)
-                
-                # Цвет в зависимости от силы
-                if strength > 80:
-                    color = "red"
-                elif strength > 60:
-                    color = "orange"
-                elif strength > 40:
-                    color = "yellow"
-                else:
-                    color = "green"
-                
-                canvas.create_rectangle(x-10, y_base - bar_height, x+10, y_base, 
-                                      fill=color, outline="white")
-                
-                # Значение RSSI
-                canvas.create_text(x, y_base - bar_height - 10, 
-                                  text=f"{signal['rssi']}", 
-                                  fill="white", font=("Arial", 8))
+    def create_stats_panel(self):
+        """Создание панели статистики (процентили этапов и потери)"""
+        stats_frame = ttk.LabelFrame(self.root, text="📈 Статистика", padding="5")
+        stats_frame.grid(row=3, column=0, columnspan=2, sticky="ew", padx=10, pady=5)
+        
+        self.stats_label = ttk.Label(stats_frame, text="Нет данных",
+                                     font=("Courier", 9), justify="left")
+        self.stats_label.pack(side="left")
     
-    def update_display(self):
-        """Обновление отображения с текущими данными сигнала"""
-        self.draw_frequency_scale()
+    def update_stats_panel(self):
+        """Обновление панели статистики (не чаще stats_interval)"""
+        now = time.monotonic()
+        if now - self.stats_updated < self.stats_interval:
+            return
+        self.stats_updated = now
+        
+        metrics = self.engine.metrics
+        lines = [f"Проходов/с: {metrics.rate('sweeps').rate():5.1f}"]
+        for stage, (p50, p95, p99, count) in metrics.summary().items():
+            lines.append(f"{stage:<15} p50 {p50 * 1000:8.3f}  p95 {p95 * 1000:8.3f}  "
+                         f"p99 {p99 * 1000:8.3f} мс  n={count}")
+        gauges = metrics.read_gauges()
+        if gauges:
+            lines.append("  ".join(f"{name}={value}" for name, value in gauges.items()))
+        self.stats_label.config(text="\n".join(lines))
+    
+    def draw_frequency_scale(self, snapshot):
+        """Отрисовка спектра и водопада из снимка состояния"""
+        if len(snapshot.spectrum) != len(self.renderer.frequencies):
+            # Снимок прежнего режима, опубликованный до смены плана
+            return
+        self.renderer.render(snapshot.spectrum, snapshot.waterfall,
+                             max_hold=snapshot.max_hold,
+                             threshold=self.engine.rssi_threshold)
+    
+    def update_display(self, snapshot):
+        """Обновление отображения по снимку состояния"""
+        self.draw_frequency_scale(snapshot)
         
         # Обновление счетчика сигналов
-        signal_count = len(self.detected_signals)
-        self.signal_count_label.config(text=f"Сигналов: {signal_count}")
+        video = sum(1 for e in snapshot.emitters if e.kind == 'analog_video')
+        self.signal_count_label.config(
+            text=f"Сигналов: {len(snapshot.signals)}  Излучателей: {len(snapshot.emitters)}"
+                 f" (видео: {video})  Треков: {len(snapshot.tracks)}")
+    
+    def render_loop(self):
+        """Единственный цикл отрисовки в главном потоке с ограничением частоты кадров"""
+        if self.first_frame:
+            # Первый кадр - окно на экране: конец профиля запуска
+            self.first_frame = False
+            PROFILE.mark('first_frame')
+            if self.profile_startup:
+                PROFILE.report()
+        self.gui_calls.drain()
+        
+        # Видео: только последний кадр из кольца, пропущенные отброшены
+        if self.video_pipeline is not None:
+            self.capture_video()
         
-        # Планирование следующего обновления
-        if self.scanning:
-            self.root.after(100, self.update_display)
+        # Перерисовка только при новом снимке; промежуточные снимки уже отброшены
+        snapshot = self.engine.snapshots.take()
+        if snapshot is not None:
+            try:
+                with self.display_timer.time():
+                    self.update_display(snapshot)
+            except Exception as e:
+                log.error("Ошибка отрисовки: %s", e)
+        
+        self.update_stats_panel()
+        
+        # Во время захвата видео цикл идет с частотой кадров видео,
+        # спектр при этом перерисовывается только по новым снимкам
+        interval = self.frame_interval_ms
+        if self.video_capturing:
+            interval = min(interval, max(10, int(1000 / max(1, self.video_fps))))
+        self.root.after(interval, self.render_loop)
     
     def toggle_scanning(self):
         """Переключение сканирования вкл/выкл"""
         if not self.scanning:
-            self.scanning = True
             self.scan_button.config(text="⏹️ Остановить сканирование")
             self.status_label.config(text="Сканирование...")
             
             # Запуск потока сканирования
-            scan_thread = threading.Thread(target=self.scan_channels)
-            scan_thread.daemon = True
-            scan_thread.start()
+            self.engine.start()
         else:
-            self.scanning = False
+            self.engine.stop()
             self.scan_button.config(text="▶️ Начать сканирование")
             self.status_label.config(text="Сканирование остановлено")
     
     def stop_video_capture(self):
         """Остановка захвата видео"""
         self.video_capturing = False
-        self.video_label.config(text="Нет видеосигнала")
+        if self.diversity is not None:
+            # Приемники возвращаются к сканированию
+            self.diversity.stop()
+        if self.recorder is not None:
+            # Захват продолжается ради предзаписи, останавливается только запись
+            self.recorder.stop_recording()
+        elif self.diversity is not None:
+            for pipeline in self.diversity.pipelines:
+                pipeline.stop()
+            self.video_pipeline = None
+        elif self.video_pipeline is not None:
+            self.video_pipeline.stop()
+            self.video_pipeline = None
+        self.video_display.clear("Нет видеосигнала")
         self.status_label.config(text="Захват видео остановлен")
     
     def on_channel_select(self, event):
@@ -402,7 +556,7 @@ class SimpleFPVScanner:
         channel = self.channel_var.get()
         if channel in self.channels:
             freq = self.channels[channel]
-            self.set_frequency(freq)
+            self.engine.set_frequency(freq)
             self.status_label.config(text=f"Настроен на канал {channel} ({freq} МГц)")
     
     def run(self):
@@ -416,16 +570,64 @@ class SimpleFPVScanner:
     
     def cleanup(self):
         """Очистка ресурсов"""
-        self.scanning = False
         self.video_capturing = False
+        if self.config_watcher is not None:
+            self.config_watcher.close()
+        if self.video_pipeline is not None:
+            self.video_pipeline.stop()
+        if self.diversity is not None:
+            self.diversity.stop()
+            for pipeline in self.diversity.pipelines:
+                pipeline.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        if self.video_stream is not None:
+            self.video_stream.close()
+        if self.api_server is not None:
+            self.api_server.close()
         
         try:
-            GPIO.cleanup()
-            if hasattr(self, 'spi'):
-                self.spi.close()
+            self.engine.close()
         except:
             pass
+        self.engine.runtime.stop()
+        
+        self.event_log.close()
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Простой FPV сканер RX5808")
+    parser.add_argument('--simulate', action='store_true',
+                        help="симулированный RX5808 вместо SPI (запуск без Raspberry Pi)")
+    parser.add_argument('--seed', type=int, default=5808,
+                        help="зерно генератора шума симулятора")
+    parser.add_argument('--receivers', type=int, default=1,
+                        help="число симулированных приемников (параллельное сканирование)")
+    parser.add_argument('--sweep-mode', choices=('channels', 'coarse_fine'), default=None,
+                        help="режим прохода (по умолчанию - scanner.sweep_mode)")
+    parser.add_argument('--scan-mode', default=None,
+                        help="режим из scanner.scan_modes (по умолчанию - scanner.scan_mode)")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="вывести время фаз запуска до первого кадра окна")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    scanner = SimpleFPVScanner()
+    PROFILE.mark('imports')
+    args = parse_args()
+    backends = None
+    if args.simulate:
+        backends = [SimulatedRX5808Backend(seed=args.seed + i) for i in range(args.receivers)]
+    overrides = {'sweep_mode': args.sweep_mode, 'scan_mode': args.scan_mode}
+    try:
+        engine = ScanEngine(override_scanner(load_config(), **overrides), backends=backends)
+    except ConfigError as e:
+        print("❌ Ошибка конфигурации:")
+        for problem in e.problems:
+            print(f"   {problem}")
+        sys.exit(1)
+    PROFILE.mark('engine')
+    scanner = SimpleFPVScanner(engine=engine, config_overrides=overrides,
+                               profile_startup=args.profile_startup)
     scanner.run()
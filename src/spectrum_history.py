@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+История спектра на кольцевом буфере NumPy
+Каждый проход сканирования сохраняется строкой в предвыделенный массив
+(время x частота), скользящее среднее и удержание максимума/минимума
+считаются векторно по последним строкам.
+"""
+
+import time
+
+import numpy as np
+
+
+class SpectrumHistory:
+    """Кольцевой буфер проходов сканирования фиксированного размера
+
+    frequencies - частоты бинов, МГц (порядок столбцов)
+    depth       - число хранимых проходов; память = depth * len(frequencies) * 4 байт
+
+    Бины, не измеренные в текущем проходе (например, пропущенные
+    планировщиком), сохраняют последнее измеренное значение.
+    """
+
+    def __init__(self, frequencies, depth=256, averaging=5, fill=0.0):
+        self.frequencies = np.asarray(list(frequencies), dtype=np.int32)
+        self.depth = max(1, int(depth))
+        self.averaging = max(1, int(averaging))
+        self.index = {int(freq): i for i, freq in enumerate(self.frequencies)}
+        self.data = np.full((self.depth, len(self.frequencies)), fill, dtype=np.float32)
+        self.timestamps = np.zeros(self.depth, dtype=np.float64)
+        self.current = np.full(len(self.frequencies), fill, dtype=np.float32)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def bins(self):
+        return len(self.frequencies)
+
+    def __len__(self):
+        return self.count
+
+    def set(self, frequency_mhz, rssi):
+        """Запись отсчета в текущий (незавершенный) проход"""
+        i = self.index.get(frequency_mhz)
+        if i is not None:
+            self.current[i] = rssi
+
+    def set_sweep(self, values):
+        """Запись целого прохода массивом по всем бинам"""
+        self.current[:] = values
+
+    def commit(self, timestamp=None):
+        """Сохранение текущего прохода в кольцевой буфер"""
+        self.data[self.head] = self.current
+        self.timestamps[self.head] = time.time() if timestamp is None else timestamp
+        self.head = (self.head + 1) % self.depth
+        if self.count < self.depth:
+            self.count += 1
+
+    def recent(self, n=None):
+        """Последние n проходов в хронологическом порядке (копия, n x bins)"""
+        n = self.count if n is None else max(0, min(int(n), self.count))
+        rows = (self.head - n + np.arange(n)) % self.depth
+        return self.data[rows]
+
+    def latest(self):
+        """Текущие значения с учетом незавершенного прохода"""
+        return self.current
+
+    def moving_average(self, n=None):
+        """Скользящее среднее по последним n проходам (performance.rssi_averaging)"""
+        if self.count == 0:
+            return self.current.copy()
+        return self.recent(self.averaging if n is None else n).mean(axis=0)
+
+    def max_hold(self, n=None):
+        """Удержание максимума по последним n проходам (по всей истории, если n=None)"""
+        if self.count == 0:
+            return self.current.copy()
+        return self.recent(n).max(axis=0)
+
+    def min_hold(self, n=None):
+        """Удержание минимума по последним n проходам (по всей истории, если n=None)"""
+        if self.count == 0:
+            return self.current.copy()
+        return self.recent(n).min(axis=0)
+
+    def clear(self):
+        self.data.fill(0)
+        self.current.fill(0)
+        self.timestamps.fill(0)
+        self.head = 0
+        self.count = 0
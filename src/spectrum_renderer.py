@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Отрисовка спектра и водопада через пиксельный буфер
+Спектр и прокручиваемый водопад рисуются в предвыделенный массив NumPy
+и выводятся одним обновлением PhotoImage. Заголовок и подписи частот
+создаются на canvas один раз, поэтому стоимость кадра не зависит
+от числа бинов и глубины истории.
+"""
+
+import numpy as np
+
+from startup import lazy_import
+
+Image = lazy_import('PIL.Image')
+ImageTk = lazy_import('PIL.ImageTk')
+
+
+def build_palette():
+    """Палитра водопада 256x3: черный -> синий -> зеленый -> желтый -> красный"""
+    stops = [(0, (0, 0, 0)), (64, (0, 0, 160)), (128, (0, 200, 0)),
+             (192, (255, 255, 0)), (255, (255, 0, 0))]
+    x = np.arange(256)
+    points = [p for p, _ in stops]
+    palette = np.empty((256, 3), dtype=np.uint8)
+    for channel in range(3):
+        palette[:, channel] = np.interp(x, points, [c[channel] for _, c in stops])
+    return palette
+
+
+# Цвета полос спектра по силе сигнала (как в прежней отрисовке)
+BAR_COLORS = np.array([
+    (0, 128, 0),      # green
+    (255, 255, 0),    # yellow
+    (255, 165, 0),    # orange
+    (255, 0, 0),      # red
+], dtype=np.uint8)
+BAR_LEVELS = np.array([40, 60, 80])  # границы силы сигнала в процентах
+
+
+class SpectrumRenderer:
+    """Рендер спектра и водопада в один PhotoImage на canvas"""
+
+    def __init__(self, canvas, frequencies, labels=None, width=400, height=300,
+                 spectrum_height=120, waterfall_height=90, margin_x=40, top=35,
+                 background=(0, 0, 0)):
+        self.canvas = canvas
+        self.frequencies = [int(f) for f in frequencies]
+        self.labels = list(labels) if labels is not None else None
+        self.width = width
+        self.height = height
+        self.margin_x = margin_x
+        self.top = top
+        self.plot_width = width - 2 * margin_x
+        self.spectrum_height = spectrum_height
+        self.waterfall_height = waterfall_height
+        self.image_height = spectrum_height + 4 + waterfall_height
+        self.background = np.array(background, dtype=np.uint8)
+        self.palette = build_palette()
+
+        # Предвычисленные индексы: столбец пикселя -> бин, строка -> уровень
+        bins = max(1, len(self.frequencies))
+        self.column_bins = (np.arange(self.plot_width) * bins) // self.plot_width
+        self.row_levels = np.arange(spectrum_height)[::-1, None]
+
+        # Переиспользуемые буферы
+        self.pixels = np.zeros((self.image_height, self.plot_width, 3), dtype=np.uint8)
+        self.spectrum = self.pixels[:spectrum_height]
+        self.waterfall = self.pixels[spectrum_height + 4:]
+        self.pixels[spectrum_height:spectrum_height + 4] = (40, 40, 40)
+
+        # Без canvas (бенчмарк, тесты без дисплея) доступна только compose()
+        self.photo = None
+        self.image_item = None
+        if canvas is not None:
+            self.photo = ImageTk.PhotoImage(Image.new('RGB', (self.plot_width, self.image_height)))
+            self.draw_static()
+
+    def draw_static(self):
+        """Однократная отрисовка неизменных элементов"""
+        canvas = self.canvas
+        canvas.delete("all")
+        canvas.create_text(self.width / 2, 20, text="5.8 ГГц FPV Частотный спектр",
+                           fill="white", font=("Arial", 12, "bold"))
+        self.image_item = canvas.create_image(self.margin_x, self.top, anchor="nw",
+                                              image=self.photo)
+
+        # Подписи частот: не больше ~8 подписей независимо от числа бинов
+        bins = len(self.frequencies)
+        y_base = self.top + self.image_height
+        step = max(1, int(np.ceil(bins / 8)))
+        for i in range(0, bins, step):
+            x = self.margin_x + (i + 0.5) * self.plot_width / bins
+            canvas.create_text(x, y_base + 10, text=f"{self.frequencies[i]}",
+                               fill="white", font=("Arial", 8))
+            if self.labels is not None:
+                canvas.create_text(x, y_base + 24, text=self.labels[i],
+                                   fill="yellow", font=("Arial", 10, "bold"))
+
+    def render(self, spectrum, waterfall=None, max_hold=None, threshold=None):
+        """Вывод кадра на canvas (аргументы - как у compose)"""
+        self.photo.paste(Image.fromarray(self.compose(spectrum, waterfall, max_hold, threshold)))
+
+    def compose(self, spectrum, waterfall=None, max_hold=None, threshold=None):
+        """Сборка кадра в буфер pixels (без обращения к Tk)
+
+        spectrum  - текущие уровни по бинам (0-255)
+        waterfall - последние проходы (n x bins) в хронологическом порядке
+        max_hold  - уровни удержания максимума (рисуются линией)
+        threshold - порог обнаружения (рисуется горизонтальной линией)
+        """
+        h = self.spectrum_height
+        levels = np.clip(np.asarray(spectrum, dtype=np.float32), 0, 255)[self.column_bins]
+        heights = (levels * h / 255).astype(np.int32)
+
+        # Полосы спектра: цвет по силе сигнала в процентах
+        strength = levels * 100 / 255
+        colors = BAR_COLORS[np.searchsorted(BAR_LEVELS, strength, side='right')]
+        mask = self.row_levels < heights[None, :]
+        self.spectrum[:] = self.background
+        self.spectrum[mask] = np.broadcast_to(colors[None, :, :], self.spectrum.shape)[mask]
+
+        if max_hold is not None:
+            hold = np.clip(np.asarray(max_hold, dtype=np.float32), 0, 255)[self.column_bins]
+            rows = np.clip(h - 1 - (hold * h / 255).astype(np.int32), 0, h - 1)
+            self.spectrum[rows, np.arange(self.plot_width)] = (255, 255, 255)
+
+        if threshold is not None:
+            row = int(np.clip(h - 1 - threshold * h / 255, 0, h - 1))
+            self.spectrum[row, ::4] = (128, 128, 128)
+
+        # Водопад: новейший проход сверху
+        if waterfall is not None and len(waterfall):
+            rows = np.asarray(waterfall)[-self.waterfall_height:][::-1]
+            indices = np.clip(rows, 0, 255).astype(np.uint8)[:, self.column_bins]
+            n = len(indices)
+            self.waterfall[:n] = self.palette[indices]
+            self.waterfall[n:] = self.background
+
+        return self.pixels
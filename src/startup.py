@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Профиль запуска и отложенный импорт тяжелых модулей
+OpenCV и PIL импортируются при первом обращении к ним
+(например, cv2 - при запуске захвата видео), а не при загрузке сканера.
+Время каждой фазы запуска и каждого отложенного импорта записывается
+в PROFILE; с --profile-startup отчет выводится в stderr.
+"""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+
+def process_age():
+    """Время с запуска процесса, с (по /proc; None вне Linux)"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Поле 22 - время старта в тиках; имя процесса может содержать пробелы
+            started = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Фазы запуска: mark(name) закрывает фазу, начатую предыдущей отметкой"""
+
+    def __init__(self):
+        # Запуск интерпретатора до импорта этого модуля
+        self.interpreter = process_age()
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.imports = []
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.append((name, now - self.last))
+            self.last = now
+
+    def record_import(self, name, seconds):
+        with self.lock:
+            self.imports.append((name, seconds, threading.current_thread().name,
+                                 time.perf_counter() - self.started))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self, stream=None):
+        """Вывод таблицы фаз и отложенных импортов (по умолчанию в stderr)"""
+        stream = sys.stderr if stream is None else stream
+        with self.lock:
+            phases = list(self.phases)
+            imports = list(self.imports)
+        lines = ["⏱️  Профиль запуска:"]
+        if self.interpreter is not None:
+            lines.append(f"   {'interpreter':<16} {self.interpreter * 1000:8.1f} мс "
+                         f"(до импорта startup, точность /proc - 10 мс)")
+        total = 0.0
+        for name, seconds in phases:
+            total += seconds
+            lines.append(f"   {name:<16} {seconds * 1000:8.1f} мс  (итого {total * 1000:8.1f} мс)")
+        for name, seconds, thread, at in imports:
+            lines.append(f"   {'import ' + name:<16} {seconds * 1000:8.1f} мс  "
+                         f"(на {at * 1000:.0f} мс, поток {thread})")
+        print("\n".join(lines), file=stream)
+
+
+PROFILE = StartupProfile()
+
+
+class LazyModule:
+    """Модуль, импортируемый при первом обращении к атрибуту
+
+    Импорт выполняется один раз (под блокировкой, из любого потока)
+    и записывается в PROFILE.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    PROFILE.record_import(self._name, time.perf_counter() - started)
+                module = self._module
+        return module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """Отложенный импорт: cv2 = lazy_import('cv2')"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def module_available(name):
+    """Наличие модуля без его импорта
+
+    Для вложенных модулей (RPi.GPIO) пакет ищется, но его __init__
+    не выполняется.
+    """
+    if name in sys.modules:
+        return True
+    parent, _, _ = name.rpartition('.')
+    try:
+        if not parent:
+            return importlib.util.find_spec(name) is not None
+        parent_spec = importlib.util.find_spec(parent)
+    except (ImportError, ValueError):
+        return False
+    if parent_spec is None or parent_spec.submodule_search_locations is None:
+        return False
+    spec = importlib.machinery.PathFinder.find_spec(name, parent_spec.submodule_search_locations)
+    return spec is not None
+
+
+def profile_first_sweep(engine, report=False):
+    """Отметка first_sweep по первому завершенному проходу движка (и отчет, если report)"""
+    def listener(event):
+        if event['type'] == 'sweep':
+            engine.remove_listener(listener)
+            PROFILE.mark('first_sweep')
+            if report:
+                PROFILE.report()
+    engine.add_listener(listener)
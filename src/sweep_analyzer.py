@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Векторный анализ прохода сканирования
+Весь проход обрабатывается массивом за раз: оценка шумового порога,
+поиск пиков, центральная частота (взвешенный центр масс), занимаемая
+полоса и тип излучателя (широкополосное аналоговое видео или узкополосный
+канал управления/телеметрии). Рассчитан на работу прямо в цикле
+сканирования: около сотни микросекунд на проход.
+"""
+
+import numpy as np
+
+# Типы излучателей
+ANALOG_VIDEO = 'analog_video'
+NARROWBAND = 'narrowband'
+UNKNOWN = 'unknown'
+
+
+class Emitter:
+    """Обнаруженный излучатель"""
+
+    __slots__ = ('center', 'bandwidth', 'peak_frequency', 'peak_rssi',
+                 'snr', 'kind', 'confidence', 'bins')
+
+    def __init__(self, center, bandwidth, peak_frequency, peak_rssi, snr, kind,
+                 confidence, bins):
+        self.center = center
+        self.bandwidth = bandwidth
+        self.peak_frequency = peak_frequency
+        self.peak_rssi = peak_rssi
+        self.snr = snr
+        self.kind = kind
+        self.confidence = confidence
+        self.bins = bins
+
+    def to_dict(self):
+        return {
+            'center': round(self.center, 1),
+            'bandwidth': round(self.bandwidth, 1),
+            'peak_frequency': self.peak_frequency,
+            'rssi': self.peak_rssi,
+            'snr': round(self.snr, 1),
+            'kind': self.kind,
+            'confidence': round(self.confidence, 2),
+        }
+
+
+class SweepAnalyzer:
+    """Поиск излучателей в проходе
+
+    frequencies         - частоты бинов, МГц (в порядке столбцов истории)
+    threshold           - абсолютный порог обнаружения RSSI
+    min_snr             - минимальное превышение над шумовым порогом
+    bandwidth_level     - уровень измерения полосы, доля высоты пика над шумом
+                          (0.5 - полная ширина на половине высоты)
+    video_bandwidth_mhz - полоса, начиная с которой сигнал считается аналоговым видео
+    """
+
+    def __init__(self, frequencies, threshold=50, min_snr=6, bandwidth_level=0.5,
+                 video_bandwidth_mhz=8.0):
+        frequencies = np.asarray(list(frequencies), dtype=np.float64)
+        self.order = np.argsort(frequencies, kind='stable')
+        self.frequencies = frequencies[self.order]
+        self.threshold = threshold
+        self.min_snr = min_snr
+        self.bandwidth_level = bandwidth_level
+        self.video_bandwidth_mhz = video_bandwidth_mhz
+
+        # Ширина бина: половина расстояния до соседей (крайние - по одному соседу)
+        if len(self.frequencies) > 1:
+            spacing = np.gradient(self.frequencies)
+        else:
+            spacing = np.array([video_bandwidth_mhz])
+        self.spacing = spacing
+        # Полосу уже видео на сетке грубее видео не измерить
+        self.resolves_video = bool(len(spacing)) and float(np.median(spacing)) < video_bandwidth_mhz
+
+    @classmethod
+    def from_config(cls, frequencies, config):
+        scanner = config.get('scanner', {})
+        analyzer = scanner.get('analyzer', {})
+        return cls(frequencies,
+                   threshold=scanner.get('rssi_threshold', 50),
+                   min_snr=analyzer.get('min_snr', 6),
+                   bandwidth_level=analyzer.get('bandwidth_level', 0.5),
+                   video_bandwidth_mhz=analyzer.get('video_bandwidth_mhz', 8.0))
+
+    def noise_floor(self, rssi):
+        """Шумовой порог: нижняя четверть прохода (большая часть бинов пуста)"""
+        if not len(rssi):
+            return 0.0
+        k = len(rssi) // 4
+        return float(np.partition(rssi, k)[k])
+
+    def analyze(self, rssi):
+        """Список Emitter для прохода (RSSI в порядке столбцов истории)"""
+        if len(rssi) != len(self.frequencies) or not len(rssi):
+            return []
+        values = np.asarray(rssi, dtype=np.float64)[self.order]
+        floor = self.noise_floor(values)
+        level = max(self.threshold, floor + self.min_snr)
+
+        # Сглаживание 3 отсчетами: шум не должен дробить один излучатель
+        if len(values) >= 3:
+            smooth = np.convolve(np.pad(values, 1, mode='edge'), (0.25, 0.5, 0.25), 'valid')
+        else:
+            smooth = values
+        above = values > level
+        if not above.any():
+            return []
+
+        # Участки над порогом; внутри участка излучатели разделяются впадинами
+        n = len(values)
+        left = np.empty(n, dtype=bool)
+        right = np.empty(n, dtype=bool)
+        left[0] = right[-1] = False
+        left[1:] = smooth[1:] < smooth[:-1]
+        right[:-1] = smooth[:-1] <= smooth[1:]
+        valley = left & right & above
+        if not self.resolves_video:
+            # Сетка каналов грубее полосы видео: соседние бины - разные излучатели
+            valley = above
+        start = above & ~np.concatenate(([False], above[:-1]))
+
+        # Сегменты: от начала участка/впадины до следующей границы, только бины над порогом
+        segment = np.cumsum(start | valley) - 1
+        idx = np.flatnonzero(above)
+        seg = segment[idx]
+        boundaries = np.flatnonzero(np.diff(seg)) + 1
+        first = np.concatenate(([0], boundaries))
+        seg_values = values[idx]
+        seg_freqs = self.frequencies[idx]
+
+        peaks = np.maximum.reduceat(seg_values, first)
+        counts = np.diff(np.concatenate((first, [len(idx)])))
+        segment_peaks = np.repeat(peaks, counts)
+
+        # Положение пика: первый бин сегмента, равный его максимуму
+        peak_bins = np.flatnonzero(seg_values == segment_peaks)
+        peak_segments = seg[peak_bins]
+        peak_pos = peak_bins[np.concatenate(([True], peak_segments[1:] != peak_segments[:-1]))]
+
+        # Центр масс по превышению над шумом; полоса на уровне bandwidth_level от пика
+        weights = seg_values - floor
+        centers = np.add.reduceat(weights * seg_freqs, first) / np.add.reduceat(weights, first)
+        in_band = seg_values >= floor + (segment_peaks - floor) * self.bandwidth_level
+        bandwidths = np.add.reduceat(self.spacing[idx] * in_band, first)
+        snrs = peaks - floor
+
+        emitters = []
+        for k in range(len(first)):
+            bandwidth = float(bandwidths[k])
+            if not self.resolves_video or counts[k] < 2:
+                kind = UNKNOWN if not self.resolves_video else NARROWBAND
+            elif bandwidth >= self.video_bandwidth_mhz:
+                kind = ANALOG_VIDEO
+            else:
+                kind = NARROWBAND
+            # Уверенность: запас над шумом, для узких участков - ниже
+            confidence = min(1.0, snrs[k] / 40.0)
+            if kind != UNKNOWN and counts[k] < 3:
+                confidence *= 0.6
+            emitters.append(Emitter(float(centers[k]), bandwidth, int(seg_freqs[peak_pos[k]]),
+                                    int(peaks[k]), float(snrs[k]), kind, float(confidence),
+                                    int(counts[k])))
+        return emitters
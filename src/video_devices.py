@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Поиск USB Video DVR через sysfs и V4L2
+Узлы /dev/videoN перечисляются по /sys/class/video4linux без запуска
+процессов. Возможности каждого устройства (захват, форматы, разрешения,
+частоты кадров) запрашиваются ioctl V4L2 один раз и кэшируются на диске
+по пути USB-порта: номера узлов меняются между загрузками, порт - нет.
+При следующих запусках узел и самый быстрый режим выбираются без
+открытия устройств.
+"""
+
+import fcntl
+import json
+import os
+import re
+import struct
+import time
+
+from event_log import get_logger
+from video_pipeline import CHEAP_FORMATS, fourcc_name
+
+SYSFS_ROOT = '/sys/class/video4linux'
+DEFAULT_CACHE_FILE = '~/.cache/rpiskan/video_devices.json'
+
+# V4L2 (linux/videodev2.h)
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMIVAL_TYPE_DISCRETE = 1
+
+_CAPABILITY = struct.Struct('16s32s32sIII12x')
+_FMTDESC = struct.Struct('III32sII12x')
+_FRMSIZE = struct.Struct('III6I8x')
+_FRMIVAL = struct.Struct('IIIII6I8x')
+
+
+def _iowr(number, size, read_only=False):
+    """Номер ioctl _IOR/_IOWR('V', number, size)"""
+    direction = 2 if read_only else 3
+    return (direction << 30) | (size << 16) | (ord('V') << 8) | number
+
+
+VIDIOC_QUERYCAP = _iowr(0, _CAPABILITY.size, read_only=True)
+VIDIOC_ENUM_FMT = _iowr(2, _FMTDESC.size)
+VIDIOC_ENUM_FRAMESIZES = _iowr(74, _FRMSIZE.size)
+VIDIOC_ENUM_FRAMEINTERVALS = _iowr(75, _FRMIVAL.size)
+
+# Интерфейс USB в пути sysfs: <шина>-<порт>[.<порт>...]:<конфигурация>.<интерфейс>
+_USB_INTERFACE = re.compile(r'^\d+-[\d.]+:\d+\.\d+$')
+
+log = get_logger('video')
+
+
+class VideoMode:
+    """Режим захвата: формат, разрешение и частота кадров"""
+
+    __slots__ = ('fourcc', 'width', 'height', 'fps')
+
+    def __init__(self, fourcc, width, height, fps):
+        self.fourcc = fourcc
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    def to_dict(self):
+        return {'fourcc': self.fourcc, 'width': self.width, 'height': self.height,
+                'fps': self.fps}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['fourcc'], int(data['width']), int(data['height']), float(data['fps']))
+
+    def __repr__(self):
+        return f"{self.fourcc} {self.width}x{self.height}@{self.fps:g}"
+
+
+class VideoDevice:
+    """Узел video4linux и его возможности
+
+    key     - ключ кэша: путь USB-порта или имя устройства в sysfs
+    capture - поддерживает ли узел захват видео (не метаданные и не кодек)
+    """
+
+    __slots__ = ('node', 'name', 'key', 'usb_path', 'capture', 'modes')
+
+    def __init__(self, node, name, key, usb_path, capture=False, modes=()):
+        self.node = node
+        self.name = name
+        self.key = key
+        self.usb_path = usb_path
+        self.capture = capture
+        self.modes = list(modes)
+
+    def __repr__(self):
+        return f"<{self.node} {self.name!r} usb={self.usb_path} modes={len(self.modes)}>"
+
+
+def enumerate_nodes(sysfs_root=SYSFS_ROOT, dev_root='/dev'):
+    """Узлы video4linux из sysfs: список VideoDevice без возможностей"""
+    try:
+        entries = os.listdir(sysfs_root)
+    except OSError:
+        return []
+    nodes = []
+    for entry in entries:
+        match = re.fullmatch(r'video(\d+)', entry)
+        if match is None:
+            continue
+        path = os.path.join(sysfs_root, entry)
+        try:
+            with open(os.path.join(path, 'name'), 'r') as f:
+                name = f.read().strip()
+        except OSError:
+            name = entry
+        device_path = os.path.realpath(os.path.join(path, 'device'))
+        usb_path = None
+        for part in reversed(device_path.split(os.sep)):
+            if _USB_INTERFACE.match(part):
+                usb_path = part.split(':')[0]
+                break
+        # Несколько узлов одного USB-устройства (видео и метаданные) различаются индексом
+        try:
+            with open(os.path.join(path, 'index'), 'r') as f:
+                index = int(f.read().strip())
+        except (OSError, ValueError):
+            index = 0
+        if usb_path:
+            key = f"usb:{usb_path}:{index}"
+        else:
+            key = f"sysfs:{os.path.basename(device_path)}:{index}"
+        nodes.append((int(match.group(1)),
+                      VideoDevice(os.path.join(dev_root, entry), name, key, usb_path)))
+    return [device for _, device in sorted(nodes, key=lambda item: item[0])]
+
+
+def _ioctl(fd, request, structure, *values):
+    buffer = bytearray(structure.pack(*values))
+    fcntl.ioctl(fd, request, buffer)
+    return structure.unpack(bytes(buffer))
+
+
+def probe(node):
+    """Возможности узла через V4L2: (захват, список VideoMode). OSError при ошибке"""
+    fd = os.open(node, os.O_RDWR | os.O_NONBLOCK)
+    try:
+        _, _, _, _, capabilities, device_caps = _ioctl(
+            fd, VIDIOC_QUERYCAP, _CAPABILITY, b'', b'', b'', 0, 0, 0)
+        if capabilities & V4L2_CAP_DEVICE_CAPS:
+            capabilities = device_caps
+        if not capabilities & V4L2_CAP_VIDEO_CAPTURE:
+            return False, []
+
+        modes = []
+        for fmt_index in range(64):
+            try:
+                pixelformat = _ioctl(fd, VIDIOC_ENUM_FMT, _FMTDESC, fmt_index,
+                                     V4L2_BUF_TYPE_VIDEO_CAPTURE, 0, b'', 0, 0)[4]
+            except OSError:
+                break
+            for width, height in _frame_sizes(fd, pixelformat):
+                fps = _max_fps(fd, pixelformat, width, height)
+                if fps:
+                    modes.append(VideoMode(fourcc_name(pixelformat).strip(), width, height, fps))
+        return True, modes
+    finally:
+        os.close(fd)
+
+
+def _frame_sizes(fd, pixelformat):
+    sizes = []
+    for index in range(256):
+        try:
+            values = _ioctl(fd, VIDIOC_ENUM_FRAMESIZES, _FRMSIZE, index, pixelformat, 0,
+                            0, 0, 0, 0, 0, 0)
+        except OSError:
+            break
+        if values[2] == V4L2_FRMSIZE_TYPE_DISCRETE:
+            sizes.append((values[3], values[4]))
+        else:
+            # Непрерывный/ступенчатый диапазон: крайние размеры
+            min_width, max_width, _, min_height, max_height, _ = values[3:9]
+            sizes.extend([(min_width, min_height), (max_width, max_height)])
+            break
+    return sizes
+
+
+def _max_fps(fd, pixelformat, width, height):
+    """Наибольшая частота кадров размера (по минимальному интервалу)"""
+    best = 0.0
+    for index in range(64):
+        try:
+            values = _ioctl(fd, VIDIOC_ENUM_FRAMEINTERVALS, _FRMIVAL, index, pixelformat,
+                            width, height, 0, 0, 0, 0, 0, 0, 0)
+        except OSError:
+            break
+        numerator, denominator = values[5], values[6]
+        if numerator:
+            best = max(best, denominator / numerator)
+        if values[4] != V4L2_FRMIVAL_TYPE_DISCRETE:
+            break
+    return round(best, 2)
+
+
+class VideoDeviceRegistry:
+    """Кэш возможностей видеоустройств и выбор узла/режима захвата
+
+    cache_file - JSON {ключ устройства: {name, capture, modes, probed}}
+    usb_path   - предпочитаемый USB-порт (hardware.video.usb_path)
+    """
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, usb_path=None, sysfs_root=SYSFS_ROOT,
+                 dev_root='/dev'):
+        self.cache_file = os.path.expanduser(cache_file)
+        self.usb_path = usb_path
+        self.sysfs_root = sysfs_root
+        self.dev_root = dev_root
+        self.cache = {}
+        self.dirty = False
+        self.probed = 0
+
+    @classmethod
+    def from_config(cls, video_config):
+        return cls(video_config.get('cache_file', DEFAULT_CACHE_FILE),
+                   usb_path=video_config.get('usb_path'))
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            self.cache = data if isinstance(data, dict) else {}
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def save(self):
+        """Сохранение кэша (только после новых опросов)"""
+        if not self.dirty:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.cache, f, indent=1, sort_keys=True)
+            os.replace(tmp_file, self.cache_file)
+            self.dirty = False
+            return True
+        except OSError as e:
+            log.warning("⚠️  Не удалось сохранить кэш видеоустройств: %s", e)
+            return False
+
+    def devices(self):
+        """Узлы с возможностями: из кэша или, для новых устройств, опросом V4L2"""
+        devices = []
+        for device in enumerate_nodes(self.sysfs_root, self.dev_root):
+            entry = self.cache.get(device.key)
+            if entry is None or entry.get('name') != device.name:
+                # Новое устройство или другое устройство на том же порту
+                try:
+                    capture, modes = probe(device.node)
+                except OSError as e:
+                    log.debug("Узел %s недоступен: %s", device.node, e)
+                    continue
+                entry = {'name': device.name, 'capture': capture,
+                         'modes': [m.to_dict() for m in modes], 'probed': round(time.time())}
+                self.cache[device.key] = entry
+                self.dirty = True
+                self.probed += 1
+            device.capture = bool(entry.get('capture'))
+            device.modes = [VideoMode.from_dict(m) for m in entry.get('modes', [])]
+            devices.append(device)
+        return devices
+
+    def best_mode(self, device, width, height, fps, codec='MJPG'):
+        """Режим устройства, ближайший к запрошенному
+
+        Сначала режимы с частотой кадров не ниже запрошенной, затем
+        разрешение: точное, ближайшее большее, ближайшее меньшее; среди
+        режимов одного разрешения - дешевый для USB формат (codec, затем
+        CHEAP_FORMATS) и частота, ближайшая к запрошенной.
+        """
+        if not device.modes:
+            return None
+        formats = [codec] + [c for c in CHEAP_FORMATS if c != codec]
+
+        def score(mode):
+            area = mode.width * mode.height - width * height
+            exact = (mode.width, mode.height) == (width, height)
+            fps_rank = (0, mode.fps - fps) if mode.fps >= fps else (1, -mode.fps)
+            size_class = 0 if area >= 0 else 1
+            size_rank = (0, 0) if exact else (1, abs(area))
+            format_rank = formats.index(mode.fourcc) if mode.fourcc in formats else len(formats)
+            return fps_rank[0], size_class, size_rank, format_rank, fps_rank[1]
+
+        return min(device.modes, key=score)
+
+    def select(self, width=640, height=480, fps=30, codec='MJPG', node=None):
+        """(VideoDevice, VideoMode) для захвата или (None, None), если устройств нет
+
+        node - только режим для заданного узла. Иначе устройство на порту
+        usb_path имеет приоритет, затем первый узел захвата с запрошенным
+        разрешением, затем первый узел захвата.
+        """
+        self.load()
+        capture = [d for d in self.devices() if d.capture and node in (None, d.node)]
+        self.save()
+        if not capture:
+            return None, None
+        preferred = [d for d in capture if self.usb_path and d.usb_path == self.usb_path]
+        exact = [d for d in capture
+                 if any((m.width, m.height) == (width, height) for m in d.modes)]
+        device = (preferred or exact or capture)[0]
+        return device, self.best_mode(device, width, height, fps, codec)
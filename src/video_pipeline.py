@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Конвейер захвата видео с USB Video DVR
+Захват пишет кадры в ограниченное кольцо предвыделенных буферов
+(performance.video_buffer_size), отображение всегда берет последний кадр,
+а непоказанные кадры отбрасываются. Конвертация для Tk выполняется
+в предвыделенный буфер и выводится в один переиспользуемый PhotoImage.
+Захват - сопрограмма общего цикла asyncio; вызовы OpenCV выполняются
+в пуле из одного потока на видеовход.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+
+from async_runtime import get_runtime
+from event_log import get_logger
+from startup import lazy_import
+
+# OpenCV и PIL загружаются при первом захвате или выводе кадра
+cv2 = lazy_import('cv2')
+Image = lazy_import('PIL.Image')
+ImageTk = lazy_import('PIL.ImageTk')
+
+# Форматы USB DVR в порядке возрастания нагрузки на шину USB
+CHEAP_FORMATS = ('MJPG', 'YUYV')
+
+# Флаги imdecode (имена констант cv2) для декодирования JPEG в уменьшенном разрешении
+REDUCED_DECODE_FLAGS = {
+    1: 'IMREAD_COLOR',
+    2: 'IMREAD_REDUCED_COLOR_2',
+    4: 'IMREAD_REDUCED_COLOR_4',
+    8: 'IMREAD_REDUCED_COLOR_8',
+}
+
+log = get_logger('video')
+
+
+def fourcc_code(name):
+    return cv2.VideoWriter_fourcc(*name)
+
+
+def fourcc_name(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+class SyntheticCapture:
+    """Синтетический источник видео с интерфейсом cv2.VideoCapture
+
+    Отдает кадры с частотой fps (grab() блокируется, как у драйвера),
+    с движущейся полосой и временем захвата (time.perf_counter) в первых
+    пикселях - для замера задержки от захвата до экрана (capture_time).
+    """
+
+    def __init__(self, width=640, height=480, fps=30):
+        self.props = {
+            cv2.CAP_PROP_FRAME_WIDTH: width,
+            cv2.CAP_PROP_FRAME_HEIGHT: height,
+            cv2.CAP_PROP_FPS: fps,
+            cv2.CAP_PROP_FOURCC: fourcc_code('MJPG'),
+        }
+        self.base = np.zeros((height, width, 3), dtype=np.uint8)
+        self.base[:, :, 1] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+        self.frame = self.base.copy()
+        self.period = 1.0 / fps
+        self.next_time = time.perf_counter()
+        self.sequence = 0
+        self.captured = 0.0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def getBackendName(self):
+        return 'SYNTHETIC'
+
+    def set(self, prop, value):
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FOURCC):
+            # Формат фиксирован при создании, как у устройства с одним режимом
+            return False
+        self.props[prop] = value
+        return True
+
+    def get(self, prop):
+        return self.props.get(prop, 0)
+
+    def grab(self):
+        now = time.perf_counter()
+        if now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time = max(self.next_time + self.period, time.perf_counter() - self.period)
+        self.sequence += 1
+        self.captured = time.perf_counter()
+        return self.opened
+
+    def retrieve(self, buffer=None):
+        height, width = self.base.shape[:2]
+        x = (self.sequence * 8) % width
+        np.copyto(self.frame, self.base)
+        self.frame[:, x:x + 8] = 255
+        self.frame[0, :8, 0] = np.frombuffer(np.float64(self.captured).tobytes(), dtype=np.uint8)
+        if buffer is not None and buffer.shape == self.frame.shape:
+            np.copyto(buffer, self.frame)
+            return True, buffer
+        return True, self.frame.copy()
+
+    def release(self):
+        self.opened = False
+
+    @staticmethod
+    def capture_time(frame):
+        """Время захвата кадра (time.perf_counter), записанное в первые пиксели"""
+        return float(np.frombuffer(np.ascontiguousarray(frame[0, :8, 0]).tobytes(),
+                                   dtype=np.float64)[0])
+
+
+class FrameRing:
+    """Кольцо кадровых буферов «последний кадр побеждает»
+
+    Производитель никогда не пишет в последний опубликованный кадр и в кадр,
+    который сейчас читает потребитель, поэтому блокировка держится
+    только на время обмена индексами, а не на время копирования.
+    """
+
+    def __init__(self, size=3, shape=(480, 640, 3)):
+        self.size = max(3, int(size))
+        self.lock = threading.Lock()
+        self.allocate(shape)
+
+    def allocate(self, shape):
+        self.shape = tuple(shape)
+        self.buffers = [np.zeros(self.shape, dtype=np.uint8) for _ in range(self.size)]
+        self.latest = None
+        self.reading = None
+        self.next_slot = 0
+        self.sequence = 0
+        self.taken = 0
+        self.dropped = 0
+
+    def acquire_write(self):
+        """Свободный буфер для записи следующего кадра: (индекс, массив)"""
+        with self.lock:
+            for _ in range(self.size):
+                slot = self.next_slot
+                self.next_slot = (self.next_slot + 1) % self.size
+                if slot != self.latest and slot != self.reading:
+                    return slot, self.buffers[slot]
+        raise RuntimeError("нет свободного кадрового буфера")
+
+    def commit_write(self, slot, frame=None):
+        """Публикация записанного кадра; непрочитанный предыдущий считается потерянным"""
+        with self.lock:
+            if frame is not None and frame is not self.buffers[slot]:
+                # Источник вернул свой массив (другое разрешение) - переносим в кольцо
+                if frame.shape != self.shape:
+                    self.allocate(frame.shape)
+                    slot = 0
+                np.copyto(self.buffers[slot], frame)
+            if self.latest is not None and self.sequence != self.taken:
+                self.dropped += 1
+            self.latest = slot
+            self.sequence += 1
+
+    def discard(self):
+        """Отметка опубликованного кадра как прочитанного (устаревший кадр не покажется)"""
+        with self.lock:
+            self.taken = self.sequence
+
+    def acquire_read(self):
+        """Последний непрочитанный кадр или None"""
+        with self.lock:
+            if self.latest is None or self.sequence == self.taken:
+                return None
+            self.taken = self.sequence
+            self.reading = self.latest
+            return self.buffers[self.reading]
+
+    def release_read(self):
+        with self.lock:
+            self.reading = None
+
+
+class VideoPipeline:
+    """Захват видео в FrameRing (runtime - AsyncRuntime, по умолчанию общий)"""
+
+    def __init__(self, device, width=640, height=480, fps=30, buffer_size=3,
+                 codec="MJPG", raw_mjpeg=True, recorder=None, runtime=None, stream=None):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.codec = codec
+        self.raw_mjpeg = raw_mjpeg
+        self.recorder = recorder
+        self.stream = stream
+        self.ring = FrameRing(buffer_size, (height, width, 3))
+        self.runtime = runtime
+        self.running = False
+        self.task = None
+        self.error = None
+        self.format = None
+        self.raw = False
+        self.frames = 0
+        self.grabbed = 0
+        self.decoded = 0
+        self.read_failures = 0
+        self.analysis_lock = threading.Lock()
+        self.analysis_wanted = False
+        self.last_raw = None
+
+    def open_capture(self):
+        if self.device == "synthetic":
+            cap = SyntheticCapture(self.width, self.height, self.fps)
+        elif isinstance(self.device, str) and self.device.startswith("/dev/video"):
+            cap = cv2.VideoCapture(self.device, cv2.CAP_V4L2)
+        else:
+            cap = cv2.VideoCapture(self.device)
+        if cap.isOpened():
+            self.negotiate(cap)
+            # Минимальная внутренняя очередь драйвера: меньше задержка до экрана
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def negotiate(self, cap):
+        """Выбор самого дешевого формата, который принимает устройство
+
+        Сначала запрошенный кодек (hardware.video.codec), затем остальные из
+        CHEAP_FORMATS. Драйвер V4L2 молча подставляет поддерживаемый формат,
+        поэтому результат проверяется обратным чтением свойств.
+        """
+        candidates = [self.codec] + [c for c in CHEAP_FORMATS if c != self.codec]
+        for codec in candidates:
+            cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(codec))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+            if fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)) == codec:
+                break
+        self.format = {
+            'fourcc': fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+        }
+
+        # MJPG без декодирования в драйвере: кадр приходит сжатым, декодируем сами
+        # (только V4L2: прочие бэкенды отдают несжатые плоскости YUV)
+        if (self.raw_mjpeg and self.format['fourcc'] == 'MJPG' and
+                cap.getBackendName() == 'V4L2'):
+            self.raw = bool(cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+        return self.format
+
+    def request_analysis(self):
+        """Просьба декодировать следующий кадр для анализа"""
+        self.analysis_wanted = True
+
+    def analysis_frame(self, scale=4):
+        """Последний кадр в уменьшенном разрешении (1/scale) для анализа
+
+        Для сжатого MJPG используется декодирование JPEG в уменьшенном
+        масштабе, иначе - уменьшение последнего декодированного кадра.
+        """
+        self.request_analysis()
+        with self.analysis_lock:
+            raw = self.last_raw
+        if raw is not None:
+            flag = getattr(cv2, REDUCED_DECODE_FLAGS.get(scale, 'IMREAD_REDUCED_COLOR_4'))
+            return cv2.imdecode(raw, flag)
+        frame = self.ring.buffers[self.ring.latest] if self.ring.latest is not None else None
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        return cv2.resize(frame, (width // scale, height // scale),
+                          interpolation=cv2.INTER_AREA)
+
+    def wants_frame(self):
+        """Нужен ли потребителям новый декодированный кадр"""
+        return self.analysis_wanted or self.ring.sequence == self.ring.taken
+
+    def retrieve(self, cap, decode=True):
+        """Получение захваченного кадра: в запись и, если decode, в кольцо"""
+        timestamp = time.time()
+        slot, buffer = self.ring.acquire_write()
+        if self.raw:
+            ret, raw = cap.retrieve()
+            if not ret or raw is None:
+                return False
+            if raw.ndim == 3 and raw.shape[2] == 3:
+                # Драйвер все же отдал декодированный кадр
+                self.raw = False
+                if self.recorder is not None:
+                    self.recorder.put_frame(timestamp, raw)
+                if self.stream is not None and self.stream.wants():
+                    self.stream.put_frame(raw)
+                if decode:
+                    self.ring.commit_write(slot, raw)
+                return True
+            raw = raw.reshape(-1).copy()
+            with self.analysis_lock:
+                self.last_raw = raw
+            self.analysis_wanted = False
+            if self.recorder is not None:
+                # Сжатый кадр уходит в запись без перекодирования
+                self.recorder.put_encoded(timestamp, raw)
+            if self.stream is not None and self.stream.wants():
+                # И зрителям тоже
+                self.stream.put_jpeg(raw)
+            if not decode:
+                # Кадр нужен только анализу или записи: полное декодирование не требуется
+                return True
+            frame = cv2.imdecode(raw, cv2.IMREAD_COLOR)
+            if frame is None:
+                # Не JPEG: возвращаем декодирование драйверу
+                self.raw = False
+                with self.analysis_lock:
+                    self.last_raw = None
+                cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+                return False
+        else:
+            ret, frame = cap.retrieve(buffer)
+            if not ret:
+                return False
+            if self.recorder is not None:
+                self.recorder.put_frame(timestamp, frame)
+            if self.stream is not None and self.stream.wants():
+                self.stream.put_frame(frame)
+            if not decode:
+                # Кадр нужен только записи или зрителям: непрочитанный кадр в кольце
+                # считался бы потерянным при каждом следующем кадре
+                return True
+        self.ring.commit_write(slot, frame)
+        self.analysis_wanted = False
+        self.decoded += 1
+        return True
+
+    def start(self, runtime=None):
+        self.runtime = runtime or self.runtime or get_runtime()
+        self.running = True
+        self.task = self.runtime.submit(self.run())
+
+    def stop(self):
+        self.running = False
+
+    def is_alive(self):
+        return self.task is not None and not self.task.done()
+
+    def join(self, timeout=None):
+        """Ожидание завершения захвата после stop() (не из цикла событий)"""
+        if self.task is not None:
+            concurrent.futures.wait([self.task], timeout)
+
+    def grab_frame(self, cap):
+        """Один кадр: grab() и, если кадр кому-то нужен, retrieve()"""
+        if not cap.grab():
+            self.read_failures += 1
+            return False
+        self.grabbed += 1
+        display_wanted = self.ring.sequence == self.ring.taken
+        stream_wanted = self.stream is not None and self.stream.wants()
+        if display_wanted or self.analysis_wanted or self.recorder is not None or stream_wanted:
+            # Сжатый MJPG для анализа декодируется отдельно в уменьшенном масштабе
+            decode = display_wanted or (self.analysis_wanted and not self.raw)
+            if self.retrieve(cap, decode=decode):
+                self.frames += 1
+        return True
+
+    async def run(self):
+        """Цикл захвата: grab() на каждый кадр, retrieve() - только по запросу
+
+        grab() забирает кадр у драйвера без декодирования и блокируется
+        до следующего кадра, поэтому дополнительные паузы не нужны. Каждый
+        кадр - один вызов в пуле видеовхода; цикл событий не блокируется.
+        """
+        executor = f"video:{self.device}"
+        cap = None
+        try:
+            cap = await self.runtime.offload(executor, self.open_capture)
+            if not cap.isOpened():
+                self.error = "Не удалось открыть видеоустройство"
+                log.error(self.error)
+                return
+
+            log.info("🎥 Видео: %s %dx%d @ %.0f fps%s", self.format['fourcc'],
+                     self.format['width'], self.format['height'], self.format['fps'],
+                     ' (сжатые кадры)' if self.raw else '',
+                     extra={'fields': {'type': 'video_format', **self.format, 'raw': self.raw}})
+
+            while self.running:
+                if not await self.runtime.offload(executor, self.grab_frame, cap):
+                    await asyncio.sleep(0.01)
+        except Exception as e:
+            self.error = str(e)
+            log.error("Ошибка захвата видео: %s", e)
+        finally:
+            if cap is not None:
+                # Освобождение - в том же пуле, после начатого grab()
+                self.runtime.executor(executor).submit(cap.release)
+            self.running = False
+
+
+class VideoDisplay:
+    """Вывод кадров в ttk.Label через один переиспользуемый PhotoImage"""
+
+    def __init__(self, label):
+        self.label = label
+        self.rgb = None
+        self.photo = None
+
+    def show(self, frame, lines=()):
+        """Конвертация BGR -> RGB в предвыделенный буфер и вывод кадра
+
+        lines - подписи поверх кадра: (текст, масштаб, цвет RGB)
+        """
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+            height, width = frame.shape[:2]
+            self.photo = ImageTk.PhotoImage(Image.new('RGB', (width, height)))
+            self.label.config(image=self.photo, text="")
+            self.label.image = self.photo
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        for i, (text, scale, color) in enumerate(lines):
+            cv2.putText(self.rgb, text, (10, 30 + 30 * i),
+                        cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+        self.photo.paste(Image.fromarray(self.rgb))
+
+    def clear(self, text="Нет видеосигнала"):
+        self.label.config(image="", text=text)
+        self.label.image = None
+        self.rgb = None
+        self.photo = None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Запись перехваченного видео с предзаписью
+Поток захвата передает сюда кадры без ожидания: сжатые MJPG как есть,
+декодированные - для кодирования в JPEG. Рабочий поток держит в памяти
+последние preroll_seconds секунд, а при обнаружении сигнала сбрасывает
+их на диск вместе с живыми кадрами в файлы-сегменты .mjpeg.
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+
+from event_log import get_logger
+from startup import lazy_import
+
+# OpenCV нужен только для кодирования кадров в потоке записи
+cv2 = lazy_import('cv2')
+
+log = get_logger('recorder')
+
+
+class VideoRecorder:
+    """Кольцо предзаписи в памяти и сегментированная запись на диск
+
+    directory       - каталог сегментов
+    preroll_seconds - глубина предзаписи, с
+    segment_seconds - длительность одного файла, с
+    max_preroll_bytes - предел памяти кольца предзаписи
+    """
+
+    def __init__(self, directory, preroll_seconds=5.0, segment_seconds=60.0,
+                 jpeg_quality=80, queue_size=64, max_preroll_bytes=32 * 1024 * 1024):
+        self.directory = os.path.expanduser(directory)
+        self.preroll_seconds = preroll_seconds
+        self.segment_seconds = segment_seconds
+        self.jpeg_quality = int(jpeg_quality)
+        self.encode_params = None
+        self.max_preroll_bytes = max_preroll_bytes
+        self.queue = queue.Queue(queue_size)
+        self.control = queue.Queue()
+        self.preroll = collections.deque()
+        self.preroll_bytes = 0
+        self.recording = False
+        self.label = ""
+        self.segment = None
+        self.segment_started = 0.0
+        self.segment_index = 0
+        self.segments = []
+        self.running = False
+        self.thread = None
+        self.dropped = 0
+        self.written = 0
+        self.last_written = 0.0
+
+    @classmethod
+    def from_config(cls, recording_config):
+        return cls(recording_config.get('directory', '~/rpiskan_recordings'),
+                   preroll_seconds=recording_config.get('preroll_seconds', 5.0),
+                   segment_seconds=recording_config.get('segment_seconds', 60.0),
+                   jpeg_quality=recording_config.get('jpeg_quality', 80))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Остановка рабочего потока с закрытием текущего сегмента"""
+        self.running = False
+        self.control.put(('close', None))
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    def send(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    # Вызовы из потока захвата: никогда не блокируются
+
+    def put_encoded(self, timestamp, data):
+        """Кадр, уже сжатый в JPEG (MJPG с устройства); data не должен изменяться"""
+        self.send(('jpeg', timestamp, data))
+
+    def put_frame(self, timestamp, frame):
+        """Декодированный кадр BGR: кодирование выполнит рабочий поток"""
+        if not self.queue.full():
+            self.send(('frame', timestamp, frame.copy()))
+        else:
+            self.dropped += 1
+
+    # Управление записью (из любого потока, без блокировки)
+
+    def trigger(self, label=""):
+        """Начало записи: предзапись сбрасывается в новый сегмент"""
+        self.control.put(('trigger', label))
+
+    def stop_recording(self):
+        self.control.put(('stop', None))
+
+    # Рабочий поток
+
+    def run(self):
+        while True:
+            # Команды управления обрабатываются раньше кадров
+            while not self.control.empty():
+                command, payload = self.control.get_nowait()
+                if command == 'close':
+                    self.close_segment()
+                    return
+                if command == 'trigger':
+                    self.begin_recording(payload)
+                elif command == 'stop':
+                    self.recording = False
+                    self.close_segment()
+
+            try:
+                kind, timestamp, payload = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                if kind == 'frame':
+                    if self.encode_params is None:
+                        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+                    ok, encoded = cv2.imencode('.jpg', payload, self.encode_params)
+                    if not ok:
+                        continue
+                    payload = encoded.tobytes()
+                self.add_frame(timestamp, payload)
+            except Exception as e:
+                log.error("Ошибка записи видео: %s", e)
+
+    def add_frame(self, timestamp, data):
+        self.preroll.append((timestamp, data))
+        self.preroll_bytes += len(data)
+        while self.preroll and (timestamp - self.preroll[0][0] > self.preroll_seconds or
+                                self.preroll_bytes > self.max_preroll_bytes):
+            _, old = self.preroll.popleft()
+            self.preroll_bytes -= len(old)
+
+        if self.recording:
+            self.write(timestamp, data)
+
+    def begin_recording(self, label):
+        self.label = label or ""
+        if self.recording:
+            return
+        self.recording = True
+        # Предзапись уходит в начало первого сегмента (без уже записанных кадров)
+        for timestamp, data in self.preroll:
+            if timestamp > self.last_written:
+                self.write(timestamp, data)
+
+    def write(self, timestamp, data):
+        if self.segment is None or timestamp - self.segment_started >= self.segment_seconds:
+            self.open_segment(timestamp)
+        self.segment.write(data)
+        self.written += 1
+        self.last_written = timestamp
+
+    def open_segment(self, timestamp):
+        self.close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment_index += 1
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp))
+        suffix = f"_{self.label}" if self.label else ""
+        path = os.path.join(self.directory,
+                            f"fpv_{stamp}{suffix}_{self.segment_index:03d}.mjpeg")
+        self.segment = open(path, 'wb')
+        self.segment_started = timestamp
+        self.segments.append(path)
+        log.info("💾 Запись видео: %s", path,
+                 extra={'fields': {'type': 'segment', 'path': path, 'label': self.label}})
+
+    def close_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
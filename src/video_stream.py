@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Ретрансляция видео по HTTP: MJPEG (multipart/x-mixed-replace)
+    GET /video.mjpg - живой поток кадров захвата
+    GET /video.jpg  - один кадр (JPEG)
+Маршруты регистрируются на сервере API (раздел api.video_stream).
+
+Кадр сжимается один раз в потоке захвата (MJPG с устройства передается
+без перекодирования) и только при наличии зрителей, с ограничением
+частоты max_fps. Готовая часть multipart разделяется всеми зрителями
+по ссылке. У каждого зрителя один ожидающий кадр: если клиент не успел
+забрать предыдущий, тот заменяется новым и считается пропущенным, поэтому
+память и нагрузка на процессор не растут с числом зрителей.
+"""
+
+import asyncio
+import time
+
+from event_log import get_logger
+from http_service import response_head, respond
+from startup import lazy_import
+
+cv2 = lazy_import('cv2')
+
+BOUNDARY = b'frame'
+
+log = get_logger('video')
+
+
+class Viewer:
+    """Зритель потока: последний непереданный кадр и событие его появления"""
+
+    __slots__ = ('peer', 'pending', 'ready', 'sent', 'dropped')
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, part):
+        if self.pending is not None:
+            # Клиент не успел забрать предыдущий кадр: заменяем, а не копим
+            self.dropped += 1
+        self.pending = part
+        self.ready.set()
+
+    async def next(self):
+        await self.ready.wait()
+        self.ready.clear()
+        part, self.pending = self.pending, None
+        return part
+
+
+class MjpegStream:
+    """Раздача кадров захвата зрителям MJPEG
+
+    Вызовы wants()/put_jpeg()/put_frame() - из потока захвата, остальное -
+    в цикле событий runtime.
+
+    max_fps      - предельная частота кадров потока
+    jpeg_quality - качество сжатия декодированных кадров (0-100)
+    """
+
+    def __init__(self, runtime, max_fps=15, jpeg_quality=70):
+        self.runtime = runtime
+        self.interval = 1.0 / max(1, max_fps)
+        self.jpeg_quality = int(jpeg_quality)
+        self.encode_params = None
+        self.encode_timer = None
+        self.viewers = set()
+        self.latest = None
+        self.next_time = 0.0
+        self.frames = 0
+        self.encoded = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_config(cls, runtime, stream_config):
+        return cls(runtime, max_fps=stream_config.get('max_fps', 15),
+                   jpeg_quality=stream_config.get('jpeg_quality', 70))
+
+    def register(self, metrics):
+        """Счетчики потока в реестре метрик"""
+        self.encode_timer = metrics.stage('stream_encode')
+        metrics.gauge('stream_viewers', lambda: len(self.viewers))
+        metrics.gauge('stream_frames_dropped', lambda: self.dropped)
+
+    # Поток захвата
+
+    def wants(self):
+        """Нужен ли следующий кадр: есть зрители и подошел срок по max_fps"""
+        return bool(self.viewers) and time.monotonic() >= self.next_time
+
+    def put_jpeg(self, data):
+        """Кадр, уже сжатый в JPEG (bytes или массив uint8, не изменяется после вызова)"""
+        now = time.monotonic()
+        # Сетка сроков: частота max_fps в среднем, без серий после задержек
+        self.next_time = max(self.next_time + self.interval, now - self.interval)
+        header = b'--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % (
+            BOUNDARY, len(data))
+        self.runtime.call_soon(self.publish, b''.join((header, memoryview(data), b'\r\n')))
+
+    def put_frame(self, frame):
+        """Декодированный кадр BGR: одно сжатие на все подключения"""
+        if self.encode_params is None:
+            self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        started = time.perf_counter()
+        ok, data = cv2.imencode('.jpg', frame, self.encode_params)
+        if self.encode_timer is not None:
+            self.encode_timer.observe(time.perf_counter() - started)
+        if ok:
+            self.encoded += 1
+            self.put_jpeg(data)
+
+    # Цикл событий
+
+    def publish(self, part):
+        self.latest = part
+        self.frames += 1
+        for viewer in self.viewers:
+            if viewer.pending is not None:
+                self.dropped += 1
+            viewer.offer(part)
+
+    async def serve(self, request):
+        """GET /video.mjpg: части multipart до отключения клиента"""
+        writer = request.writer
+        writer.write(response_head(
+            200, 'multipart/x-mixed-replace; boundary=' + BOUNDARY.decode('ascii'),
+            headers=(('Cache-Control', 'no-store'), ('Connection', 'close'))))
+        viewer = Viewer(request.peer)
+        if self.latest is not None:
+            viewer.offer(self.latest)
+        self.viewers.add(viewer)
+        log.info("📺 Зритель видео подключен: %s (всего %d)", viewer.peer, len(self.viewers))
+        try:
+            while True:
+                part = await viewer.next()
+                if part is None:
+                    break
+                writer.write(part)
+                await writer.drain()
+                viewer.sent += 1
+        finally:
+            self.viewers.discard(viewer)
+            log.info("📺 Зритель видео отключен: %s (кадров %d, пропущено %d)",
+                     viewer.peer, viewer.sent, viewer.dropped)
+
+    async def serve_snapshot(self, request):
+        """GET /video.jpg: следующий кадр захвата (или последний, если захват стоит)"""
+        viewer = Viewer(request.peer)
+        self.viewers.add(viewer)
+        try:
+            part = await asyncio.wait_for(viewer.next(), 1.0)
+        except asyncio.TimeoutError:
+            part = self.latest
+        finally:
+            self.viewers.discard(viewer)
+        if part is None:
+            await respond(request.writer, 503, b'No video\n')
+            return
+        # Тело части multipart - между заголовками и завершающим CRLF
+        body = part[part.index(b'\r\n\r\n') + 4:-2]
+        await respond(request.writer, 200, body, 'image/jpeg')
+
+    def close(self):
+        """Отключение зрителей (из любого потока)"""
+        def disconnect():
+            for viewer in list(self.viewers):
+                viewer.pending = None
+                viewer.offer(None)
+        self.runtime.call_soon(disconnect)
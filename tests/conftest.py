@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули сканера лежат плоско в src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
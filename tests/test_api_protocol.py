@@ -0,0 +1,213 @@
+"""Двоичный протокол потока проходов API: кодирование, декодирование, ресинхронизация"""
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from api_server import (DELTA, KEYFRAME, PROTOCOL_VERSION, SWEEP_HEADER, ApiServer,
+                        StreamClient, SweepDecoder, SweepEncoder)
+from http_service import WS_BINARY
+from metrics import MetricsRegistry
+
+
+def header(message):
+    return SWEEP_HEADER.unpack_from(message)
+
+
+def unframe(frame):
+    """Данные кадра WebSocket от сервера (без маски)"""
+    length = frame[1] & 0x7F
+    offset = 2
+    if length == 126:
+        length, = struct.unpack_from('!H', frame, 2)
+        offset = 4
+    elif length == 127:
+        length, = struct.unpack_from('!Q', frame, 2)
+        offset = 10
+    return frame[0] & 0x0F, frame[offset:offset + length]
+
+
+def test_header_layout():
+    message, keyframe = SweepEncoder(quantization=4).encode(7, 1700000000.5, [0, 40, 1020])
+    assert keyframe and SWEEP_HEADER.size == 17
+    assert header(message) == (PROTOCOL_VERSION, KEYFRAME, 4, 3, 7, 1700000000.5)
+
+
+def test_keyframe_then_deltas_round_trip():
+    encoder = SweepEncoder(quantization=1, keyframe_interval=10)
+    decoder = SweepDecoder()
+    sweeps = [
+        [10, 0, 255, 128],
+        [0, 255, 0, 129],      # ниже 0 и выше 255 по модулю 256
+        [255, 1, 254, 0],
+        [3, 3, 3, 3],
+    ]
+    for number, rssi in enumerate(sweeps):
+        message, keyframe = encoder.encode(number, float(number), rssi)
+        assert keyframe == (number == 0)
+        assert header(message)[1] == (KEYFRAME if number == 0 else DELTA)
+        sweep, timestamp, values = decoder.decode(message)
+        assert (sweep, timestamp) == (number, float(number))
+        assert values.tolist() == rssi
+
+
+def test_quantization_error_within_step():
+    encoder = SweepEncoder(quantization=4)
+    decoder = SweepDecoder()
+    rng = np.random.default_rng(1)
+    for number in range(5):
+        rssi = rng.uniform(0, 1000, 64)
+        _, _, values = decoder.decode(encoder.encode(number, 0.0, rssi)[0])
+        assert np.all(np.abs(values - rssi) <= 2)
+
+
+def test_keyframe_interval():
+    encoder = SweepEncoder(keyframe_interval=3)
+    kinds = [encoder.encode(n, 0.0, [100, 200])[1] for n in range(8)]
+    assert kinds == [True, False, False, False, True, False, False, False]
+
+
+def test_bin_count_change_forces_keyframe():
+    encoder = SweepEncoder(quantization=1)
+    decoder = SweepDecoder()
+    decoder.decode(encoder.encode(0, 0.0, [1, 2, 3])[0])
+    decoder.decode(encoder.encode(1, 0.0, [2, 3, 4])[0])
+    message, keyframe = encoder.encode(2, 0.0, [5, 6, 7, 8, 9])
+    assert keyframe and header(message)[3] == 5
+    assert decoder.decode(message)[2].tolist() == [5, 6, 7, 8, 9]
+
+
+def test_decoder_waits_for_keyframe():
+    encoder = SweepEncoder(quantization=1)
+    encoder.encode(0, 0.0, [1, 2])
+    delta, keyframe = encoder.encode(1, 0.0, [3, 4])
+    assert not keyframe
+    decoder = SweepDecoder()
+    assert decoder.decode(delta) is None
+    with pytest.raises(ValueError):
+        decoder.decode(bytes([PROTOCOL_VERSION + 1]) + delta[1:])
+
+
+class FakeSnapshots:
+    version = 1
+
+    def peek(self):
+        return None
+
+
+class FakePlan:
+    mode = name = 'all'
+    sweep_mode = 'channels'
+
+
+class FakeEngine:
+    runtime = None
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+        self.snapshots = FakeSnapshots()
+        self.plan = FakePlan()
+        self.scanning = True
+
+
+def make_server(keyframe_interval=100):
+    return ApiServer(FakeEngine(), port=0, quantization=1,
+                     keyframe_interval=keyframe_interval)
+
+
+def sweep(number, rssi):
+    return {'type': 'sweep', 'sweep': number, 'timestamp': float(number), 'rssi': rssi}
+
+
+def received(client):
+    """Кадры прохода из очереди клиента: [(тип, номер прохода, сообщение)]"""
+    messages = []
+    while not client.queue.empty():
+        opcode, payload = unframe(client.queue.get_nowait())
+        if opcode != WS_BINARY:
+            continue
+        fields = header(payload)
+        messages.append((fields[1], fields[4], payload))
+    return messages
+
+
+def test_joining_client_starts_from_keyframe_of_same_sweep():
+    server = make_server(keyframe_interval=3)
+    fast = StreamClient('fast', 100)
+    server.clients.add(fast)
+    server.publish(sweep(0, [1, 2]))
+    server.publish(sweep(1, [2, 3]))
+
+    joining = StreamClient('joining', 100)
+    joining.resync = True
+    server.clients.add(joining)
+    for number in range(2, 6):
+        server.publish(sweep(number, [number, 250 + number]))
+    messages = received(joining)
+    assert [(kind, number) for kind, number, _ in messages] == [
+        (KEYFRAME, 2), (DELTA, 3), (KEYFRAME, 4), (DELTA, 5)]
+    decoder = SweepDecoder()
+    assert [decoder.decode(m)[2].tolist() for _, _, m in messages] == [
+        [2, 252], [3, 253], [4, 254], [5, 255]]
+    # Остальным клиентам опорные кадры - только по расписанию
+    assert [kind for kind, _, _ in received(fast)] == [
+        KEYFRAME, DELTA, DELTA, DELTA, KEYFRAME, DELTA]
+
+
+def test_slow_client_queue_full_resyncs_alone():
+    server = make_server()
+    fast = StreamClient('fast', 100)
+    slow = StreamClient('slow', 3)
+    server.clients.update((fast, slow))
+
+    for number in range(4):
+        server.publish(sweep(number, [number, 2 * number]))
+    # Очередь медленного клиента переполнилась на проходе 3: сброс и опорный кадр прохода
+    assert slow.dropped == 1 and server.dropped == 1 and not slow.resync
+    assert server.encoder.previous is not None
+
+    server.publish(sweep(4, [7, 9]))
+    server.publish(sweep(5, [8, 250]))
+    messages = received(slow)
+    assert [(kind, number) for kind, number, _ in messages] == [
+        (KEYFRAME, 3), (DELTA, 4), (DELTA, 5)]
+    decoder = SweepDecoder()
+    assert [decoder.decode(m)[2].tolist() for _, _, m in messages] == [[3, 6], [7, 9], [8, 250]]
+
+    # Кодер не сбрасывался: быстрый клиент получает разностные кадры без разрывов
+    fast_messages = received(fast)
+    assert [kind for kind, _, _ in fast_messages] == [KEYFRAME] + [DELTA] * 5
+    decoder = SweepDecoder()
+    values = [decoder.decode(m)[2].tolist() for _, _, m in fast_messages]
+    assert values == [[0, 0], [1, 2], [2, 4], [3, 6], [7, 9], [8, 250]]
+
+
+def test_plan_change_forces_keyframe_for_all():
+    server = make_server()
+    client = StreamClient('client', 100)
+    server.clients.add(client)
+    server.publish(sweep(0, [1, 2]))
+    server.publish(sweep(1, [2, 3]))
+    server.publish({'type': 'plan', 'frequencies': [5800, 5820, 5840]})
+    server.publish(sweep(2, [4, 5, 6]))
+    messages = received(client)
+    assert [(kind, number) for kind, number, _ in messages] == [
+        (KEYFRAME, 0), (DELTA, 1), (KEYFRAME, 2)]
+
+
+def test_no_encoding_without_clients():
+    server = make_server()
+    server.publish(sweep(0, [1, 2]))
+    assert server.encoder.previous is None
+
+
+def test_state_cache_follows_scanning_flag():
+    server = make_server()
+    state = json.loads(server.cached('state', server.build_state))
+    assert state['scanning'] is True
+    # Остановка не меняет версию снимка
+    server.engine.scanning = False
+    state = json.loads(server.cached('state', server.build_state))
+    assert state['scanning'] is False
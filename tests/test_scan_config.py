@@ -0,0 +1,60 @@
+"""Проверка конфигурации и компиляция режимов сканирования"""
+
+import copy
+
+import pytest
+
+from scan_config import ConfigError, compile_plans, override_scanner, validate_config
+from scan_engine import load_config
+
+
+@pytest.fixture
+def config():
+    return copy.deepcopy(load_config())
+
+
+def test_repository_config_is_valid(config):
+    assert validate_config(config) == []
+
+
+def test_channel_mode_covers_its_channels(config):
+    plan = compile_plans(config)['racing_only']
+    assert plan.sweep_mode == 'channels'
+    assert plan.range == (min(plan.frequencies), max(plan.frequencies))
+
+
+def test_coarse_fine_channel_mode_covers_frequency_range(config):
+    full_range = config['frequencies']['frequency_range']
+    plans = compile_plans(override_scanner(config, sweep_mode='coarse_fine'))
+    for mode in ('racing_only', 'long_range_only'):
+        assert plans[mode].sweep_mode == 'coarse_fine'
+        assert plans[mode].range == (full_range['min'], full_range['max'])
+
+
+def test_explicit_mode_range_wins(config):
+    config['scanner']['scan_modes']['racing_only']['range'] = {'min': 5700, 'max': 5900}
+    plans = compile_plans(override_scanner(config, sweep_mode='coarse_fine'))
+    assert plans['racing_only'].range == (5700, 5900)
+
+
+@pytest.mark.parametrize('edit, where', [
+    (lambda c: c['frequencies']['channels'].update(A=7000), 'frequencies.channels.A'),
+    (lambda c: c['frequencies'].update(frequency_range={'min': 6000, 'max': 5800}),
+     'frequencies.frequency_range: min больше max'),
+    (lambda c: c['scanner'].update(rssi_threshold=300), 'scanner.rssi_threshold'),
+    (lambda c: c['scanner'].update(scan_interval=-1), 'scanner.scan_interval'),
+    (lambda c: c['scanner'].update(sweep_mode='spiral'), 'scanner.sweep_mode'),
+    (lambda c: c['scanner'].update(scan_mode='missing'), 'scanner.scan_mode'),
+])
+def test_validate_config_errors(config, edit, where):
+    edit(config)
+    problems = validate_config(config)
+    assert any(problem.startswith(where) for problem in problems), problems
+    with pytest.raises(ConfigError):
+        compile_plans(config)
+
+
+def test_unknown_mode_channels(config):
+    config['scanner']['scan_modes']['racing_only']['channels'] = ['A', 'ZZ']
+    problems = validate_config(config)
+    assert problems == ["scanner.scan_modes.racing_only.channels: неизвестные каналы ['ZZ']"]
@@ -0,0 +1,49 @@
+"""Привязка излучателей к трекам и устаревание треков"""
+
+from signal_tracker import SignalTracker
+
+
+class Emitter:
+    def __init__(self, center, peak_rssi=100):
+        self.center = center
+        self.peak_rssi = peak_rssi
+        self.bandwidth = 8.0
+        self.kind = 'analog'
+
+
+def test_dense_emitters_keep_their_tracks():
+    tracker = SignalTracker(gate_mhz=5.0)
+    tracker.update([Emitter(5800 + i) for i in range(4)], 0.0)
+    # Все излучатели сместились к краю: соседи с одной стороны заняты раньше
+    new, lost = tracker.update([Emitter(5803.5, 200 - i) for i in range(4)], 1.0)
+    assert new == [] and lost == []
+    assert len(tracker) == 4
+
+
+def test_emitter_outside_gate_starts_new_track():
+    tracker = SignalTracker(gate_mhz=2.0)
+    tracker.update([Emitter(5800)], 0.0)
+    new, _ = tracker.update([Emitter(5803)], 1.0)
+    assert len(new) == 1 and len(tracker) == 2
+
+
+def test_index_follows_drift_and_expiry():
+    tracker = SignalTracker(gate_mhz=3.0, ttl=2.0)
+    tracker.update([Emitter(5800), Emitter(5810)], 0.0)
+    tracker.update([Emitter(5812)], 1.0)
+    tracker.update([Emitter(5814)], 2.5)
+    assert tracker.centers == [5814]
+    assert [t.center for t in tracker.order] == tracker.centers
+    track = tracker.order[0]
+    assert track.drift > 0 and track.hits == 3
+
+
+def test_snapshot_rebuilt_only_on_change():
+    tracker = SignalTracker(ttl=5.0)
+    tracker.update([Emitter(5800, 90), Emitter(5900, 120)], 0.0)
+    snapshot = tracker.snapshot()
+    assert [t['center'] for t in snapshot] == [5900, 5800]
+    tracker.update([], 1.0)
+    assert tracker.snapshot() is snapshot
+    tracker.update([Emitter(5800, 150)], 2.0)
+    assert [t['center'] for t in tracker.snapshot()] == [5800, 5900]
@@ -0,0 +1,51 @@
+"""Выбор режима захвата по возможностям устройства"""
+
+import pytest
+
+from video_devices import VideoDevice, VideoDeviceRegistry, VideoMode
+
+
+def best(modes, width=640, height=480, fps=30, codec='MJPG'):
+    device = VideoDevice('/dev/video0', 'DVR', 'usb-1', '1-1', capture=True,
+                         modes=[VideoMode(*m) for m in modes])
+    mode = VideoDeviceRegistry(cache_file='/nonexistent/cache.json').best_mode(
+        device, width, height, fps, codec)
+    return (mode.fourcc, mode.width, mode.height, mode.fps)
+
+
+def test_fast_mode_beats_slow_exact_size():
+    modes = [('YUYV', 640, 480, 5), ('MJPG', 720, 576, 30), ('YUYV', 720, 576, 10)]
+    assert best(modes) == ('MJPG', 720, 576, 30)
+
+
+def test_exact_size_among_fast_modes():
+    modes = [('MJPG', 1280, 720, 30), ('MJPG', 640, 480, 30), ('MJPG', 320, 240, 30)]
+    assert best(modes) == ('MJPG', 640, 480, 30)
+
+
+def test_exact_size_before_codec():
+    modes = [('YUYV', 640, 480, 30), ('MJPG', 1920, 1080, 30)]
+    assert best(modes) == ('YUYV', 640, 480, 30)
+    assert best(modes, codec='YUYV') == ('YUYV', 640, 480, 30)
+
+
+def test_codec_among_modes_of_same_size():
+    modes = [('YUYV', 640, 480, 30), ('MJPG', 640, 480, 30), ('MJPG', 800, 600, 30)]
+    assert best(modes) == ('MJPG', 640, 480, 30)
+    assert best(modes, codec='YUYV') == ('YUYV', 640, 480, 30)
+
+
+def test_closest_larger_size_before_codec():
+    modes = [('MJPG', 1920, 1080, 30), ('YUYV', 800, 600, 30)]
+    assert best(modes) == ('YUYV', 800, 600, 30)
+
+
+def test_smaller_size_only_as_fallback():
+    modes = [('MJPG', 320, 240, 30), ('YUYV', 640, 480, 30)]
+    assert best(modes) == ('YUYV', 640, 480, 30)
+
+
+@pytest.mark.parametrize('fps, expected', [(25, 30), (30, 30), (50, 60), (120, 60)])
+def test_frame_rate_closest_at_or_above_request(fps, expected):
+    modes = [('MJPG', 640, 480, rate) for rate in (15, 30, 60)]
+    assert best(modes, fps=fps)[3] == expected